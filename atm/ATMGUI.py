@@ -1,18 +1,30 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog
-from PIL import Image, ImageTk
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 class ATMUI:
-    def __init__(self, root, account_manager, location, atm_id):
+    def __init__(self, root, account_manager, location, atm_id, executor=None, session=None, on_status=None):
+        # root is a Tk or Toplevel window, or a Frame when embedded in the fleet dashboard
         self.root = root
         self.account_manager = account_manager
         self.location = location
         self.atm_id = atm_id
+        self.session = None  # The logged-in Session, kept so a dashboard can rebuild this ATM later
+        self.on_status = on_status  # Called with a short status line when the ATM's state changes
+
+        # Database calls run on this pool so a slow commit never blocks the Tk main loop
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        # Widget of the screen whose request is in flight; blocks duplicate submits from
+        # that screen, but not from a screen the user moved on to
+        self.busy = None
+        # Callbacks are scheduled on the window, which outlives an embedded frame
+        self.scheduler = root.winfo_toplevel()
         
         # Window Setup
-        self.root.title("ATM Interface")
-        self.root.geometry("500x600")  # Increased height for message area
+        if isinstance(root, (tk.Tk, tk.Toplevel)):
+            self.root.title("ATM Interface")
+            self.root.geometry("500x600")  # Increased height for message area
         self.root.configure(bg='#2c3e50')
 
         # Create main container
@@ -25,14 +37,20 @@ class ATMUI:
         # Message label for displaying transaction messages
         self.message_label = None
 
-        # Initial login screen
-        self.create_login_screen()
+        # Initial login screen, or straight back to the menu for a session that is still valid
+        if session is not None and not session.is_expired():
+            self.session = session
+            self.create_main_menu(session.name, session)
+        else:
+            self.create_login_screen()
 
     # def setup_background(self):
     #     """Set up a background image with overlay."""
     #     self.canvas = tk.Canvas(self.main_container, highlightthickness=0)
     #     self.canvas.pack(fill=tk.BOTH, expand=True)
 
+    #     from PIL import Image, ImageTk  # Imported here so the GUI starts without PIL
+
     #     try:
     #         bg_image = Image.open("E:\\ATM\\black.jpg")
     #         self.bg_photo = ImageTk.PhotoImage(bg_image)
@@ -40,19 +58,83 @@ class ATMUI:
     #         self.canvas.create_rectangle(0, 0, 1000, 700, fill='black', stipple='gray50')
     #     except Exception as e:
     #         print(f"Background image error: {e}")
+    def set_status(self, text):
+        """Reports a state change to whoever embeds this ATM."""
+        if self.on_status is not None:
+            self.on_status(self.atm_id, text)
+
+    def after(self, delay, callback, *args):
+        """Runs callback later on the Tk thread, unless this ATM's widgets are gone by then."""
+        def run():
+            if self.main_container.winfo_exists():
+                callback(*args)
+
+        self.scheduler.after(delay, run)
+
+    def clear_message(self, parent):
+        """Remove the message label shown in parent, if any."""
+        for widget in parent.winfo_children():
+            if isinstance(widget, tk.Label) and getattr(widget, "is_message_label", False):
+                widget.destroy()
+
+    def run_in_background(self, task, on_success, on_error, parent=None):
+        """Run a database task on the worker pool and hand its result back on the Tk thread."""
+        if self.busy is not None and self.busy.winfo_exists():
+            return False
+        screen = self.main_container if parent is None else parent
+        self.busy = screen
+        if parent is not None:
+            self.show_message("Processing...", parent, '#7f8c8d')
+
+        def deliver(future):
+            if self.busy is screen:
+                self.busy = None
+            if not self.main_container.winfo_exists() or not screen.winfo_exists():
+                return  # The screen was left while the request was in flight
+            try:
+                result = future.result()
+            except Exception as e:
+                on_error(e)
+            else:
+                on_success(result)
+
+        def done(future):
+            try:
+                self.scheduler.after(0, deliver, future)
+            except (RuntimeError, tk.TclError):
+                pass  # The ATM window was closed
+
+        self.executor.submit(task).add_done_callback(done)
+        return True
+
     def authenticate(self):
         """Authenticate user and move to main menu."""
         try:
             card_number = int(self.card_entry.get())
             password = self.pass_entry.get()
+        except ValueError:
+            messagebox.showerror("Error", "Please enter valid card number and PIN")
+            return
 
-            if self.account_manager.authenticate_user(card_number, password):
-                account_name = self.account_manager.get_account_name(card_number)
-                self.create_main_menu(account_name, card_number)
-            else:
+        def on_success(session):
+            self.clear_message(self.login_frame)
+            if session is None:
                 messagebox.showerror("Login Failed", "Invalid Card Number or PIN")
-        except ValueError:
-            messagebox.showerror("Error", "Please enter valid card number and PIN")        
+            else:
+                self.session = session
+                self.set_status(f"In use: {session.name}")
+                self.create_main_menu(session.name, session)
+
+        def on_error(e):
+            self.clear_message(self.login_frame)
+            messagebox.showerror("Error", str(e))
+
+        self.run_in_background(
+            lambda: self.account_manager.authenticate_user(card_number, password),
+            on_success,
+            on_error,
+            self.login_frame
+        )
 
     def show_message(self, message, parent, color='black'):
         """Display a message dynamically under the relevant section."""
@@ -80,12 +162,15 @@ class ATMUI:
         """Create a modern login screen."""
         for widget in self.main_container.winfo_children():
             widget.destroy()
+        self.session = None
+        self.set_status("Idle")
 
         login_frame = tk.Frame(self.main_container, 
                              bg='white', 
                              highlightbackground='#e0e0e0', 
                              highlightthickness=1)
         login_frame.place(relx=0.5, rely=0.5, anchor=tk.CENTER, width=400, height=500)
+        self.login_frame = login_frame  # Shows "Processing..." while a login is checked
 
         # Rest of the login screen code remains the same
         title_label = tk.Label(login_frame, text=f"ALAhly Bank \n Branch:{self.location}", 
@@ -118,7 +203,7 @@ class ATMUI:
                                command=self.authenticate)
         login_button.pack(pady=(10, 20), padx=50, fill=tk.X)
 
-    def create_main_menu(self, account_name, card_number):
+    def create_main_menu(self, account_name, session):
         """Create the main menu with modern, colorful buttons."""
         self.account_name = account_name  # Store account name for cancel button
         for widget in self.main_container.winfo_children():
@@ -148,30 +233,37 @@ class ATMUI:
         withdraw_btn = tk.Button(button_frame, 
                                text="Withdraw", 
                                bg='#2c3e50', fg='white',
-                               command=lambda: self.show_transaction_screen('withdraw', card_number),
+                               command=lambda: self.show_transaction_screen('withdraw', session),
                                **button_style)
         withdraw_btn.pack(pady=10)
 
         deposit_btn = tk.Button(button_frame, 
                               text="Deposit", 
                               bg='#2c3e50', fg='white',
-                              command=lambda: self.show_transaction_screen('deposit', card_number),
+                              command=lambda: self.show_transaction_screen('deposit', session),
                               **button_style)
         deposit_btn.pack(pady=10)
 
         balance_btn = tk.Button(button_frame, 
                               text="Check Balance", 
                               bg='#2c3e50', fg='white',
-                              command=lambda: self.show_check_balance_screen(card_number),
+                              command=lambda: self.show_check_balance_screen(session),
                               **button_style)
         balance_btn.pack(pady=10)
 
         transactions_btn = tk.Button(button_frame, 
                                    text="Recent Transactions", 
                                    bg='#2c3e50', fg='white',
-                                   command=lambda: self.show_transaction_log_screen(card_number),
+                                   command=lambda: self.show_transaction_log_screen(session),
                                    **button_style)
         transactions_btn.pack(pady=10)
+
+        logout_btn = tk.Button(button_frame, 
+                             text="Logout", 
+                             bg='#e74c3c', fg='white',
+                             command=self.create_login_screen,
+                             **button_style)
+        logout_btn.pack(pady=10)
         
     def show_message(self, message, parent, color='black'):
         """Display a message dynamically under the relevant section."""
@@ -193,7 +285,7 @@ class ATMUI:
         message_label.is_message_label = True  # Mark this as a message label
         message_label.pack(pady=(10, 0))  # Place it dynamically within the parent
         
-    def show_transaction_screen(self, transaction_type, card_number):
+    def show_transaction_screen(self, transaction_type, session):
         """Show transaction screen with amount input."""
         for widget in self.main_container.winfo_children():
             widget.destroy()
@@ -222,48 +314,64 @@ class ATMUI:
         btn_frame = tk.Frame(trans_frame, bg='white')
         btn_frame.pack(pady=20)
 
-        confirm_btn = tk.Button(btn_frame, 
+        self.confirm_btn = tk.Button(btn_frame, 
                                 text="Confirm", 
                                 font=('Arial', 16, 'bold'),
                                 bg='#2ecc71', fg='white',
                                 width=15,
                                 command=lambda: self.process_transaction(transaction_type, 
-                                                                        card_number, 
+                                                                        session, 
                                                                         amount_entry.get(),
                                                                         trans_frame))
-        confirm_btn.pack(side=tk.LEFT, padx=10)
+        self.confirm_btn.pack(side=tk.LEFT, padx=10)
 
         cancel_btn = tk.Button(btn_frame, 
                             text="Cancel", 
                             font=('Arial', 16, 'bold'),
                             bg='#e74c3c', fg='white',
                             width=15,
-                            command=lambda: self.create_main_menu(self.account_name, card_number))
+                            command=lambda: self.create_main_menu(self.account_name, session))
         cancel_btn.pack(side=tk.LEFT, padx=10)
     
     
 
-    def process_transaction(self, transaction_type, card_number, amount, parent):
+    def process_transaction(self, transaction_type, session, amount, parent):
         """Process withdrawal or deposit."""
         try:
             amount = float(amount)
+        except ValueError:
+            self.show_message("Please enter a valid amount.", parent, 'red')
+            return
+
+        def task():
             if transaction_type == 'withdraw':
-                self.account_manager.withdraw(card_number, amount, self.atm_id)
-                self.show_message(f"Withdrawal of ${amount:.2f} successful!", parent, 'green')
+                self.account_manager.withdraw(session, amount, self.atm_id)
             else:  # deposit
-                self.account_manager.deposit(card_number, amount,self.atm_id)
+                self.account_manager.deposit(session, amount, self.atm_id)
+
+        def on_success(_):
+            self.confirm_btn.config(state=tk.NORMAL)
+            if transaction_type == 'withdraw':
+                self.show_message(f"Withdrawal of ${amount:.2f} successful!", parent, 'green')
+                self.set_status(f"In use: {session.name}, withdrew ${amount:.2f}")
+            else:
                 self.show_message(f"Deposit of ${amount:.2f} successful!", parent, 'green')
+                self.set_status(f"In use: {session.name}, deposited ${amount:.2f}")
 
             # Optionally return to the main menu after a delay
-            self.root.after(2000, lambda: self.create_main_menu(
-                self.account_manager.get_account_name(card_number), card_number))
-        except Exception as e:
+            self.after(2000, self.create_main_menu, session.name, session)
+
+        def on_error(e):
+            self.confirm_btn.config(state=tk.NORMAL)
             self.show_message(str(e), parent, 'red')
 
+        if self.run_in_background(task, on_success, on_error, parent):
+            self.confirm_btn.config(state=tk.DISABLED)
 
 
 
-    def show_check_balance_screen(self, card_number):
+
+    def show_check_balance_screen(self, session):
         """Show the screen to check the balance."""
         for widget in self.main_container.winfo_children():
             widget.destroy()
@@ -277,25 +385,35 @@ class ATMUI:
                             bg='white', fg='#2c3e50')
         title_label.pack(pady=(30, 20))
 
-        try:
-            # Fetch and display the account balance
-            balance = self.account_manager.get_balance(card_number)
-            self.show_message(f"Your balance is: ${balance:.2f}", balance_frame, 'green')
-        except Exception as e:
-            self.show_message(str(e), balance_frame, 'red')
+        status_frame = tk.Frame(balance_frame, bg='white')  # Holds the processing/result message
+        status_frame.pack()
+
+        def show_balance(balance):
+            if balance is None:  # The account no longer exists
+                self.show_message("Account not found.", status_frame, 'red')
+            else:
+                self.show_message(f"Your balance is: ${balance:.2f}", status_frame, 'green')
+
+        # Fetch and display the account balance
+        self.run_in_background(
+            lambda: self.account_manager.get_balance(session),
+            show_balance,
+            lambda e: self.show_message(str(e), status_frame, 'red'),
+            status_frame
+        )
 
         # Add a back button to return to the main menu
         back_button = tk.Button(balance_frame, 
                                 text="Back", 
                                 font=('Arial', 16, 'bold'),
                                 bg='#3498db', fg='white',
-                                command=lambda: self.create_main_menu(self.account_name, card_number))
+                                command=lambda: self.create_main_menu(self.account_name, session))
         back_button.pack(pady=20)
 
 
 
 
-    def show_transaction_log_screen(self, card_number):
+    def show_transaction_log_screen(self, session):
         """Show the screen to view the transaction log."""
         for widget in self.main_container.winfo_children():
             widget.destroy()
@@ -316,24 +434,32 @@ class ATMUI:
                         state=tk.DISABLED)
         log_text.pack(pady=(10, 20), padx=20)
 
-        try:
-            # Fetch the transaction log
-            transactions = self.account_manager.get_transaction_history(card_number)
+        status_frame = tk.Frame(log_frame, bg='white')  # Holds the processing/result message
+        status_frame.pack()
+
+        def show_transactions(transactions):
+            self.clear_message(status_frame)
             if transactions:
                 log_text.config(state=tk.NORMAL)
                 log_text.insert(tk.END, "\n".join(transactions))
                 log_text.config(state=tk.DISABLED)
             else:
-                self.show_message("No transactions found.", log_frame, 'orange')
-        except Exception as e:
-            self.show_message(str(e), log_frame, 'red')
+                self.show_message("No transactions found.", status_frame, 'orange')
+
+        # Fetch the transaction log
+        self.run_in_background(
+            lambda: self.account_manager.get_transaction_history(session),
+            show_transactions,
+            lambda e: self.show_message(str(e), status_frame, 'red'),
+            status_frame
+        )
 
         # Add a back button to return to the main menu
         back_button = tk.Button(log_frame, 
                                 text="Back", 
                                 font=('Arial', 16, 'bold'),
                                 bg='#3498db', fg='white',
-                                command=lambda: self.create_main_menu(self.account_name, card_number))
+                                command=lambda: self.create_main_menu(self.account_name, session))
         back_button.pack(pady=20)
 
 
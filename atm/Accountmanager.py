@@ -5,20 +5,177 @@ import sqlite3
       
 import sqlite3
 import threading
-
-
-class AccountManager:
-    def __init__(self, db_name="atm_simulator.db"):
+import time
+from contextlib import contextmanager, nullcontext
+
+from cache import LRUCache, MISSING
+from connection_pool import ConnectionPool
+from Create_and_populate_database import chunked, migrate_database
+from lock_striping import StripedLock, hold_in_order
+from metrics import Metrics, MetricsDumper
+from session import Session
+from storage import AccountStore, format_transaction  # noqa: F401 (format_transaction is re-exported)
+from trace_recorder import TraceRecorder
+from transaction_archive import PARTITIONS_QUERY, ArchiveSet
+from transaction_journal import TransactionJournal
+from velocity_limits import VelocityLimits
+
+ACTIVE_ATMS_QUERY = "SELECT atm_id, location FROM atms WHERE status = 'Active' LIMIT ?"
+TRANSACTION_COLUMNS = "transaction_id, account_id, transaction_type, amount, timestamp"
+TRANSACTION_HISTORY_QUERY = f"""
+    SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE account_id = ?
+    ORDER BY timestamp DESC, transaction_id DESC LIMIT ?
+"""
+# Keyset pages continue strictly after the (timestamp, transaction_id) of the previous page's last row
+TRANSACTION_PAGE_QUERIES = {
+    "newest_first": f"""
+        SELECT {TRANSACTION_COLUMNS} FROM transactions
+        WHERE account_id = ? AND (timestamp, transaction_id) < (?, ?)
+        ORDER BY timestamp DESC, transaction_id DESC LIMIT ?
+    """,
+    "oldest_first": f"""
+        SELECT {TRANSACTION_COLUMNS} FROM transactions
+        WHERE account_id = ? AND (timestamp, transaction_id) > (?, ?)
+        ORDER BY timestamp, transaction_id LIMIT ?
+    """,
+}
+FIRST_PAGE_QUERIES = {
+    "newest_first": TRANSACTION_HISTORY_QUERY,
+    "oldest_first": f"""
+        SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE account_id = ?
+        ORDER BY timestamp, transaction_id LIMIT ?
+    """,
+}
+# A NULL timestamp lets the database stamp the row; managers with a clock pass their own
+LEDGER_INSERT_QUERY = """
+    INSERT INTO transactions (account_id, atm_id, transaction_type, amount, timestamp)
+    VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+"""
+# Withdrawals inside the velocity-limit horizon, with timestamps as epoch seconds
+VELOCITY_WARM_QUERY = """
+    SELECT account_id, atm_id, amount, CAST(strftime('%s', timestamp) AS INTEGER)
+    FROM transactions
+    WHERE transaction_type = 'Withdrawal'
+      AND timestamp >= datetime(?, 'unixepoch') AND timestamp <= datetime(?, 'unixepoch')
+"""
+# apply_batch operation names and the ledger type each one records
+BATCH_OPERATIONS = {"deposit": "Deposit", "withdraw": "Withdrawal", "withdrawal": "Withdrawal"}
+
+# Queries on the per-operation path with sample parameters, checked by check_query_plans
+HOT_QUERIES = {
+    "authenticate_user": (
+        "SELECT account_holder_name, balance FROM accounts WHERE account_id = ? AND password = ?", (1, "0000")
+    ),
+    "get_balance": ("SELECT balance FROM accounts WHERE account_id = ?", (1,)),
+    "get_account_name": ("SELECT account_holder_name FROM accounts WHERE account_id = ?", (1,)),
+    "debit_account": (
+        "UPDATE accounts SET balance = balance - ? WHERE account_id = ? AND balance >= ? RETURNING balance", (1, 1, 1)
+    ),
+    "credit_account": ("UPDATE accounts SET balance = balance + ? WHERE account_id = ? RETURNING balance", (1, 1)),
+    "debit_atm": ("UPDATE atms SET cash_level = cash_level - ? WHERE atm_id = ? AND cash_level >= ?", (1, 1, 1)),
+    "credit_atm": ("UPDATE atms SET cash_level = cash_level + ? WHERE atm_id = ?", (1, 1)),
+    "get_transaction_history": (TRANSACTION_HISTORY_QUERY, (1, 3)),
+    "transaction_page_newest_first": (TRANSACTION_PAGE_QUERIES["newest_first"], (1, "9999", 0, 50)),
+    "transaction_page_oldest_first": (TRANSACTION_PAGE_QUERIES["oldest_first"], (1, "0000", 0, 50)),
+    "fetch_limited_active_atms": (ACTIVE_ATMS_QUERY, (10,)),
+    "atm_daily_totals": (
+        "SELECT * FROM atm_daily_totals WHERE atm_id = ? AND day BETWEEN ? AND ?", (1, "2024-01-01", "2024-01-31")
+    ),
+    "fleet_daily_totals": ("SELECT * FROM atm_daily_totals WHERE day = ? ORDER BY atm_id", ("2024-01-01",)),
+    "daily_transaction_counts": ("SELECT * FROM daily_transaction_counts WHERE day = ?", ("2024-01-01",)),
+}
+
+
+def fetch_limited_active_atms(limit, db_name="atm_simulator.db", shard_map=None):
+    """Fetch a limited number of active ATMs from the database, or from every shard in shard_map."""
+    if shard_map:
+        atms = []
+        for shard_path in shard_map:
+            atms.extend(fetch_limited_active_atms(limit - len(atms), shard_path))
+            if len(atms) >= limit:
+                break
+        return atms
+
+    connection = sqlite3.connect(db_name)
+    cursor = connection.cursor()
+
+    # Query to fetch active ATMs
+    cursor.execute(ACTIVE_ATMS_QUERY, (limit,))
+    atms = cursor.fetchall()
+
+    connection.close()
+    return atms
+
+
+class AccountManager(AccountStore):
+    def __init__(self, db_name="atm_simulator.db", pool_size=5, write_behind=False,
+                 journal_batch_size=500, journal_flush_interval=0.05, lock_stripes=64,
+                 cache_size=4096, cache_ttl=30.0, session_ttl=300.0, metrics=False,
+                 metrics_file=None, metrics_interval=15.0, trace_file=None, trace_snapshot=None,
+                 velocity_limits=None, clock=None):
         self.db_name = db_name
-        self.lock = threading.Lock()  # Ensures thread safety for database operations
+        # Ledger time source in epoch seconds, e.g. a simulation's virtual clock; None
+        # leaves timestamps to the database
+        self.clock = clock
+        # Optional instrumentation; pass True or a Metrics shared between managers. When
+        # off, methods are not wrapped and each phase check is a single None test.
+        self.metrics = None
+        self.metrics_dumper = None
+        if metrics:
+            self.metrics = metrics if isinstance(metrics, Metrics) else Metrics()
+            self.metrics.instrument(self)
+            if metrics_file:
+                self.metrics_dumper = MetricsDumper(self.metrics, metrics_file, metrics_interval)
+        # Optional workload recording for trace_replay.py; trace_snapshot copies the database first
+        self.recorder = None
+        if trace_file:
+            self.recorder = TraceRecorder(trace_file, db_name, trace_snapshot)
+            self.recorder.instrument(self)
+        # Account names and balances; writes go through it so repeated reads skip the database.
+        # Only this manager's writes reach it, so pass cache_size=0 if other processes write too.
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self.session_ttl = session_ttl  # Idle seconds before a Session must log in again
+        # Writes lock only the stripes of the accounts and ATMs they touch; reads take no lock
+        self.account_locks = StripedLock(lock_stripes)
+        self.atm_locks = StripedLock(lock_stripes)
+        # SQLite allows one writer per file; queueing writers here is cheaper than
+        # letting them spin in SQLite's busy handler
+        self.writer_lock = threading.Lock()
+        self.pool = ConnectionPool(db_name, size=pool_size)  # Reused connections instead of one per query
+        self.archives = ArchiveSet(db_name, pool_size)  # Months moved out by transaction_archive.py
+
+        # Add any indexes an older database file is missing
+        with self.pool.connection() as connection:
+            migrate_database(connection)
+
+        # Optional per-card and per-ATM withdrawal limits; pass LimitRules or a VelocityLimits
+        self.limits = None
+        if velocity_limits:
+            self.limits = velocity_limits if isinstance(velocity_limits, VelocityLimits) \
+                else VelocityLimits(velocity_limits, clock or time.time)
+            self._warm_limits()
+
+        # Optional write-behind ledger: inserts are batched into group commits
+        self.journal = None
+        if write_behind:
+            self.journal = TransactionJournal(db_name, journal_batch_size, journal_flush_interval, clock)
+
+    def _waiting(self, phase, context):
+        """Returns context, timed as phase while it is being entered if metrics are on."""
+        if self.metrics is None:
+            return context
+        return self.metrics.waiting(phase, context)
+
+    def _timing(self, phase):
+        """Returns a context that times its body as phase if metrics are on."""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.timing(phase)
 
     def execute_query(self, query, params=(), fetch_one=False, fetch_all=False):
-        """Executes a query with thread-safe database access."""
-        with self.lock:
-            connection = sqlite3.connect(self.db_name)
-            cursor = connection.cursor()
-            cursor.execute(query, params)
-            connection.commit()
+        """Executes a query on a pooled connection; each thread has its own connection."""
+        with self._waiting("connection", self.pool.connection()) as connection, self._timing("sqlite"):
+            cursor = connection.execute(query, params)
 
             result = None
             if fetch_one:
@@ -26,18 +183,121 @@ class AccountManager:
             elif fetch_all:
                 result = cursor.fetchall()
 
-            connection.close()
             return result
 
+    def write_locks(self, account_ids=(), atm_ids=()):
+        """Holds the lock stripes of the given accounts, then of the given ATMs."""
+        return self._waiting(
+            "lock_wait", hold_in_order((self.account_locks, account_ids), (self.atm_locks, atm_ids))
+        )
+
+    @contextmanager
+    def transaction(self):
+        """Runs a block as one BEGIN IMMEDIATE transaction; any exception rolls it back."""
+        with self._waiting("connection", self.pool.connection()) as connection, \
+                self._waiting("lock_wait", self.writer_lock):
+            cursor = connection.cursor()
+            with self._timing("sqlite"):
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    yield cursor
+                except BaseException:
+                    connection.rollback()
+                    raise
+            with self._timing("commit"):
+                connection.commit()
+
+    def _warm_limits(self):
+        """Loads the withdrawals still inside the limit windows from the ledger and its archives."""
+        now = self.limits.clock()
+        self.limits.warm(self.recent_withdrawals(now - self.limits.horizon, now))
+
+    def recent_withdrawals(self, since, until):
+        """Returns (account_id, atm_id, amount, epoch seconds) of withdrawals from since to until, oldest first.
+
+        Archived months are included. Rows after until can exist when the clock is a
+        simulation's; they are left out.
+        """
+        since_text = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(since))
+        rows = self.execute_query(VELOCITY_WARM_QUERY, (since, until), fetch_all=True)
+        for _, path, _, max_timestamp in self.execute_query(PARTITIONS_QUERY, fetch_all=True):
+            if max_timestamp >= since_text:  # A month archived since the window started
+                rows += self.archives.fetch_all(path, VELOCITY_WARM_QUERY, (since, until))
+        rows.sort(key=lambda row: row[3])
+        return rows
+
+    def flush(self, timeout=None):
+        """Waits until queued ledger entries are committed; a no-op without write-behind."""
+        if self.journal is None:
+            return True
+        return self.journal.flush(timeout)
+
+    def close(self):
+        """Commits queued ledger entries and closes all pooled database connections."""
+        if self.recorder is not None:
+            self.recorder.close(self)
+        try:
+            if self.journal is not None:
+                self.journal.close()  # Raises if queued entries could not be written
+        finally:
+            if self.metrics_dumper is not None:
+                self.metrics_dumper.close()
+            self.archives.close()
+            self.pool.close()
+
+    def stats(self):
+        """Returns the per-method metrics snapshot, or None when metrics are off."""
+        if self.metrics is None:
+            return None
+        return self.metrics.stats()
+
+    def explain_query_plans(self):
+        """Returns the EXPLAIN QUERY PLAN steps of every hot query."""
+        plans = {}
+        with self.pool.connection() as connection:
+            for name, (query, params) in HOT_QUERIES.items():
+                rows = connection.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+                plans[name] = [row[3] for row in rows]
+        return plans
+
+    def check_query_plans(self):
+        """Raises RuntimeError if a hot query scans a whole table or sorts in a temp B-tree."""
+        problems = []
+        for name, steps in self.explain_query_plans().items():
+            for step in steps:
+                if step.startswith("SCAN") or "TEMP B-TREE" in step:
+                    problems.append(f"{name}: {step}")
+        if problems:
+            raise RuntimeError("Hot queries without a usable index:\n" + "\n".join(problems))
+
+    def cache_stats(self):
+        """Returns hit/miss counters of the account cache."""
+        return self.cache.stats()
+
     def authenticate_user(self, account_id, password):
-        """Validates user credentials."""
-        query = "SELECT * FROM accounts WHERE account_id = ? AND password = ?"
+        """Validates user credentials; returns a Session, or None if they are wrong."""
+        name_epoch = self.cache.epoch(("name", account_id))
+        balance_epoch = self.cache.epoch(("balance", account_id))
+        query = "SELECT account_holder_name, balance FROM accounts WHERE account_id = ? AND password = ?"
         result = self.execute_query(query, (account_id, password), fetch_one=True)
-        return result is not None
+        if result is None:
+            return None
+
+        self.cache.fill(("name", account_id), result[0], name_epoch)
+        self.cache.fill(("balance", account_id), result[1], balance_epoch)
+        return Session(account_id, result[0], result[1], self.session_ttl)
 
-    def get_balance(self, account_id):
+    def get_balance(self, account):
         """Retrieves the current balance of an account."""
+        account_id = self.resolve_account(account)
         try:
+            balance = self.cache.get(("balance", account_id))
+            if balance is not MISSING:
+                if isinstance(account, Session):
+                    account.balance = balance
+                return balance
+
+            epoch = self.cache.epoch(("balance", account_id))
             query = "SELECT balance FROM accounts WHERE account_id = ?"
             result = self.execute_query(query, (account_id,), fetch_one=True)
             
@@ -45,100 +305,292 @@ class AccountManager:
                 print(f"No account found with ID {account_id}")
                 return None
             
+            self.cache.fill(("balance", account_id), result[0], epoch)
+            if isinstance(account, Session):
+                account.balance = result[0]
             return result[0]
         except Exception as e:
             print(f"Error retrieving balance for account {account_id}: {e}")
             return None
 
-    def deposit(self, account_id, amount, atm_id):
-        """Deposits an amount into an account and updates the ATM cash level."""
-        if amount <= 0:
-            raise ValueError("Deposit amount must be greater than zero.")
+    def _credit_account(self, cursor, account_id, amount):
+        """Adds amount to an account inside the caller's transaction; returns the new balance."""
+        update_query = "UPDATE accounts SET balance = balance + ? WHERE account_id = ? RETURNING balance"
+        result = cursor.execute(update_query, (amount, account_id)).fetchone()
+        if result is None:
+            raise ValueError("Account does not exist.")
+        return result[0]
 
-        # Update the account balance
-        update_query = "UPDATE accounts SET balance = balance + ? WHERE account_id = ?"
-        self.execute_query(update_query, (amount, account_id))
+    def _debit_account(self, cursor, account_id, amount):
+        """Takes amount from an account only if it can cover it; returns the new balance."""
+        update_balance_query = """
+            UPDATE accounts SET balance = balance - ?
+            WHERE account_id = ? AND balance >= ?
+            RETURNING balance
+        """
+        result = cursor.execute(update_balance_query, (amount, account_id, amount)).fetchone()
+        if result is None:
+            cursor.execute("SELECT 1 FROM accounts WHERE account_id = ?", (account_id,))
+            if cursor.fetchone() is None:
+                raise ValueError("Account does not exist.")
+            raise ValueError("Insufficient balance in the account.")
+        return result[0]
 
-        # Update the ATM cash level
+    def _accept_cash(self, cursor, atm_id, amount):
+        """Adds deposited cash to an ATM inside the caller's transaction."""
         update_atm_query = "UPDATE atms SET cash_level = cash_level + ? WHERE atm_id = ?"
-        self.execute_query(update_atm_query, (amount, atm_id))
-
-        # Log the transaction
-        log_query = "INSERT INTO transactions (account_id, transaction_type, amount) VALUES (?, 'Deposit', ?)"
-        self.execute_query(log_query, (account_id, amount))
-
+        cursor.execute(update_atm_query, (amount, atm_id))
+        if cursor.rowcount == 0:
+            raise ValueError("ATM not found.")
 
-    def withdraw(self, account_id, amount, atm_id):
-        """Withdraws an amount from an account, considering ATM cash levels."""
-        if amount <= 0:
-            raise ValueError("Withdrawal amount must be greater than zero.")
+    def _dispense_cash(self, cursor, atm_id, amount):
+        """Takes cash out of an ATM only if it holds enough."""
+        update_atm_query = """
+            UPDATE atms SET cash_level = cash_level - ?
+            WHERE atm_id = ? AND cash_level >= ?
+        """
+        cursor.execute(update_atm_query, (amount, atm_id, amount))
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT cash_level FROM atms WHERE atm_id = ?", (atm_id,))
+            result = cursor.fetchone()
+            if result is None:
+                raise ValueError("ATM not found.")
+            raise ValueError(
+                f"ATM does not have enough cash. Available: {result[0]}. Try a smaller amount."
+            )
 
-        # Check account balance
-        current_balance = self.get_balance(account_id)
-        if current_balance is None:
-            raise ValueError("Account does not exist.")
-        if current_balance < amount:
-            raise ValueError("Insufficient balance in the account.")
+    def _ledger_timestamp(self):
+        """Returns the clock's time as a ledger timestamp, or None to use the database's."""
+        if self.clock is None:
+            return None
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.clock()))
 
-        # Check ATM cash level
-        connection = sqlite3.connect(self.db_name)
-        cursor = connection.cursor()
+    def _insert_ledger(self, cursor, account_id, atm_id, transaction_type, amount):
+        """Logs a transaction inside the caller's transaction."""
+        cursor.execute(LEDGER_INSERT_QUERY, (account_id, atm_id, transaction_type, amount, self._ledger_timestamp()))
 
-        cursor.execute("SELECT cash_level FROM atms WHERE atm_id = ?", (atm_id,))
-        result = cursor.fetchone()
+    @contextmanager
+    def balance_transaction(self, account_ids):
+        """Runs transaction() for a block that changes the given balances.
 
-        if not result:
-            connection.close()
-            raise ValueError("ATM not found.")
+        If it fails with a database error the COMMIT may or may not have happened, so
+        their cached balances are dropped before the error is re-raised.
+        """
+        try:
+            with self.transaction() as cursor:
+                yield cursor
+        except sqlite3.Error:
+            for account_id in account_ids:
+                self.cache.invalidate(("balance", account_id))
+            raise
+
+    def _balance_committed(self, account, account_id, balance):
+        """Writes a committed balance through to the cache and the caller's Session."""
+        self.cache.put(("balance", account_id), balance)
+        if isinstance(account, Session):
+            account.balance = balance
+
+    def deposit(self, account, amount, atm_id):
+        """Deposits an amount into an account and updates the ATM cash level."""
+        account_id = self.resolve_account(account)
+        if amount <= 0:
+            raise ValueError("Deposit amount must be greater than zero.")
 
-        atm_cash_level = result[0]
+        with self.write_locks([account_id], [atm_id]):
+            with self.balance_transaction([account_id]) as cursor:
+                balance = self._credit_account(cursor, account_id, amount)
+                self._accept_cash(cursor, atm_id, amount)
+                if self.journal is None:
+                    self._insert_ledger(cursor, account_id, atm_id, "Deposit", amount)
 
-        if atm_cash_level < amount:
-            connection.close()
-            raise ValueError(
-                f"ATM does not have enough cash. Available: {atm_cash_level}. Try a smaller amount."
-            )
+            self._balance_committed(account, account_id, balance)
 
-        # Update account balance
-        update_balance_query = "UPDATE accounts SET balance = balance - ? WHERE account_id = ?"
-        cursor.execute(update_balance_query, (amount, account_id))
+        if self.journal is not None:
+            self.journal.append(account_id, "Deposit", amount, atm_id)
 
-        # Update ATM cash level
-        update_atm_query = "UPDATE atms SET cash_level = cash_level - ? WHERE atm_id = ?"
-        cursor.execute(update_atm_query, (amount, atm_id))
+    def withdraw(self, account, amount, atm_id):
+        """Withdraws an amount from an account, considering ATM cash levels."""
+        account_id = self.resolve_account(account)
+        if amount <= 0:
+            raise ValueError("Withdrawal amount must be greater than zero.")
 
-        # Log the transaction
-        log_query = """
-            INSERT INTO transactions (account_id, transaction_type, amount) 
-            VALUES (?, 'Withdrawal', ?)
+        with self.write_locks([account_id], [atm_id]):
+            # The stripes are held until record(), so no other withdrawal on this card or
+            # ATM can pass its check in between
+            if self.limits is not None:
+                self.limits.check(account_id, atm_id, amount)
+            with self.balance_transaction([account_id]) as cursor:
+                balance = self._debit_account(cursor, account_id, amount)
+                self._dispense_cash(cursor, atm_id, amount)
+                if self.journal is None:
+                    self._insert_ledger(cursor, account_id, atm_id, "Withdrawal", amount)
+
+            self._balance_committed(account, account_id, balance)
+            if self.limits is not None:
+                self.limits.record(account_id, atm_id, amount)
+
+        if self.journal is not None:
+            self.journal.append(account_id, "Withdrawal", amount, atm_id)
+
+    def replenish_atm(self, atm_id, cash_level):
+        """Refills an ATM's cassettes to cash_level; returns the cash added (negative if removed)."""
+        if cash_level < 0:
+            raise ValueError("Cash level cannot be negative.")
+        with self.write_locks(atm_ids=[atm_id]):
+            with self.transaction() as cursor:
+                cursor.execute("SELECT cash_level FROM atms WHERE atm_id = ?", (atm_id,))
+                result = cursor.fetchone()
+                if result is None:
+                    raise ValueError("ATM not found.")
+                cursor.execute("UPDATE atms SET cash_level = ? WHERE atm_id = ?", (cash_level, atm_id))
+        return cash_level - result[0]
+
+    def apply_batch(self, operations, chunk_size=1000):
+        """Applies many deposits and withdrawals, one transaction per chunk of operations.
+
+        operations is an iterable of (operation, account, amount, atm_id) records, where
+        operation is "deposit" or "withdraw" and atm_id may be None for money that moves
+        no ATM cash (e.g. cheque settlement). Records are applied in order, and each
+        one succeeds or fails on its own. Returns one (True, new balance) or (False,
+        error message) per record, in input order. A chunk that hits a database error
+        is rolled back and each of its records reports that error.
         """
-        cursor.execute(log_query, (account_id, amount))
+        results = []
+        for chunk in chunked(operations, chunk_size):
+            results.extend(self._apply_chunk(chunk))
+        return results
+
+    def _apply_chunk(self, chunk):
+        """Checks a chunk against balances read inside its transaction, then writes only the net result."""
+        results = [None] * len(chunk)
+        pending = []
+        for index, (operation, account, amount, atm_id) in enumerate(chunk):
+            kind = BATCH_OPERATIONS.get(str(operation).lower())
+            try:
+                if kind is None:
+                    raise ValueError(f"Unknown operation '{operation}'. Use 'deposit' or 'withdraw'.")
+                account_id = self.resolve_account(account)
+                if amount <= 0:
+                    raise ValueError(f"{kind} amount must be greater than zero.")
+            except ValueError as e:
+                results[index] = (False, str(e))
+                continue
+            pending.append((index, kind, account_id, amount, atm_id))
+
+        account_ids = sorted({account_id for _, _, account_id, _, _ in pending})
+        atm_ids = sorted({atm_id for _, _, _, _, atm_id in pending if atm_id is not None})
+        ledger = []
+        with self.write_locks(account_ids, atm_ids):
+            try:
+                with self.balance_transaction(account_ids) as cursor:
+                    balances = self._read_column(cursor, "accounts", "account_id", "balance", account_ids)
+                    cash_levels = self._read_column(cursor, "atms", "atm_id", "cash_level", atm_ids)
+                    changed_accounts, changed_atms = set(), set()
+
+                    for index, kind, account_id, amount, atm_id in pending:
+                        if account_id not in balances:
+                            results[index] = (False, "Account does not exist.")
+                            continue
+                        # Same checks, in the same order, as withdraw() and deposit()
+                        if kind == "Withdrawal" and balances[account_id] < amount:
+                            results[index] = (False, "Insufficient balance in the account.")
+                            continue
+                        if atm_id is not None and atm_id not in cash_levels:
+                            results[index] = (False, "ATM not found.")
+                            continue
+                        if kind == "Withdrawal" and atm_id is not None and cash_levels[atm_id] < amount:
+                            results[index] = (False, f"ATM does not have enough cash. Available: "
+                                                     f"{cash_levels[atm_id]}. Try a smaller amount.")
+                            continue
+
+                        change = -amount if kind == "Withdrawal" else amount
+                        balances[account_id] += change
+                        changed_accounts.add(account_id)
+                        if atm_id is not None:
+                            cash_levels[atm_id] += change
+                            changed_atms.add(atm_id)
+                        results[index] = (True, balances[account_id])
+                        ledger.append((account_id, atm_id, kind, amount))
+
+                    cursor.executemany("UPDATE accounts SET balance = ? WHERE account_id = ?",
+                                       [(balances[i], i) for i in changed_accounts])
+                    cursor.executemany("UPDATE atms SET cash_level = ? WHERE atm_id = ?",
+                                       [(cash_levels[i], i) for i in changed_atms])
+                    if self.journal is None:
+                        timestamp = self._ledger_timestamp()
+                        cursor.executemany(LEDGER_INSERT_QUERY, [row + (timestamp,) for row in ledger])
+            except sqlite3.Error as e:
+                for index, _, _, _, _ in pending:
+                    results[index] = (False, f"Database error: {e}")
+                return results
+
+            for account_id in changed_accounts:
+                self.cache.put(("balance", account_id), balances[account_id])
+            # Batches are not held to the limits, but their withdrawals count towards them
+            if self.limits is not None:
+                for account_id, atm_id, kind, amount in ledger:
+                    if kind == "Withdrawal":
+                        self.limits.record(account_id, atm_id, amount)
+
+        if self.journal is not None:
+            for account_id, atm_id, kind, amount in ledger:
+                self.journal.append(account_id, kind, amount, atm_id)
+        return results
+
+    def _read_column(self, cursor, table, id_column, column, ids, chunk_size=500):
+        """Returns {id: column} for the given ids, read inside the caller's transaction."""
+        values = {}
+        for chunk in chunked(ids, chunk_size):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT {id_column}, {column} FROM {table} WHERE {id_column} IN ({placeholders})", chunk)
+            values.update(cursor.fetchall())
+        return values
+
+    def log_transaction(self, account, transaction_type, amount, atm_id=None):
+        """Logs a transaction."""
+        account_id = self.resolve_account(account)
+        if self.journal is not None:
+            self.journal.append(account_id, transaction_type, amount, atm_id)
+            return
 
-        connection.commit()
-        connection.close()
+        self.execute_query(LEDGER_INSERT_QUERY, (account_id, atm_id, transaction_type, amount, self._ledger_timestamp()))
 
+    def get_transaction_page(self, account, limit=20, cursor=None, order="newest_first"):
+        """Returns one page of transaction rows and the cursor for the next page.
 
-    def log_transaction(self, account_id, transaction_type, amount):
-        """Logs a transaction."""
-        query = "INSERT INTO transactions (account_id, transaction_type, amount) VALUES (?, ?, ?)"
-        self.execute_query(query, (account_id, transaction_type, amount))
-
-    def get_transaction_history(self, account_id):
-        """Retrieves the transaction history for an account and formats it."""
-        query = "SELECT * FROM transactions WHERE account_id = ? ORDER BY timestamp DESC LIMIT 3"
-        transactions = self.execute_query(query, (account_id,), fetch_all=True)
-        
-        # Format each transaction tuple into a user-friendly string
-        formatted_transactions = [
-            f"Type: {transaction[2]}\n, Amount: ${float(transaction[3]):.2f}\n, Time: {transaction[4]}\n --------\n"
-            for transaction in transactions
-        ]
-        return formatted_transactions
-    
-    def get_account_name(self, account_id):
-        """Retrieves the transaction history for an account."""
+        Rows are (transaction_id, account_id, transaction_type, amount, timestamp). Pass
+        the returned cursor back to fetch the following page; it is None after the last
+        page. Each page is an index range seek, so deep pages cost the same as the first.
+        Months archived by transaction_archive.py are read from their archive files.
+        """
+        account_id = self.resolve_account(account)
+        newest_first = self._check_order(order)
+
+        if cursor is None:
+            query, params = FIRST_PAGE_QUERIES[order], (account_id, limit)
+        else:
+            timestamp, transaction_id = cursor
+            query, params = TRANSACTION_PAGE_QUERIES[order], (account_id, timestamp, transaction_id, limit)
+
+        with self._waiting("connection", self.pool.connection()) as connection, self._timing("sqlite"):
+            rows = self._read_page(connection, query, params, limit, cursor, newest_first)
+        return rows, self._next_cursor(rows, limit)
+
+    def get_account_name(self, account):
+        """Retrieves the account holder's name."""
+        if isinstance(account, Session):
+            self.resolve_account(account)
+            return account.name
+
+        account_id = account
+        name = self.cache.get(("name", account_id))
+        if name is not MISSING:
+            return name
+
+        epoch = self.cache.epoch(("name", account_id))
         query = "SELECT account_holder_name FROM accounts WHERE account_id = ? "
         result=self.execute_query(query, (account_id,), fetch_one=True)
+        self.cache.fill(("name", account_id), result[0], epoch)
         return result[0]
     
 
@@ -1,24 +1,296 @@
+import argparse
+import calendar
 import sqlite3
 import random
 import string
 import threading
+import time
 from datetime import datetime
+from itertools import islice
+
+LOCATIONS = ["Downtown", "Uptown", "Airport", "Mall", "University"]
+NAME_CHARACTERS = string.ascii_letters + " "
+
+# Settings that trade durability for speed while the database is bulk loaded
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",  # 256 MiB page cache
+]
+
+# Settings restored once the load is finished, matching the connection pool
+RUNTIME_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+]
+
+# PRAGMA auto_vacuum value of a file that can be shrunk with PRAGMA incremental_vacuum
+INCREMENTAL_VACUUM = 2
+
+# Built after the bulk load so inserts do not pay for index maintenance.
+# Each index covers the columns its hot query reads, so lookups never touch the table.
+SECONDARY_INDEXES = [
+    # Transaction history pages: WHERE account_id = ? ORDER BY timestamp, transaction_id
+    ("transactions", """
+        CREATE INDEX IF NOT EXISTS idx_transactions_account_timestamp_id
+        ON transactions (account_id, timestamp, transaction_id, transaction_type, amount)
+    """),
+    # Active ATM listing: WHERE status = ?
+    ("atms", """
+        CREATE INDEX IF NOT EXISTS idx_atms_status_location
+        ON atms (status, location)
+    """),
+    # Fleet-wide daily report: WHERE day = ?
+    ("atm_daily_totals", """
+        CREATE INDEX IF NOT EXISTS idx_atm_daily_totals_day
+        ON atm_daily_totals (day)
+    """),
+]
+
+# Indexes superseded by the covering indexes above
+OBSOLETE_INDEXES = [
+    "idx_transactions_account_id",
+    "idx_transactions_account_timestamp",
+]
+
+# Months of the ledger moved out to archive files by transaction_archive.py; history
+# reads consult this table to know which archives to look in
+PARTITION_TABLE = """
+    CREATE TABLE IF NOT EXISTS transaction_partitions (
+        period TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        min_timestamp TEXT,
+        max_timestamp TEXT
+    ) WITHOUT ROWID
+"""
+
+
+# Per-ATM, per-day cash totals and per-day counts by transaction type, kept current by
+# the triggers below so reports never have to scan the transactions table
+AGGREGATE_TABLES = {
+    "atm_daily_totals": """
+        CREATE TABLE atm_daily_totals (
+            atm_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            cash_dispensed REAL NOT NULL DEFAULT 0,
+            cash_deposited REAL NOT NULL DEFAULT 0,
+            withdrawal_count INTEGER NOT NULL DEFAULT 0,
+            deposit_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (atm_id, day)
+        ) WITHOUT ROWID
+    """,
+    "daily_transaction_counts": """
+        CREATE TABLE daily_transaction_counts (
+            day TEXT NOT NULL,
+            transaction_type TEXT NOT NULL,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, transaction_type)
+        ) WITHOUT ROWID
+    """,
+}
+
+# Rebuild an aggregate table from the ledger in one set-based pass
+AGGREGATE_BACKFILLS = {
+    "atm_daily_totals": """
+        INSERT INTO atm_daily_totals
+            (atm_id, day, cash_dispensed, cash_deposited, withdrawal_count, deposit_count)
+        SELECT atm_id, date(timestamp),
+               TOTAL(CASE WHEN transaction_type = 'Withdrawal' THEN amount END),
+               TOTAL(CASE WHEN transaction_type = 'Deposit' THEN amount END),
+               SUM(transaction_type = 'Withdrawal'),
+               SUM(transaction_type = 'Deposit')
+        FROM transactions WHERE atm_id IS NOT NULL
+        GROUP BY atm_id, date(timestamp)
+    """,
+    "daily_transaction_counts": """
+        INSERT INTO daily_transaction_counts (day, transaction_type, transaction_count, total_amount)
+        SELECT date(timestamp), transaction_type, COUNT(*), TOTAL(amount)
+        FROM transactions GROUP BY date(timestamp), transaction_type
+    """,
+}
+
+# Fire inside the transaction that inserts the ledger row, so the totals commit with it
+AGGREGATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_atm_daily_totals
+    AFTER INSERT ON transactions WHEN NEW.atm_id IS NOT NULL
+    BEGIN
+        INSERT INTO atm_daily_totals
+            (atm_id, day, cash_dispensed, cash_deposited, withdrawal_count, deposit_count)
+        VALUES (
+            NEW.atm_id, date(NEW.timestamp),
+            CASE WHEN NEW.transaction_type = 'Withdrawal' THEN NEW.amount ELSE 0 END,
+            CASE WHEN NEW.transaction_type = 'Deposit' THEN NEW.amount ELSE 0 END,
+            NEW.transaction_type = 'Withdrawal',
+            NEW.transaction_type = 'Deposit'
+        )
+        ON CONFLICT (atm_id, day) DO UPDATE SET
+            cash_dispensed = cash_dispensed + excluded.cash_dispensed,
+            cash_deposited = cash_deposited + excluded.cash_deposited,
+            withdrawal_count = withdrawal_count + excluded.withdrawal_count,
+            deposit_count = deposit_count + excluded.deposit_count;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_daily_counts
+    AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO daily_transaction_counts (day, transaction_type, transaction_count, total_amount)
+        VALUES (date(NEW.timestamp), NEW.transaction_type, 1, NEW.amount)
+        ON CONFLICT (day, transaction_type) DO UPDATE SET
+            transaction_count = transaction_count + 1,
+            total_amount = total_amount + excluded.total_amount;
+    END
+    """,
+]
+
+
+def parse_utc(text):
+    """Returns epoch seconds for 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' in UTC."""
+    text = text if " " in text else text + " 00:00:00"
+    return calendar.timegm(time.strptime(text, "%Y-%m-%d %H:%M:%S"))
+
+
+def chunked(rows, size):
+    """Yields lists of at most size items from an iterator."""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def shard_ids(count, shard_index=0, shard_count=1):
+    """Returns the ids in 1..count that belong to a shard (id % shard_count == shard_index)."""
+    if not 0 <= shard_index < shard_count:
+        raise ValueError("Shard index must be between 0 and shard_count - 1.")
+    first = shard_index if shard_index > 0 else shard_count
+    return range(first, count + 1, shard_count)
+
+
+def migrate_database(connection):
+    """Brings an existing database up to the current schema, indexes and aggregates."""
+    started = not connection.in_transaction
+    if started:
+        connection.execute("BEGIN IMMEDIATE")
+    try:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+        if "transactions" in tables:
+            # The ledger records which ATM handled each transaction
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(transactions)")}
+            if "atm_id" not in columns:
+                connection.execute("ALTER TABLE transactions ADD COLUMN atm_id INTEGER REFERENCES atms(atm_id)")
+
+            # New aggregate tables are backfilled from the ledger once, before the triggers exist
+            for table, statement in AGGREGATE_TABLES.items():
+                if table not in tables:
+                    connection.execute(statement)
+                    connection.execute(AGGREGATE_BACKFILLS[table])
+            for statement in AGGREGATE_TRIGGERS:
+                connection.execute(statement)
+            tables.update(AGGREGATE_TABLES)
+            connection.execute(PARTITION_TABLE)
+
+        for table, statement in SECONDARY_INDEXES:
+            if table in tables:
+                connection.execute(statement)
+        for index in OBSOLETE_INDEXES:
+            connection.execute(f"DROP INDEX IF EXISTS {index}")
+    except BaseException:
+        if started:
+            connection.execute("ROLLBACK")
+        raise
+    if started:
+        connection.execute("COMMIT")
+
 
 class Database:
-    def __init__(self, db_name):
+    def __init__(self, db_name, chunk_size=50000):
         self.db_name = db_name
+        self.chunk_size = chunk_size  # Rows generated and inserted per executemany call
         self.lock = threading.Lock()  # Replace with a threading lock if needed
 
-    def create_and_populate_database(self):
-        """Creates and populates the database with initial data."""
+    def generate_accounts(self, account_ids, rng):
+        """Yields (account_id, name, password, balance) rows for random accounts."""
+        choices = rng.choices
+        randrange = rng.randrange
+        uniform = rng.uniform
+        for account_id in account_ids:
+            name = ''.join(choices(NAME_CHARACTERS, k=10))
+            password = f"{randrange(10000):04d}"  # Four-digit PIN
+            balance = round(uniform(1000.0, 10000.0), 2)
+            yield (account_id, name, password, balance)
+
+    def generate_atms(self, atm_ids, rng):
+        """Yields (atm_id, location, cash_level, status) rows for random ATMs."""
+        for atm_id in atm_ids:
+            location = rng.choice(LOCATIONS) + str(rng.randint(1, 100))  # Randomize location names
+            cash_level = round(rng.uniform(1000.0, 20000.0), 2)
+            status = rng.choice(["Active", "Inactive"])
+            yield (atm_id, location, cash_level, status)
+
+    def generate_transactions(self, count, account_ids, atm_ids, rng, start, end):
+        """Yields (account_id, atm_id, type, amount, unix_time) rows spread evenly between start and end."""
+        rand = rng.random
+        step = (end - start) / count if count else 0
+        account_count = len(account_ids)
+        atm_count = len(atm_ids)
+        for i in range(count):
+            account_id = account_ids[int(rand() * account_count)]  # Randomly pick an account ID
+            atm_id = atm_ids[int(rand() * atm_count)] if atm_count else None
+            transaction_type = "Deposit" if rand() < 0.5 else "Withdrawal"
+            amount = round(50.0 + rand() * 950.0, 2)
+            yield (account_id, atm_id, transaction_type, amount, int(start + (i + rand()) * step))
+
+    def insert_rows(self, cursor, query, rows):
+        """Inserts rows in fixed-size chunks so memory use stays flat."""
+        for chunk in chunked(rows, self.chunk_size):
+            cursor.executemany(query, chunk)
+
+    def create_indexes(self, cursor):
+        """Builds the aggregate tables, their triggers and the secondary indexes."""
+        migrate_database(cursor.connection)
+
+    def create_and_populate_database(self, num_accounts=100, num_atms=100, num_transactions=100,
+                                     history_days=365, seed=None, shard_index=0, shard_count=1, end=None):
+        """Creates and populates the database with initial data.
+
+        With shard_count > 1 only the accounts and ATMs whose id maps to shard_index
+        (id % shard_count) are created, so every id is unique across all shard files.
+        The ledger covers the history_days before end (epoch seconds, default now); pass
+        a fixed end with a seed to get the same dataset on every run.
+        """
+        rng = random.Random(seed)
+        end = time.time() if end is None else end
+        start = end - history_days * 86400
+        account_ids = shard_ids(num_accounts, shard_index, shard_count)
+        atm_ids = shard_ids(num_atms, shard_index, shard_count)
+
         with self.lock:
-            connection = sqlite3.connect(self.db_name)
+            connection = sqlite3.connect(self.db_name, isolation_level=None)
             cursor = connection.cursor()
 
+            for pragma in BULK_LOAD_PRAGMAS:
+                cursor.execute(pragma)
+
             # Drop existing tables if they exist
             cursor.execute("DROP TABLE IF EXISTS accounts")
             cursor.execute("DROP TABLE IF EXISTS atms")
             cursor.execute("DROP TABLE IF EXISTS transactions")
+            for table in AGGREGATE_TABLES:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute("DROP TABLE IF EXISTS transaction_partitions")  # Old archives no longer apply
+
+            # Lets transaction_archive.py hand freed pages back while ATMs keep running. The
+            # mode only changes on an empty file, so a reused one is vacuumed first.
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL_VACUUM:
+                cursor.execute("VACUUM")
 
             # Create the accounts table
             cursor.execute("""
@@ -48,55 +320,72 @@ class Database:
                     transaction_type TEXT NOT NULL,
                     amount REAL NOT NULL,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (account_id) REFERENCES accounts(account_id)
+                    atm_id INTEGER,
+                    FOREIGN KEY (account_id) REFERENCES accounts(account_id),
+                    FOREIGN KEY (atm_id) REFERENCES atms(atm_id)
                 )
             """)
 
-            # Generate and populate the accounts table with 100 random accounts
-            accounts = []
-            for _ in range(100):
-                name = ''.join(random.choices(string.ascii_letters + " ", k=10))
-                password = ''.join(random.choices(string.digits, k=4))
-                balance = round(random.uniform(1000.0, 10000.0), 2)
-                accounts.append((name, password, balance))
-
-            cursor.executemany(
-                "INSERT INTO accounts (account_holder_name, password, balance) VALUES (?, ?, ?)",
-                accounts
-            )
+            cursor.execute("BEGIN")
 
-            # Generate and populate the ATMs table with 100 random ATMs
-            atms = []
-            locations = ["Downtown", "Uptown", "Airport", "Mall", "University"]
-            for _ in range(100):
-                location = random.choice(locations) + str(random.randint(1, 100))  # Randomize location names
-                cash_level = round(random.uniform(1000.0, 20000.0), 2)
-                status = random.choice(["Active", "Inactive"])
-                atms.append((location, cash_level, status))
-
-            cursor.executemany(
-                "INSERT INTO atms (location, cash_level, status) VALUES (?, ?, ?)",
-                atms
+            self.insert_rows(
+                cursor,
+                "INSERT INTO accounts (account_id, account_holder_name, password, balance) VALUES (?, ?, ?, ?)",
+                self.generate_accounts(account_ids, rng)
             )
 
-            # Generate and populate the transactions table with 100 random transactions
-            transactions = []
-            for _ in range(100):
-                account_id = random.randint(1, 100)  # Randomly pick an account ID
-                transaction_type = random.choice(["Deposit", "Withdrawal"])
-                amount = round(random.uniform(50.0, 1000.0), 2)
-                transactions.append((account_id, transaction_type, amount))
-
-            cursor.executemany(
-                "INSERT INTO transactions (account_id, transaction_type, amount) VALUES (?, ?, ?)",
-                transactions
+            self.insert_rows(
+                cursor,
+                "INSERT INTO atms (atm_id, location, cash_level, status) VALUES (?, ?, ?, ?)",
+                self.generate_atms(atm_ids, rng)
             )
 
-            connection.commit()
+            # Ledger rows live with their account; the ATM may belong to any shard
+            if account_ids:
+                self.insert_rows(
+                    cursor,
+                    """
+                    INSERT INTO transactions (account_id, atm_id, transaction_type, amount, timestamp)
+                    VALUES (?, ?, ?, ?, datetime(?, 'unixepoch'))
+                    """,
+                    self.generate_transactions(num_transactions, account_ids, range(1, num_atms + 1), rng, start, end)
+                )
+
+            self.create_indexes(cursor)
+            cursor.execute("COMMIT")
+
+            cursor.execute("PRAGMA analysis_limit=1000")  # Sample instead of scanning every row
+            cursor.execute("ANALYZE")
+            for pragma in RUNTIME_PRAGMAS:
+                cursor.execute(pragma)
+
             connection.close()
             print("Database created and populated successfully!")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and populate the ATM simulator database.")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--accounts", type=int, default=100, help="number of accounts")
+    parser.add_argument("--atms", type=int, default=100, help="number of ATMs")
+    parser.add_argument("--transactions", type=int, default=100, help="number of ledger rows")
+    parser.add_argument("--history-days", type=int, default=365,
+                        help="spread ledger timestamps over this many past days")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per executemany batch")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a repeatable dataset")
+    parser.add_argument("--end", type=parse_utc, default=None,
+                        help="end of the ledger history, 'YYYY-MM-DD[ HH:MM:SS]' UTC (default: now)")
+    parser.add_argument("--shard-index", type=int, default=0, help="shard this file holds")
+    parser.add_argument("--shard-count", type=int, default=1, help="total number of shard files")
+    args = parser.parse_args(argv)
+
+    started = datetime.now()
+    db = Database(args.db, chunk_size=args.chunk_size)
+    db.create_and_populate_database(args.accounts, args.atms, args.transactions,
+                                    args.history_days, args.seed, args.shard_index, args.shard_count, args.end)
+    print(f"Finished in {(datetime.now() - started).total_seconds():.1f}s")
+
+
 # Example usage
 if __name__ == "__main__":
-    db = Database("atm_simulator.db")
-    db.create_and_populate_database()
+    main()
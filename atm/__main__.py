@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules in this directory import each other by bare name (from Accountmanager import ...)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+sys.exit(main())
@@ -0,0 +1,398 @@
+"""Nightly cash analytics: demand per ATM and location, withdrawal-size percentiles and
+a forecast of when each ATM runs out of cash.
+
+The ledger is read once, in chunks of columns, from the database and any archived
+months it overlaps. With NumPy installed, each chunk is reduced with bincount; without
+it the same sums run as a plain loop over the chunk. The two agree up to floating-point
+rounding, since bincount adds the amounts in a different order.
+"""
+import argparse
+import math
+import sqlite3
+import string
+import time
+from array import array
+
+from Create_and_populate_database import parse_utc
+from shard_router import load_shard_map
+from transaction_archive import PARTITIONS_QUERY, resolve_archive
+
+try:
+    import numpy
+except ImportError:  # Optional: pip install numpy for the vectorised path
+    numpy = None
+
+DAY = 86400
+ATMS_QUERY = "SELECT atm_id, location, cash_level FROM atms"
+# ATM cash movements in [start, end), by transaction_id so each chunk resumes where the last ended
+LEDGER_CHUNK_QUERY = """
+    SELECT transaction_id, atm_id, transaction_type = 'Withdrawal', amount,
+           CAST(strftime('%s', timestamp) AS INTEGER)
+    FROM transactions
+    WHERE transaction_id > ? AND atm_id IS NOT NULL
+      AND transaction_type IN ('Deposit', 'Withdrawal')
+      AND timestamp >= datetime(?, 'unixepoch') AND timestamp < datetime(?, 'unixepoch')
+    ORDER BY transaction_id LIMIT ?
+"""
+
+
+def format_time(seconds):
+    """Returns epoch seconds as the ledger's 'YYYY-MM-DD HH:MM:SS' (UTC)."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(seconds))
+
+
+def location_area(location):
+    """'Downtown36' -> 'Downtown': the generated ATMs number their locations."""
+    return location.rstrip(string.digits) or location
+
+
+def open_readonly(path):
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def has_atm_column(connection):
+    """Returns whether the ledger records ATM ids; files older than the atm_id column do not."""
+    return "atm_id" in {row[1] for row in connection.execute("PRAGMA table_info(transactions)")}
+
+
+def ledger_sources(path, start, end):
+    """Returns the database and the archive files holding rows in [start, end).
+
+    The database is only read: a file that was never archived has no partition table.
+    """
+    connection = open_readonly(path)
+    try:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        partitions = connection.execute(PARTITIONS_QUERY).fetchall() if "transaction_partitions" in tables else []
+    finally:
+        connection.close()
+    sources = [path]
+    for _, archive, min_timestamp, max_timestamp in sorted(partitions):
+        if max_timestamp >= format_time(start) and min_timestamp < format_time(end):
+            sources.append(resolve_archive(path, archive))
+    return sources
+
+
+def read_ledger(paths, start, end, chunk_size=100000):
+    """Yields (atm_ids, is_withdrawal, amounts, timestamps) column tuples of ATM cash movements."""
+    for path in paths:
+        for source in ledger_sources(path, start, end):
+            connection = open_readonly(source)
+            try:
+                if not has_atm_column(connection):
+                    continue  # No ledger row of this file names an ATM
+                last_id = 0
+                while True:
+                    rows = connection.execute(LEDGER_CHUNK_QUERY, (last_id, start, end, chunk_size)).fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+                    _, atm_ids, kinds, amounts, timestamps = zip(*rows)
+                    yield atm_ids, kinds, amounts, timestamps
+            finally:
+                connection.close()
+
+
+def read_atms(paths):
+    """Returns [(atm_id, location, cash_level)] of every ATM in the files, by atm_id."""
+    atms = {}
+    for path in paths:
+        connection = open_readonly(path)
+        try:
+            for atm_id, location, cash_level in connection.execute(ATMS_QUERY):
+                atms[atm_id] = (atm_id, location, cash_level)
+        finally:
+            connection.close()
+    return [atms[atm_id] for atm_id in sorted(atms)]
+
+
+def percentile(ordered, q):
+    """Linear-interpolated percentile of sorted values (NumPy's default method)."""
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class LedgerSummary:
+    """Per-ATM sums from one pass over the ledger between start and end (epoch seconds).
+
+    Grids are flat, one row per ATM: hourly_* has 24 columns (hour of day, UTC) and
+    daily_* one column per calendar day from start_day. recent_net is each ATM's
+    withdrawals minus deposits since recent_since, the forecast's lookback; it is
+    clamped to start so the lookback never reaches before the rows that were read.
+    """
+
+    def __init__(self, atms, start, end, recent_since, use_numpy=None):
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        if self.use_numpy and numpy is None:
+            raise ValueError("NumPy is not installed; run without it or pip install numpy.")
+        self.atms = atms
+        self.areas = sorted({location_area(location) for _, location, _ in atms})
+        area_index = {area: i for i, area in enumerate(self.areas)}
+        self.atm_area = [area_index[location_area(location)] for _, location, _ in atms]
+        self.start, self.end, self.recent_since = start, end, max(recent_since, start)
+        self.start_day = start - start % DAY
+        self.days = max(1, math.ceil((end - self.start_day) / DAY))
+
+        count = len(atms)
+        if self.use_numpy:
+            self.ids = numpy.array([atm_id for atm_id, _, _ in atms], dtype=numpy.int64)
+            self.area_of = numpy.array(self.atm_area, dtype=numpy.int32)
+        else:
+            self.index_of = {atm_id: i for i, (atm_id, _, _) in enumerate(atms)}
+        zeros = self._zeros
+        self.hourly_withdrawn = zeros(count * 24)
+        self.hourly_deposited = zeros(count * 24)
+        self.daily_withdrawn = zeros(count * self.days)
+        self.daily_deposited = zeros(count * self.days)
+        self.recent_net = zeros(count)
+        self.withdrawal_counts = zeros(count)
+        self._amounts = []  # Withdrawal sizes: NumPy chunks, or one array("d")
+        self._amount_areas = []
+        if not self.use_numpy:
+            self._amounts, self._amount_areas = array("d"), array("l")
+
+    @property
+    def lookback_days(self):
+        """Length of the lookback in days, possibly fractional."""
+        return (self.end - self.recent_since) / DAY
+
+    def _zeros(self, size):
+        return numpy.zeros(size) if self.use_numpy else array("d", bytes(8 * size))
+
+    def add(self, atm_ids, kinds, amounts, timestamps):
+        if not self.atms:
+            return
+        if self.use_numpy:
+            self._add_arrays(atm_ids, kinds, amounts, timestamps)
+        else:
+            self._add_rows(atm_ids, kinds, amounts, timestamps)
+
+    def _add_arrays(self, atm_ids, kinds, amounts, timestamps):
+        count, days = len(self.atms), self.days
+        atm = numpy.asarray(atm_ids, dtype=numpy.int64)
+        withdrawal = numpy.asarray(kinds, dtype=bool)
+        amount = numpy.asarray(amounts, dtype=numpy.float64)
+        stamp = numpy.asarray(timestamps, dtype=numpy.int64)
+
+        index = numpy.minimum(numpy.searchsorted(self.ids, atm), count - 1)
+        known = self.ids[index] == atm  # Rows of ATMs in no file (or removed) are skipped
+        hour_cell = index * 24 + stamp // 3600 % 24
+        day_cell = index * days + (stamp - self.start_day) // DAY
+        recent = stamp >= self.recent_since
+
+        for mask, hourly, daily, sign in ((known & withdrawal, self.hourly_withdrawn, self.daily_withdrawn, 1),
+                                          (known & ~withdrawal, self.hourly_deposited, self.daily_deposited, -1)):
+            weights = amount[mask]
+            hourly += numpy.bincount(hour_cell[mask], weights, minlength=count * 24)
+            daily += numpy.bincount(day_cell[mask], weights, minlength=count * days)
+            self.recent_net += sign * numpy.bincount(index[mask & recent], amount[mask & recent], minlength=count)
+
+        withdrawn = known & withdrawal
+        self.withdrawal_counts += numpy.bincount(index[withdrawn], minlength=count)
+        self._amounts.append(amount[withdrawn])
+        self._amount_areas.append(self.area_of[index[withdrawn]])
+
+    def _add_rows(self, atm_ids, kinds, amounts, timestamps):
+        index_of, days, start_day, recent_since = self.index_of, self.days, self.start_day, self.recent_since
+        atm_area = self.atm_area
+        for atm_id, withdrawal, amount, stamp in zip(atm_ids, kinds, amounts, timestamps):
+            i = index_of.get(atm_id)
+            if i is None:
+                continue
+            hour_cell = i * 24 + stamp // 3600 % 24
+            day_cell = i * days + (stamp - start_day) // DAY
+            if withdrawal:
+                self.hourly_withdrawn[hour_cell] += amount
+                self.daily_withdrawn[day_cell] += amount
+                self.withdrawal_counts[i] += 1
+                self._amounts.append(amount)
+                self._amount_areas.append(atm_area[i])
+                if stamp >= recent_since:
+                    self.recent_net[i] += amount
+            else:
+                self.hourly_deposited[hour_cell] += amount
+                self.daily_deposited[day_cell] += amount
+                if stamp >= recent_since:
+                    self.recent_net[i] -= amount
+
+    def row(self, grid, i, width):
+        """Returns row i of a flat grid as floats."""
+        return [float(value) for value in grid[i * width:(i + 1) * width]]
+
+    def area_rows(self, grid, width):
+        """Returns {area: column sums over the area's ATMs} for a flat grid."""
+        if self.use_numpy:
+            rows = grid.reshape(len(self.atms), width)
+            area_of = self.area_of
+            return {area: rows[area_of == a].sum(axis=0).tolist() for a, area in enumerate(self.areas)}
+        sums = {area: [0.0] * width for area in self.areas}
+        for i, a in enumerate(self.atm_area):
+            total = sums[self.areas[a]]
+            for column, value in enumerate(grid[i * width:(i + 1) * width]):
+                total[column] += value
+        return sums
+
+    def withdrawal_sizes(self):
+        """Returns (amounts, area index per amount) of every withdrawal read."""
+        if self.use_numpy:
+            if not self._amounts:
+                return numpy.zeros(0), numpy.zeros(0, dtype=numpy.int32)
+            return numpy.concatenate(self._amounts), numpy.concatenate(self._amount_areas)
+        return self._amounts, self._amount_areas
+
+
+def summarize_ledger(paths, days=90, as_of=None, lookback_days=28, chunk_size=100000, use_numpy=None):
+    """Reads `days` calendar days of ledger up to as_of (default now) into a LedgerSummary."""
+    end = int(time.time() if as_of is None else as_of)
+    start = end - end % DAY - (days - 1) * DAY
+    summary = LedgerSummary(read_atms(paths), start, end, end - lookback_days * DAY, use_numpy)
+    for chunk in read_ledger(paths, start, end, chunk_size):
+        summary.add(*chunk)
+    return summary
+
+
+def atm_demand(summary):
+    """Returns per-ATM demand: mean withdrawn per day and per hour of day, and the peak hour."""
+    rows = []
+    for i, (atm_id, location, _) in enumerate(summary.atms):
+        hourly = [value / summary.days for value in summary.row(summary.hourly_withdrawn, i, 24)]
+        daily = summary.row(summary.daily_withdrawn, i, summary.days)
+        rows.append({
+            "atm_id": atm_id, "location": location,
+            "withdrawn_per_day": sum(daily) / summary.days,
+            "deposited_per_day": sum(summary.row(summary.daily_deposited, i, summary.days)) / summary.days,
+            "withdrawals": int(summary.withdrawal_counts[i]),
+            "peak_hour": max(range(24), key=hourly.__getitem__),
+            "hourly": hourly, "daily": daily,
+        })
+    return rows
+
+
+def location_demand(summary):
+    """Returns the same demand figures summed over the ATMs of each location area."""
+    hourly = summary.area_rows(summary.hourly_withdrawn, 24)
+    withdrawn = summary.area_rows(summary.daily_withdrawn, summary.days)
+    deposited = summary.area_rows(summary.daily_deposited, summary.days)
+    rows = []
+    for area in summary.areas:
+        per_hour = [value / summary.days for value in hourly[area]]
+        rows.append({
+            "location": area,
+            "atms": sum(1 for a in summary.atm_area if summary.areas[a] == area),
+            "withdrawn_per_day": sum(withdrawn[area]) / summary.days,
+            "deposited_per_day": sum(deposited[area]) / summary.days,
+            "peak_hour": max(range(24), key=per_hour.__getitem__),
+            "hourly": per_hour, "daily": withdrawn[area],
+        })
+    return rows
+
+
+def withdrawal_percentiles(summary, percentiles=(50, 90, 99)):
+    """Returns {'all' or area: {percentile: withdrawal size}} over the summary's withdrawals."""
+    amounts, areas = summary.withdrawal_sizes()
+    if summary.use_numpy:
+        result = {"all": dict(zip(percentiles, numpy.percentile(amounts, percentiles).tolist()))} if len(amounts) \
+            else {"all": dict.fromkeys(percentiles)}
+        for a, area in enumerate(summary.areas):
+            selected = amounts[areas == a]
+            result[area] = dict(zip(percentiles, numpy.percentile(selected, percentiles).tolist())) \
+                if len(selected) else dict.fromkeys(percentiles)
+        return result
+
+    by_area = [[] for _ in summary.areas]
+    for amount, a in zip(amounts, areas):
+        by_area[a].append(amount)
+    result = {"all": sorted(amounts)}
+    result.update((area, sorted(values)) for area, values in zip(summary.areas, by_area))
+    return {key: {q: percentile(ordered, q) for q in percentiles} for key, ordered in result.items()}
+
+
+def hours_to_empty(cash, daily_rate, hourly_shape, start_hour):
+    """Hours until cash is gone when the day's outflow follows hourly_shape (summing to 1).
+
+    Returns None when the ATM takes in at least as much as it pays out.
+    """
+    if daily_rate <= 0:
+        return None
+    if cash <= 0:
+        return 0.0
+    full_days = int(cash // daily_rate)  # Any 24 hours from start_hour pay out daily_rate
+    remaining = cash - full_days * daily_rate
+    for step in range(24):
+        need = daily_rate * hourly_shape[(start_hour + step) % 24]
+        if need >= remaining:
+            return full_days * 24 + step + (remaining / need if need else 0.0)
+        remaining -= need
+    return full_days * 24 + 24.0
+
+
+def forecast_cash_out(summary):
+    """Returns one forecast per ATM, soonest cash-out first; never-empty ATMs come last.
+
+    The daily rate is the ATM's net outflow (withdrawals minus deposits) over the
+    lookback, spread over the day by its hourly withdrawal profile. With fewer days of
+    ledger than the lookback, the rate is averaged over the days that were read.
+    """
+    start_hour = summary.end // 3600 % 24
+    rows = []
+    for i, (atm_id, location, cash_level) in enumerate(summary.atms):
+        rate = float(summary.recent_net[i]) / summary.lookback_days if summary.lookback_days else 0.0
+        hourly = summary.row(summary.hourly_withdrawn, i, 24)
+        total = sum(hourly)
+        shape = [value / total for value in hourly] if total else [1 / 24] * 24
+        hours = hours_to_empty(cash_level, rate, shape, start_hour)
+        rows.append({
+            "atm_id": atm_id, "location": location, "cash_level": cash_level,
+            "net_outflow_per_day": rate, "hours_to_empty": hours,
+            "empty_at": None if hours is None else format_time(summary.end + hours * 3600),
+        })
+    rows.sort(key=lambda row: (row["hours_to_empty"] is None, row["hours_to_empty"] or 0))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cash demand analytics and cash-out forecast.")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--shard-map", default=None, help="shard map JSON; overrides --db")
+    parser.add_argument("--days", type=int, default=90, help="calendar days of ledger to analyse")
+    parser.add_argument("--as-of", type=parse_utc, default=None,
+                        help="end of the analysis, 'YYYY-MM-DD[ HH:MM:SS]' UTC (default: now)")
+    parser.add_argument("--lookback-days", type=int, default=28, help="days the cash-out rate is averaged over")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="ledger rows read per query")
+    parser.add_argument("--top", type=int, default=20, help="ATMs to list in the forecast")
+    parser.add_argument("--pure-python", action="store_true", help="do not use NumPy even if installed")
+    args = parser.parse_args(argv)
+
+    paths = load_shard_map(args.shard_map) if args.shard_map else [args.db]
+    started = time.perf_counter()
+    summary = summarize_ledger(paths, args.days, args.as_of, args.lookback_days, args.chunk_size,
+                               False if args.pure_python else None)
+    elapsed = time.perf_counter() - started
+
+    print(f"Ledger {format_time(summary.start_day)} to {format_time(summary.end)}, {len(summary.atms)} ATMs, "
+          f"read in {elapsed:.2f}s ({'NumPy' if summary.use_numpy else 'pure Python'})")
+
+    print(f"\n{'location':<14}{'atms':>6}{'withdrawn/day':>15}{'deposited/day':>15}{'peak hour':>11}")
+    for row in location_demand(summary):
+        print(f"{row['location']:<14}{row['atms']:>6}{row['withdrawn_per_day']:>15.2f}"
+              f"{row['deposited_per_day']:>15.2f}{row['peak_hour']:>9}:00")
+
+    sizes = withdrawal_percentiles(summary)
+    columns = list(sizes["all"])
+    print(f"\n{'withdrawal size':<16}" + "".join(f"{'p' + str(q):>10}" for q in columns))
+    for key, values in sizes.items():
+        print(f"{key:<16}" + "".join(f"{'-' if values[q] is None else format(values[q], '.2f'):>10}" for q in columns))
+
+    print(f"\n{'atm':>6}  {'location':<14}{'cash':>12}{'net out/day':>13}  runs out (UTC)")
+    for row in forecast_cash_out(summary)[:args.top]:
+        empty_at = row["empty_at"] or "not at this rate"
+        print(f"{row['atm_id']:>6}  {row['location']:<14}{row['cash_level']:>12.2f}"
+              f"{row['net_outflow_per_day']:>13.2f}  {empty_at}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from Accountmanager import AccountManager
+
+_DEFAULT = object()  # Sentinel: use the manager-wide default timeout
+
+
+class AsyncAccountManager:
+    """Coroutine front end for AccountManager, backed by a bounded pool of DB threads.
+
+    Calls are queued on at most max_workers threads; at most max_pending calls may be
+    queued or running at once and further callers wait their turn. A call that is
+    cancelled or times out while still queued never reaches the database; one that is
+    already running completes on its thread so no transaction is left half applied.
+    """
+
+    def __init__(self, manager=None, db_name="atm_simulator.db", max_workers=8, max_pending=1024,
+                 timeout=None, **manager_options):
+        self._owns_manager = manager is None
+        self.manager = manager or AccountManager(db_name, pool_size=max_workers, **manager_options)
+        self.timeout = timeout  # Default per-call timeout in seconds, None waits forever
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="atm-db")
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def _call(self, method, *args, timeout=_DEFAULT):
+        """Runs a blocking AccountManager method on the executor and awaits its result."""
+        if timeout is _DEFAULT:
+            timeout = self.timeout
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._executor.submit(method, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is freed when the thread is done with the call, not when the caller
+        # stops waiting: a call that timed out may still be inside its transaction
+        job.add_done_callback(lambda _: self._release_slot(loop))
+        return await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+
+    def _release_slot(self, loop):
+        """Frees a max_pending slot from the executor thread that finished the call."""
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._slots.release)
+
+    async def authenticate_user(self, account_id, password, timeout=_DEFAULT):
+        """Validates user credentials."""
+        return await self._call(self.manager.authenticate_user, account_id, password, timeout=timeout)
+
+    async def get_balance(self, account_id, timeout=_DEFAULT):
+        """Retrieves the current balance of an account."""
+        return await self._call(self.manager.get_balance, account_id, timeout=timeout)
+
+    async def get_account_name(self, account_id, timeout=_DEFAULT):
+        """Retrieves the account holder's name."""
+        return await self._call(self.manager.get_account_name, account_id, timeout=timeout)
+
+    async def deposit(self, account_id, amount, atm_id, timeout=_DEFAULT):
+        """Deposits an amount into an account and updates the ATM cash level."""
+        return await self._call(self.manager.deposit, account_id, amount, atm_id, timeout=timeout)
+
+    async def withdraw(self, account_id, amount, atm_id, timeout=_DEFAULT):
+        """Withdraws an amount from an account, considering ATM cash levels."""
+        return await self._call(self.manager.withdraw, account_id, amount, atm_id, timeout=timeout)
+
+    async def apply_batch(self, operations, chunk_size=1000, timeout=_DEFAULT):
+        """Applies many deposits and withdrawals; returns one (ok, balance or error) per record."""
+        return await self._call(self.manager.apply_batch, operations, chunk_size, timeout=timeout)
+
+    async def log_transaction(self, account_id, transaction_type, amount, atm_id=None, timeout=_DEFAULT):
+        """Logs a transaction."""
+        return await self._call(
+            self.manager.log_transaction, account_id, transaction_type, amount, atm_id, timeout=timeout
+        )
+
+    async def get_transaction_history(self, account_id, limit=3, timeout=_DEFAULT):
+        """Retrieves the formatted transaction history for an account."""
+        return await self._call(self.manager.get_transaction_history, account_id, limit, timeout=timeout)
+
+    async def get_transaction_page(self, account_id, limit=20, cursor=None, order="newest_first",
+                                   timeout=_DEFAULT):
+        """Returns one keyset page of transaction rows and the cursor for the next page."""
+        return await self._call(
+            self.manager.get_transaction_page, account_id, limit, cursor, order, timeout=timeout
+        )
+
+    async def flush(self, timeout=_DEFAULT):
+        """Waits until queued write-behind ledger entries are committed."""
+        return await self._call(self.manager.flush, timeout=timeout)
+
+    def stats(self):
+        """Returns the manager's per-method metrics snapshot, or None when metrics are off."""
+        return self.manager.stats()
+
+    async def close(self):
+        """Waits for running calls, then closes the manager if this object created it."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        if self._owns_manager:
+            await loop.run_in_executor(None, self.manager.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()  # Returned by get() when a key is absent or expired
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU cache whose entries expire after ttl seconds.
+
+    Writers call put() or invalidate(). Readers that load a value from the database
+    take an epoch() before the query and store the result with fill(); the fill is
+    dropped if a writer touched the key in the meantime, so a slow reader can never
+    overwrite a newer value with an older one.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0, epoch_stripes=64):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._epochs = [0] * epoch_stripes
+        self._lock = threading.Lock()
+
+    def _stripe(self, key):
+        return hash(key) % len(self._epochs)
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Returns the cached value, or MISSING if it is absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def epoch(self, key):
+        """Returns a token to pass to fill() for a value about to be read from the database."""
+        with self._lock:
+            return self._epochs[self._stripe(key)]
+
+    def fill(self, key, value, epoch):
+        """Stores a value read from the database unless a writer changed the key since epoch()."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if self._epochs[self._stripe(key)] == epoch:
+                self._store(key, value)
+
+    def put(self, key, value):
+        """Stores a value that was just written to the database."""
+        with self._lock:
+            self._epochs[self._stripe(key)] += 1
+            if self.maxsize > 0:
+                self._store(key, value)
+
+    def invalidate(self, key):
+        """Drops a key so the next read goes to the database."""
+        with self._lock:
+            self._epochs[self._stripe(key)] += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epochs = [epoch + 1 for epoch in self._epochs]
+
+    def stats(self):
+        """Returns hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,23 @@
+import sys
+
+from Accountmanager import AccountManager
+
+
+def main(db_name="atm_simulator.db"):
+    """Prints the plan of every hot query and exits non-zero if any of them scans."""
+    manager = AccountManager(db_name)
+    try:
+        for name, steps in manager.explain_query_plans().items():
+            print(f"{name}: {' | '.join(steps)}")
+        manager.check_query_plans()
+    except RuntimeError as e:
+        print(e)
+        return 1
+    finally:
+        manager.close()
+    print("All hot queries use an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
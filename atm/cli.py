@@ -0,0 +1,170 @@
+"""Headless command line: python -m atm <command> [options].
+
+Only the standard library and the database modules are imported here. Each command's
+module is imported when that command runs, and nothing reachable from this file
+imports tkinter or PIL.
+"""
+import argparse
+import csv
+import importlib
+import sys
+
+# command -> (module, function taking argv, help line)
+COMMANDS = {
+    "init-db": ("Create_and_populate_database", "main", "create and populate a database"),
+    "session": ("cli", "session_main", "run a scripted ATM session for one card"),
+    "simulate": ("load_generator", "main", "drive a fleet of headless virtual ATMs"),
+    "apply-batch": ("cli", "apply_batch_main", "apply a CSV file of deposits and withdrawals"),
+    "event-sim": ("event_simulation", "main", "simulate days of fleet activity on a virtual clock"),
+}
+
+USAGE = "usage: python -m atm <command> [options]\n\ncommands:\n" + "".join(
+    f"  {name:<13}{help_line}\n" for name, (_, _, help_line) in COMMANDS.items()
+) + "\nRun 'python -m atm <command> --help' for a command's options."
+
+
+def parse_step(text):
+    """Parses one session step such as 'withdraw:100', 'balance' or 'history:5'."""
+    name, _, value = text.strip().partition(":")
+    name = name.lower()
+    if name in ("withdraw", "deposit"):
+        try:
+            return name, float(value)
+        except ValueError:
+            raise ValueError(f"'{text}' needs an amount, e.g. {name}:100")
+    if name == "history":
+        return name, int(value or 3)
+    if name in ("balance", "name"):
+        return name, None
+    raise ValueError(f"Unknown step '{text}'. Use withdraw:N, deposit:N, balance, history[:N] or name.")
+
+
+def perform_step(manager, session, atm_id, name, value):
+    """Runs one parsed step for an authenticated session and returns what it shows the customer."""
+    if name == "withdraw":
+        manager.withdraw(session, value, atm_id)
+        return f"withdraw {value:.2f}: ok, balance {session.balance:.2f}"
+    if name == "deposit":
+        manager.deposit(session, value, atm_id)
+        return f"deposit {value:.2f}: ok, balance {session.balance:.2f}"
+    if name == "balance":
+        return f"balance: {manager.get_balance(session):.2f}"
+    if name == "name":
+        return f"name: {manager.get_account_name(session)}"
+    lines = [f"history ({value}):"]
+    for row in manager.get_transaction_history(session, value):
+        lines.append("  " + " ".join(row.replace("\n", "").split()).rstrip(" -"))
+    return "\n".join(lines)
+
+
+def run_session(manager, session, atm_id, steps, stop_on_error=False):
+    """Runs (step, value) pairs for an authenticated session; returns the number that failed."""
+    failures = 0
+    for name, value in steps:
+        try:
+            print(perform_step(manager, session, atm_id, name, value))
+        except ValueError as e:
+            failures += 1
+            print(f"{name}: {e}")
+            if stop_on_error:
+                break
+    return failures
+
+
+def session_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m atm session",
+        description="Log in with a card and PIN and run a list of ATM steps.",
+        epilog="Steps: withdraw:AMOUNT, deposit:AMOUNT, balance, history[:N], name."
+    )
+    parser.add_argument("steps", nargs="*", help="steps to run in order")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--card", type=int, required=True, help="card (account) number")
+    parser.add_argument("--pin", required=True, help="card PIN")
+    parser.add_argument("--atm", type=int, default=1, help="ATM the session runs on")
+    parser.add_argument("--script", default=None,
+                        help="read further steps from this file, one per line ('-' for stdin)")
+    parser.add_argument("--stop-on-error", action="store_true", help="stop at the first rejected step")
+    args = parser.parse_args(argv)
+
+    lines = list(args.steps)
+    if args.script:
+        handle = sys.stdin if args.script == "-" else open(args.script, encoding="utf-8")
+        with handle:
+            lines.extend(line for line in handle if line.strip() and not line.lstrip().startswith("#"))
+    try:
+        steps = [parse_step(line) for line in lines]
+    except ValueError as e:
+        parser.error(str(e))
+
+    from Accountmanager import AccountManager
+
+    manager = AccountManager(args.db, pool_size=1)
+    try:
+        session = manager.authenticate_user(args.card, args.pin)
+        if session is None:
+            print("Invalid Card Number or PIN")
+            return 1
+        print(f"Welcome, {session.name}")
+        failures = run_session(manager, session, args.atm, steps, args.stop_on_error)
+    finally:
+        manager.close()
+    return 1 if failures else 0
+
+
+def read_operations(handle):
+    """Yields (operation, account_id, amount, atm_id) from CSV rows with those column names."""
+    for row in csv.DictReader(handle):
+        atm_id = (row.get("atm_id") or "").strip()
+        yield row["operation"].strip(), int(row["account_id"]), float(row["amount"]), int(atm_id) if atm_id else None
+
+
+def apply_batch_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m atm apply-batch",
+        description="Apply deposits and withdrawals from a CSV file in chunked transactions.",
+        epilog="Columns: operation (deposit or withdraw), account_id, amount and an optional atm_id."
+    )
+    parser.add_argument("file", help="CSV file ('-' for stdin)")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="operations per transaction")
+    args = parser.parse_args(argv)
+
+    from Accountmanager import AccountManager
+
+    handle = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+    manager = AccountManager(args.db, pool_size=1)
+    try:
+        with handle:
+            operations = list(read_operations(handle))
+        results = manager.apply_batch(operations, args.chunk_size)
+    finally:
+        manager.close()
+
+    failures = 0
+    for line, ((operation, account_id, amount, _), (ok, detail)) in enumerate(zip(operations, results), 2):
+        if not ok:
+            failures += 1
+            print(f"line {line}: {operation} {amount:.2f} for account {account_id}: {detail}")
+    print(f"Applied {len(results) - failures} of {len(results)} operations")
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(USAGE)
+        return 0 if argv else 2
+
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Unknown command '{command}'.\n\n{USAGE}", file=sys.stderr)
+        return 2
+
+    module_name, function, _ = COMMANDS[command]
+    sys.argv[0] = f"python -m atm {command}"  # So the command's --help shows how it was run
+    return getattr(importlib.import_module(module_name), function)(rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    def __init__(self, db_name, size=5, timeout=30.0):
+        if size <= 0:
+            raise ValueError("Pool size must be greater than zero.")
+
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # Most recently used connection is handed out first
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()  # Guards connection creation and shutdown
+        self._local = threading.local()  # The connection checked out by the current thread
+
+    def _open(self):
+        """Opens a new connection configured for concurrent access."""
+        # isolation_level=None puts the driver in autocommit mode, so callers
+        # control transactions explicitly with BEGIN/COMMIT.
+        connection = sqlite3.connect(
+            self.db_name,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _checkout(self):
+        """Takes an idle connection, opening a new one while under the size limit."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed.")
+            if self._created < self.size:
+                connection = self._open()
+                self._created += 1
+                return connection
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError("Timed out waiting for a database connection.")
+
+    @contextmanager
+    def connection(self):
+        """Yields one connection per thread; nested calls on a thread reuse it."""
+        held = getattr(self._local, "connection", None)
+        if held is not None:
+            yield held
+            return
+
+        connection = self._checkout()
+        self._local.connection = connection
+        try:
+            yield connection
+        finally:
+            self._local.connection = None
+            if connection.in_transaction:
+                connection.rollback()
+            if self._closed:
+                connection.close()
+            else:
+                self._idle.put(connection)
+
+    def close(self):
+        """Closes every connection; connections still in use close when returned."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
@@ -0,0 +1,101 @@
+import tkinter as tk
+
+from ATMGUI import ATMUI
+
+
+class FleetDashboard:
+    """Shows a whole ATM fleet in one window.
+
+    Every ATM is one line of text in a Listbox, which only draws the rows in view, so
+    a thousand ATMs cost a thousand strings rather than a thousand widget trees. The
+    selected ATM gets a full ATMUI in the right-hand pane. That UI is torn down when
+    another ATM is selected, and its Session is kept so that a customer who is still
+    logged in comes back to the menu.
+    """
+
+    def __init__(self, window, account_manager, atms, executor):
+        self.window = window
+        self.account_manager = account_manager
+        self.atms = list(atms)  # [(atm_id, location)]
+        self.executor = executor
+        self.rows = {atm_id: index for index, (atm_id, _) in enumerate(self.atms)}
+        self.statuses = {atm_id: "Idle" for atm_id, _ in self.atms}
+        self.sessions = {}  # atm_id -> Session of a customer still logged in there
+        self.current = None  # (atm_id, ATMUI, frame) of the ATM on screen
+
+        self.window.title(f"ATM Fleet ({len(self.atms)} ATMs)")
+        self.window.geometry("1200x650")
+        self.window.configure(bg="#2c3e50")
+
+        list_frame = tk.Frame(self.window, bg="#34495e")
+        list_frame.pack(side=tk.LEFT, fill=tk.Y)
+
+        scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL)
+        self.listbox = tk.Listbox(
+            list_frame,
+            font=("Courier", 11),
+            width=48,
+            bg="#34495e",
+            fg="#ecf0f1",
+            selectbackground="#16a085",
+            activestyle="none",
+            exportselection=False,
+            yscrollcommand=scrollbar.set
+        )
+        scrollbar.config(command=self.listbox.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.pack(side=tk.LEFT, fill=tk.Y)
+        self.listbox.insert(tk.END, *(self.row_text(atm_id) for atm_id, _ in self.atms))
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+
+        self.detail = tk.Frame(self.window, bg="#2c3e50")
+        self.detail.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.placeholder = tk.Label(
+            self.detail,
+            text="Select an ATM",
+            font=("Helvetica", 16),
+            fg="#ecf0f1",
+            bg="#2c3e50"
+        )
+        self.placeholder.pack(expand=True)
+
+    def row_text(self, atm_id):
+        location = self.atms[self.rows[atm_id]][1]
+        return f"ATM {atm_id:<6} {location[:16]:<16} {self.statuses[atm_id]}"
+
+    def update_status(self, atm_id, text):
+        """Rewrites one status row; called by the ATMUI on screen when its state changes."""
+        self.statuses[atm_id] = text
+        index = self.rows[atm_id]
+        selected = self.listbox.curselection()
+        self.listbox.delete(index)
+        self.listbox.insert(index, self.row_text(atm_id))
+        if index in selected:
+            self.listbox.selection_set(index)
+
+    def on_select(self, _event):
+        selection = self.listbox.curselection()
+        if selection:
+            self.show_atm(*self.atms[selection[0]])
+
+    def show_atm(self, atm_id, location):
+        """Builds the UI of one ATM, tearing down the one that was on screen."""
+        if self.current is not None:
+            if self.current[0] == atm_id:
+                return
+            self.hide_current()
+        self.placeholder.pack_forget()
+
+        frame = tk.Frame(self.detail, bg="#2c3e50")
+        frame.pack(fill=tk.BOTH, expand=True)
+        ui = ATMUI(frame, self.account_manager, location, atm_id, self.executor,
+                   session=self.sessions.pop(atm_id, None), on_status=self.update_status)
+        self.current = (atm_id, ui, frame)
+
+    def hide_current(self):
+        """Destroys the ATM UI on screen, remembering its Session."""
+        atm_id, ui, frame = self.current
+        if ui.session is not None:
+            self.sessions[atm_id] = ui.session
+        frame.destroy()
+        self.current = None
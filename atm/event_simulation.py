@@ -0,0 +1,360 @@
+"""Discrete-event simulation of an ATM fleet on a virtual clock.
+
+Customers arrive at each ATM, queue if it is busy and run a session script against the
+account manager. ATMs that run low on cash are replenished after a lead time. The clock
+jumps from one event to the next instead of waiting, and the manager stamps the ledger
+with simulated time, so a month of fleet activity takes minutes. Everything random is
+drawn from one seeded generator and events run one at a time, so a seed and a starting
+database always produce the same ledger.
+"""
+import argparse
+import heapq
+import itertools
+import random
+import sqlite3
+import time
+from collections import Counter, deque
+
+from cli import parse_step, perform_step
+from Create_and_populate_database import parse_utc
+from load_generator import load_credentials
+from storage import BACKENDS, open_account_manager
+
+# Relative customer traffic per hour of day (UTC); scaled so the daily mean is 1
+DEFAULT_HOURLY_PROFILE = (
+    0.2, 0.1, 0.1, 0.1, 0.2, 0.4, 0.8, 1.2, 1.4, 1.2, 1.1, 1.3,
+    1.7, 1.6, 1.2, 1.1, 1.3, 1.6, 1.8, 1.6, 1.3, 1.0, 0.6, 0.4,
+)
+# Session scripts in the `python -m atm session` step syntax, with their weights.
+# {cash} and {deposit} are filled with a drawn withdrawal or deposit amount.
+DEFAULT_SCRIPTS = {
+    "withdraw:{cash}": 40,
+    "balance withdraw:{cash}": 20,
+    "withdraw:{cash} balance": 10,
+    "deposit:{deposit}": 12,
+    "balance": 10,
+    "history:5": 5,
+    "deposit:{deposit} withdraw:{cash}": 3,
+}
+# Note denominations customers ask for, with their weights
+WITHDRAWAL_AMOUNTS = {20: 10, 40: 15, 60: 10, 100: 25, 200: 20, 300: 10, 500: 10}
+# Inter-arrival time given its mean (seconds)
+ARRIVAL_DISTRIBUTIONS = {
+    "poisson": lambda rng, mean: rng.expovariate(1.0 / mean),
+    "uniform": lambda rng, mean: rng.uniform(0.0, 2.0 * mean),
+    "fixed": lambda rng, mean: mean,
+}
+FLEET_QUERY = "SELECT atm_id, location, cash_level FROM atms WHERE status = 'Active' ORDER BY atm_id LIMIT ?"
+
+
+def parse_script(text):
+    """Parses 'STEPS=WEIGHT', e.g. 'balance withdraw:{cash}=20'; the weight defaults to 1."""
+    steps, _, weight = text.rpartition("=") if "=" in text else (text, "", "")
+    # Fail now, not a simulated week in, if a step is malformed
+    for step in steps.format(cash=20, deposit=20).split():
+        parse_step(step)
+    return steps, float(weight or 1)
+
+
+def load_fleet(db_name, limit):
+    """Returns (atm_id, location, cash_level) of up to limit active ATMs."""
+    connection = sqlite3.connect(db_name)
+    try:
+        return connection.execute(FLEET_QUERY, (limit,)).fetchall()
+    finally:
+        connection.close()
+
+
+def ledger_end(db_name):
+    """Returns the UTC midnight after the newest ledger row, archived or not, in epoch seconds."""
+    connection = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)  # Only read, never migrated
+    try:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        newest = connection.execute("SELECT MAX(timestamp) FROM transactions").fetchone()[0]
+        if "transaction_partitions" in tables:  # Only files that were archived have one
+            archived = connection.execute("SELECT MAX(max_timestamp) FROM transaction_partitions").fetchone()[0]
+            newest = max(filter(None, (newest, archived)), default=None)
+    finally:
+        connection.close()
+    if newest is None:
+        raise ValueError("The ledger is empty; pass a start time.")
+    return parse_utc(newest[:10]) + 86400
+
+
+class VirtualClock:
+    """Simulated time in epoch seconds; pass it to the account manager as its clock."""
+
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class EventQueue:
+    """Pending events ordered by simulated time, ties broken by scheduling order."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.processed = 0
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def schedule(self, at, handler, *args):
+        heapq.heappush(self._heap, (at, next(self._sequence), handler, args))
+
+    def run(self, until):
+        """Runs every event before `until`, moving the clock to each one, then to until."""
+        heap = self._heap
+        while heap and heap[0][0] < until:
+            at, _, handler, args = heapq.heappop(heap)
+            self.clock.now = at
+            handler(*args)
+            self.processed += 1
+        self.clock.now = until
+
+
+class SimulatedATM:
+    """The simulation's view of one ATM: its queue and a mirror of its cash level."""
+
+    __slots__ = ("atm_id", "location", "cash", "capacity", "queue", "busy", "order_pending", "out_since")
+
+    def __init__(self, atm_id, location, cash, capacity):
+        self.atm_id = atm_id
+        self.location = location
+        self.cash = cash  # Exact: the simulation is the only writer while it runs
+        self.capacity = capacity
+        self.queue = deque()  # Arrival times of waiting customers
+        self.busy = False
+        self.order_pending = False  # A replenishment is on its way
+        self.out_since = None  # When a customer was first refused for lack of cash
+
+
+class SimulationStats:
+    """Outcome counts, queueing and cash figures of a simulation run."""
+
+    def __init__(self):
+        self.outcomes = Counter()  # (operation, outcome) -> count
+        self.arrivals = 0
+        self.balked = 0  # Left because the queue was too long
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.cash_outs = 0
+        self.downtime = 0.0  # Seconds ATMs spent refusing withdrawals for lack of cash
+        self.replenishments = 0
+        self.cash_loaded = 0.0
+        self.events = 0
+        self.simulated = 0.0
+        self.elapsed = 0.0
+
+    def record_wait(self, seconds):
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def report(self):
+        """Formats the run as plain text."""
+        speedup = self.simulated / self.elapsed if self.elapsed else 0.0
+        mean_wait = self.wait_total / self.waits if self.waits else 0.0
+        lines = [
+            f"Simulated {self.simulated / 86400:.1f} days in {self.elapsed:.1f}s "
+            f"({speedup:,.0f}x real time, {self.events:,} events)",
+            f"Customers {self.arrivals:,}, balked {self.balked:,}, "
+            f"mean wait {mean_wait:.1f}s, max wait {self.wait_max:.0f}s",
+            f"{'operation':<14}{'ok':>10}{'rejected':>10}",
+        ]
+        for operation in sorted({operation for operation, _ in self.outcomes}):
+            lines.append(f"{operation:<14}{self.outcomes[operation, 'ok']:>10}"
+                         f"{self.outcomes[operation, 'rejected']:>10}")
+        lines.append(f"Cash-outs {self.cash_outs} ({self.downtime / 3600:.1f} ATM-hours without cash), "
+                     f"replenishments {self.replenishments}, cash loaded {self.cash_loaded:,.2f}")
+        return "\n".join(lines)
+
+
+class FleetSimulation:
+    """Customers, sessions and cash logistics of a fleet, driven by an EventQueue."""
+
+    def __init__(self, manager, fleet, credentials, clock, seed=None, arrivals_per_hour=6.0,
+                 distribution="poisson", hourly_profile=DEFAULT_HOURLY_PROFILE, scripts=None,
+                 step_seconds=20.0, max_queue=5, capacity=20000.0, reorder_level=0.2, lead_time=6 * 3600):
+        if distribution not in ARRIVAL_DISTRIBUTIONS:
+            raise ValueError(f"Unknown arrival distribution '{distribution}'. "
+                             f"Choose from: {', '.join(ARRIVAL_DISTRIBUTIONS)}")
+        if len(hourly_profile) != 24 or min(hourly_profile) <= 0:
+            raise ValueError("The hourly profile needs 24 positive weights.")
+        if not credentials:
+            raise ValueError("The database has no accounts to simulate.")
+        self.manager = manager
+        self.clock = clock
+        self.events = EventQueue(clock)
+        self.random = random.Random(seed)
+        self.credentials = credentials
+        self.atms = [SimulatedATM(atm_id, location, cash_level, max(capacity, cash_level))
+                     for atm_id, location, cash_level in fleet]
+        mean = sum(hourly_profile) / 24
+        # Mean seconds between arrivals at one ATM, per hour of day
+        self.gaps = [3600.0 / (arrivals_per_hour * weight / mean) for weight in hourly_profile]
+        self.next_gap = ARRIVAL_DISTRIBUTIONS[distribution]
+        scripts = scripts or DEFAULT_SCRIPTS
+        self.scripts = list(scripts)
+        self.script_weights = [scripts[script] for script in self.scripts]
+        self.amounts = list(WITHDRAWAL_AMOUNTS)
+        self.amount_weights = [WITHDRAWAL_AMOUNTS[amount] for amount in self.amounts]
+        self.step_seconds = step_seconds
+        self.max_queue = max_queue
+        self.reorder_level = reorder_level
+        self.lead_time = lead_time
+        self.stats = SimulationStats()
+
+    def run(self, days):
+        """Simulates `days` days from the clock's current time; returns the SimulationStats."""
+        start = self.clock.now
+        for atm in self.atms:
+            self._schedule_arrival(atm)
+        started = time.perf_counter()
+        self.events.run(start + days * 86400)
+        self.stats.elapsed += time.perf_counter() - started
+        self.stats.simulated += days * 86400
+        self.stats.events = self.events.processed
+        return self.stats
+
+    def _schedule_arrival(self, atm):
+        now = self.clock.now
+        gap = self.next_gap(self.random, self.gaps[int(now // 3600) % 24])
+        self.events.schedule(now + gap, self._arrive, atm)
+
+    def _service_time(self):
+        return self.step_seconds * self.random.uniform(0.5, 1.5)
+
+    def _arrive(self, atm):
+        self.stats.arrivals += 1
+        self._schedule_arrival(atm)
+        if not atm.busy:
+            self.stats.record_wait(0.0)
+            self._start_session(atm)
+        elif len(atm.queue) < self.max_queue:
+            atm.queue.append(self.clock.now)
+        else:
+            self.stats.balked += 1
+
+    def _start_session(self, atm):
+        atm.busy = True
+        account_id, password = self.random.choice(self.credentials)
+        script = self.random.choices(self.scripts, self.script_weights)[0]
+        cash = self.random.choices(self.amounts, self.amount_weights)[0]
+        deposit = self.random.randrange(50, 2001, 50)
+        steps = deque(parse_step(step) for step in script.format(cash=cash, deposit=deposit).split())
+
+        session = self.manager.authenticate_user(account_id, password)
+        self.stats.outcomes["authenticate", "ok" if session else "rejected"] += 1
+        if session is None:
+            self.events.schedule(self.clock.now + self._service_time(), self._finish, atm)
+            return
+        self.events.schedule(self.clock.now + self._service_time(), self._step, atm, session, steps)
+
+    def _step(self, atm, session, steps):
+        name, value = steps.popleft()
+        short_of_cash = name == "withdraw" and value > atm.cash
+        try:
+            perform_step(self.manager, session, atm.atm_id, name, value)
+            outcome = "ok"
+        except ValueError:
+            outcome = "rejected"
+        self.stats.outcomes[name, outcome] += 1
+
+        if outcome == "ok" and name in ("withdraw", "deposit"):
+            atm.cash += value if name == "deposit" else -value
+        if short_of_cash and atm.out_since is None:
+            atm.out_since = self.clock.now
+            self.stats.cash_outs += 1
+        if (short_of_cash or atm.cash < self.reorder_level * atm.capacity) and not atm.order_pending:
+            atm.order_pending = True
+            self.events.schedule(self.clock.now + self.lead_time, self._replenish, atm)
+
+        at = self.clock.now + self._service_time()
+        if steps:
+            self.events.schedule(at, self._step, atm, session, steps)
+        else:
+            self.events.schedule(at, self._finish, atm)
+
+    def _finish(self, atm):
+        atm.busy = False
+        if atm.queue:
+            self.stats.record_wait(self.clock.now - atm.queue.popleft())
+            self._start_session(atm)
+
+    def _replenish(self, atm):
+        self.stats.cash_loaded += self.manager.replenish_atm(atm.atm_id, atm.capacity)
+        self.stats.replenishments += 1
+        atm.cash = atm.capacity
+        atm.order_pending = False
+        if atm.out_since is not None:
+            self.stats.downtime += self.clock.now - atm.out_since
+            atm.out_since = None
+
+
+def run_simulation(db_name, days=30.0, start=None, atm_count=50, customers=1000, seed=None,
+                   backend="sqlite", manager_options=None, **simulation_options):
+    """Simulates a fleet on db_name from start (epoch seconds) and returns the SimulationStats.
+
+    start defaults to the midnight after the newest ledger row, so a run carries on
+    from the existing history and the same database gives the same start every time.
+    simulation_options go to FleetSimulation and manager_options to the account
+    manager, which is given the virtual clock.
+    """
+    if start is None:
+        start = ledger_end(db_name)
+    clock = VirtualClock(start)
+    manager = open_account_manager(db_name, backend, clock=clock, **(manager_options or {}))
+    try:
+        simulation = FleetSimulation(manager, load_fleet(db_name, atm_count),
+                                     load_credentials(db_name, customers), clock, seed, **simulation_options)
+        return simulation.run(days)
+    finally:
+        manager.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate days of ATM fleet activity on a virtual clock.")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file (modified in place)")
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite", help="storage backend")
+    parser.add_argument("--days", type=float, default=30.0, help="simulated days")
+    parser.add_argument("--start", type=parse_utc, default=None,
+                        help="simulated start, 'YYYY-MM-DD[ HH:MM:SS]' UTC "
+                             "(default: the midnight after the newest ledger row)")
+    parser.add_argument("--atms", type=int, default=50, help="number of active ATMs to simulate")
+    parser.add_argument("--customers", type=int, default=1000, help="cards the customers use")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a reproducible run")
+    parser.add_argument("--arrivals-per-hour", type=float, default=6.0, help="mean customers per ATM per hour")
+    parser.add_argument("--distribution", choices=ARRIVAL_DISTRIBUTIONS, default="poisson",
+                        help="inter-arrival time distribution")
+    parser.add_argument("--script", action="append", default=None, metavar="STEPS=WEIGHT",
+                        help="session script such as 'balance withdraw:{cash}=20' (repeatable; "
+                             "replaces the default mix)")
+    parser.add_argument("--step-seconds", type=float, default=20.0, help="mean time a session step takes")
+    parser.add_argument("--max-queue", type=int, default=5, help="customers who wait before others walk away")
+    parser.add_argument("--capacity", type=float, default=20000.0, help="cash an ATM is replenished to")
+    parser.add_argument("--reorder-level", type=float, default=0.2,
+                        help="order cash when an ATM falls below this fraction of capacity")
+    parser.add_argument("--lead-hours", type=float, default=6.0, help="hours from cash order to replenishment")
+    args = parser.parse_args(argv)
+
+    try:
+        scripts = dict(parse_script(text) for text in args.script) if args.script else None
+    except (ValueError, KeyError, IndexError) as e:
+        parser.error(f"bad --script: {e}")
+    try:
+        stats = run_simulation(
+            args.db, args.days, args.start, args.atms, args.customers, args.seed, args.backend,
+            arrivals_per_hour=args.arrivals_per_hour, distribution=args.distribution, scripts=scripts,
+            step_seconds=args.step_seconds, max_queue=args.max_queue, capacity=args.capacity,
+            reorder_level=args.reorder_level, lead_time=args.lead_hours * 3600,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Accountmanager import AccountManager, fetch_limited_active_atms
+from load_generator import DEFAULT_MIX, LoadStats, load_credentials, parse_mix, run_virtual_atms
+from shard_router import ShardRouter, load_shard_map
+
+
+def split_fleet(atms, processes):
+    """Deals the ATMs round-robin into at most `processes` non-empty groups."""
+    groups = [atms[index::processes] for index in range(processes)]
+    return [group for group in groups if group]
+
+
+def run_fleet_process(atms, credentials, operations_per_atm, mix, seed, db_name, shard_map, write_behind,
+                      manager_options=None):
+    """Worker entry point: owns its AccountManager and connections and returns its LoadStats."""
+    options = dict(manager_options or {}, pool_size=len(atms), write_behind=write_behind)
+    if shard_map:
+        manager = ShardRouter(shard_map, **options)
+    else:
+        manager = AccountManager(db_name, **options)
+    try:
+        stats = run_virtual_atms(manager, atms, credentials, operations_per_atm, mix, seed)
+    finally:
+        manager.close()
+    stats.process_id = os.getpid()
+    return stats
+
+
+def run_fleet(atm_count=100, operations_per_atm=100, processes=None, mix=None, db_name="atm_simulator.db",
+              shard_map=None, seed=None, write_behind=False):
+    """Splits the active ATMs across a process pool and returns (merged stats, per-process stats)."""
+    mix = mix or DEFAULT_MIX
+    processes = processes or os.cpu_count() or 1
+
+    atms = fetch_limited_active_atms(atm_count, db_name, shard_map=shard_map)
+    if not atms:
+        raise ValueError("No active ATMs available in the database.")
+
+    credentials = []
+    for path in shard_map or [db_name]:
+        credentials.extend(load_credentials(path))
+    if not credentials:
+        raise ValueError("No accounts available in the database.")
+
+    groups = split_fleet(atms, processes)
+    seeds = random.Random(seed)
+    # The account cache only sees its own process's writes, so with several processes
+    # it could serve balances another process has since changed
+    manager_options = {"cache_size": 0} if len(groups) > 1 else {}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(groups)) as executor:
+        futures = [
+            executor.submit(run_fleet_process, group, credentials, operations_per_atm, mix,
+                            seeds.random(), db_name, shard_map, write_behind, manager_options)
+            for group in groups
+        ]
+        per_process = [future.result() for future in futures]
+
+    merged = LoadStats()
+    for stats in per_process:
+        merged.merge(stats)
+    merged.elapsed = time.perf_counter() - start
+    return merged, per_process
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-process headless ATM fleet runner.")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--shard-map", default=None, help="shard map JSON; overrides --db")
+    parser.add_argument("--atms", type=int, default=100, help="number of virtual ATMs")
+    parser.add_argument("--ops", type=int, default=100, help="operations per ATM")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="operation weights, e.g. withdraw=50,deposit=30,balance=20")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a repeatable run")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="batch ledger inserts through the write-behind journal")
+    args = parser.parse_args(argv)
+
+    shard_map = load_shard_map(args.shard_map) if args.shard_map else None
+    merged, per_process = run_fleet(args.atms, args.ops, args.processes, args.mix, args.db,
+                                    shard_map, args.seed, args.write_behind)
+    for stats in per_process:
+        print(f"process {stats.process_id}: {stats.total_operations()} operations in {stats.elapsed:.2f}s")
+    print(merged.report())
+
+
+if __name__ == "__main__":
+    main()
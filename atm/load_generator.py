@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import random  # For generating random account IDs, transaction amounts, and types
+import sqlite3
+import time  # For measuring performance time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor  # For multi-threaded execution
+
+from Accountmanager import fetch_limited_active_atms
+from async_account_manager import AsyncAccountManager
+from metrics import format_stats
+from storage import BACKENDS, open_account_manager
+
+# Relative weight of each operation type in the generated workload
+DEFAULT_MIX = {
+    "authenticate": 20,
+    "withdraw": 25,
+    "deposit": 25,
+    "balance": 20,
+    "history": 10,
+}
+
+
+def percentile(sorted_values, pct):
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def parse_mix(text):
+    """Parses an operation mix such as 'withdraw=50,balance=50'."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation '{name}'. Choose from: {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def load_credentials(db_name, limit=1000):
+    """Loads card numbers and PINs used by the virtual customers."""
+    connection = sqlite3.connect(db_name)
+    try:
+        cursor = connection.execute("SELECT account_id, password FROM accounts LIMIT ?", (limit,))
+        return cursor.fetchall()
+    finally:
+        connection.close()
+
+
+class LoadStats:
+    """Latency samples and outcome counts collected per operation type."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)  # Picklable, so worker processes can return it
+        self.elapsed = 0.0
+        self.metrics = None  # AccountManager.stats() snapshot when the run had metrics on
+
+    def record(self, operation, seconds, outcome):
+        self.latencies[operation].append(seconds)
+        self.outcomes[operation][outcome] += 1
+
+    def merge(self, other):
+        """Folds the samples of another LoadStats into this one."""
+        for operation, samples in other.latencies.items():
+            self.latencies[operation].extend(samples)
+        for operation, counts in other.outcomes.items():
+            self.outcomes[operation].update(counts)
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+    def total_operations(self):
+        return sum(len(samples) for samples in self.latencies.values())
+
+    def summary(self):
+        """Returns ops/sec and p50/p95/p99 latency (ms) per operation type."""
+        rows = {}
+        for operation in sorted(self.latencies):
+            samples = sorted(self.latencies[operation])
+            rows[operation] = {
+                "count": len(samples),
+                "ops_per_sec": len(samples) / self.elapsed if self.elapsed else 0.0,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "outcomes": dict(self.outcomes[operation]),
+            }
+        return rows
+
+    def report(self):
+        """Formats the summary as a plain-text table."""
+        width = max([14] + [len(operation) + 2 for operation in self.latencies])
+        lines = [
+            f"{'operation':<{width}}{'count':>8}{'ops/sec':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  outcomes"
+        ]
+        for operation, row in self.summary().items():
+            outcomes = ", ".join(f"{name}={count}" for name, count in sorted(row["outcomes"].items()))
+            lines.append(
+                f"{operation:<{width}}{row['count']:>8}{row['ops_per_sec']:>12.1f}"
+                f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}  {outcomes}"
+            )
+        total = self.total_operations()
+        throughput = total / self.elapsed if self.elapsed else 0.0
+        lines.append(f"Total: {total} operations in {self.elapsed:.2f}s ({throughput:.1f} ops/sec)")
+        return "\n".join(lines)
+
+
+class VirtualATM:
+    """A headless ATM that fires a random operation mix at an AccountManager."""
+
+    def __init__(self, manager, atm_id, location, credentials, mix, seed=None):
+        self.manager = manager
+        self.atm_id = atm_id
+        self.location = location
+        self.credentials = credentials
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.random = random.Random(seed)
+
+    def run_operation(self, operation):
+        """Runs a single operation for a random customer."""
+        account_id, password = self.random.choice(self.credentials)
+        if operation == "authenticate":
+            self.manager.authenticate_user(account_id, password)
+        elif operation == "withdraw":
+            self.manager.withdraw(account_id, self.random.randint(1, 25) * 20, self.atm_id)
+        elif operation == "deposit":
+            self.manager.deposit(account_id, round(self.random.uniform(20.0, 1000.0), 2), self.atm_id)
+        elif operation == "balance":
+            self.manager.get_balance(account_id)
+        elif operation == "history":
+            self.manager.get_transaction_history(account_id)
+
+    def run(self, operation_count, stats):
+        """Runs a number of operations and records their latency into stats."""
+        for _ in range(operation_count):
+            operation = self.random.choices(self.operations, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                self.run_operation(operation)
+                outcome = "ok"
+            except ValueError:
+                outcome = "rejected"  # Business rule failures such as insufficient funds
+            except Exception:
+                outcome = "error"
+            stats.record(operation, time.perf_counter() - start, outcome)
+        return stats
+
+
+class AsyncVirtualATM(VirtualATM):
+    """A VirtualATM driven as a coroutine against an AsyncAccountManager."""
+
+    async def run_operation(self, operation):
+        account_id, password = self.random.choice(self.credentials)
+        if operation == "authenticate":
+            await self.manager.authenticate_user(account_id, password)
+        elif operation == "withdraw":
+            await self.manager.withdraw(account_id, self.random.randint(1, 25) * 20, self.atm_id)
+        elif operation == "deposit":
+            await self.manager.deposit(account_id, round(self.random.uniform(20.0, 1000.0), 2), self.atm_id)
+        elif operation == "balance":
+            await self.manager.get_balance(account_id)
+        elif operation == "history":
+            await self.manager.get_transaction_history(account_id)
+
+    async def run(self, operation_count, stats):
+        for _ in range(operation_count):
+            operation = self.random.choices(self.operations, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                await self.run_operation(operation)
+                outcome = "ok"
+            except ValueError:
+                outcome = "rejected"
+            except TimeoutError:
+                outcome = "timeout"
+            except Exception:
+                outcome = "error"
+            stats.record(operation, time.perf_counter() - start, outcome)
+        return stats
+
+
+def run_virtual_atms(manager, atms, credentials, operations_per_atm, mix, seed=None):
+    """Runs one thread per ATM against manager and returns the merged LoadStats."""
+    seeds = random.Random(seed)
+    virtual_atms = [
+        VirtualATM(manager, atm_id, location, credentials, mix, seeds.random())
+        for atm_id, location in atms
+    ]
+
+    stats = LoadStats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(virtual_atms)) as executor:
+        futures = [executor.submit(atm.run, operations_per_atm, LoadStats()) for atm in virtual_atms]
+        for future in futures:
+            stats.merge(future.result())
+        manager.flush()
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def run_load(atm_count=10, operations_per_atm=100, mix=None, db_name="atm_simulator.db",
+             pool_size=None, seed=None, write_behind=False, metrics=False, trace_file=None, backend="sqlite"):
+    """Drives atm_count virtual ATMs concurrently and returns the collected LoadStats."""
+    mix = mix or DEFAULT_MIX
+    atms = fetch_limited_active_atms(atm_count, db_name)
+    if not atms:
+        raise ValueError("No active ATMs available in the database.")
+
+    credentials = load_credentials(db_name)
+    if not credentials:
+        raise ValueError("No accounts available in the database.")
+
+    options = {"pool_size": pool_size or len(atms), "metrics": metrics}
+    if backend == "sqlite":
+        options.update(write_behind=write_behind, trace_file=trace_file,
+                       trace_snapshot=f"{trace_file}.base.db" if trace_file else None)
+    manager = open_account_manager(db_name, backend, **options)
+    try:
+        stats = run_virtual_atms(manager, atms, credentials, operations_per_atm, mix, seed)
+        stats.metrics = manager.stats()
+        return stats
+    finally:
+        manager.close()
+
+
+async def run_async_load(atm_count=1000, operations_per_atm=100, mix=None, db_name="atm_simulator.db",
+                         workers=8, seed=None, write_behind=False, timeout=None, metrics=False):
+    """Drives atm_count coroutine ATMs from a single thread through an AsyncAccountManager."""
+    mix = mix or DEFAULT_MIX
+    atms = fetch_limited_active_atms(atm_count, db_name)
+    if not atms:
+        raise ValueError("No active ATMs available in the database.")
+
+    credentials = load_credentials(db_name)
+    if not credentials:
+        raise ValueError("No accounts available in the database.")
+
+    seeds = random.Random(seed)
+    stats = LoadStats()
+    async with AsyncAccountManager(db_name=db_name, max_workers=workers, timeout=timeout,
+                                   write_behind=write_behind, metrics=metrics) as manager:
+        virtual_atms = [
+            AsyncVirtualATM(manager, atm_id, location, credentials, mix, seeds.random())
+            for atm_id, location in atms
+        ]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(atm.run(operations_per_atm, LoadStats()) for atm in virtual_atms))
+        for result in results:
+            stats.merge(result)
+        await manager.flush()
+        stats.elapsed = time.perf_counter() - start
+        stats.metrics = manager.stats()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless multi-ATM load generator.")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--atms", type=int, default=10, help="number of virtual ATMs")
+    parser.add_argument("--ops", type=int, default=100, help="operations per ATM")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="operation weights, e.g. withdraw=50,deposit=30,balance=20")
+    parser.add_argument("--pool-size", type=int, default=None, help="connection pool size")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a repeatable run")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="batch ledger inserts through the write-behind journal")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="drive the ATMs as coroutines through AsyncAccountManager")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="per-call timeout in seconds (async mode only)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="instrument AccountManager and print where each method spends its time")
+    parser.add_argument("--record", default=None,
+                        help="record every call to this trace file (and the starting database to <file>.base.db)")
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite",
+                        help="storage backend; 'memory' snapshots to --db in the background")
+    args = parser.parse_args(argv)
+    if args.backend != "sqlite" and (args.use_async or args.record or args.write_behind):
+        parser.error("--async, --record and --write-behind need the sqlite backend")
+
+    if args.use_async:
+        stats = asyncio.run(run_async_load(args.atms, args.ops, args.mix, args.db, args.pool_size or 8,
+                                           args.seed, args.write_behind, args.timeout, args.metrics))
+    else:
+        stats = run_load(args.atms, args.ops, args.mix, args.db, args.pool_size, args.seed, args.write_behind,
+                         args.metrics, args.record, args.backend)
+    print(stats.report())
+    if stats.metrics is not None:
+        print()
+        print(format_stats(stats.metrics))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import threading
+from contextlib import ExitStack, contextmanager
+
+
+class StripedLock:
+    """A fixed table of locks; each key maps to one stripe so unrelated keys rarely contend."""
+
+    def __init__(self, stripes=64):
+        if stripes <= 0:
+            raise ValueError("Number of lock stripes must be greater than zero.")
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripe(self, key):
+        """Returns the index of the stripe guarding key."""
+        return hash(key) % len(self.locks)
+
+    def stripes_for(self, keys):
+        """Returns the distinct stripes for keys in ascending order, the order they must be taken in."""
+        return sorted({self.stripe(key) for key in keys})
+
+    @contextmanager
+    def hold(self, keys):
+        """Holds the stripes of every key; ascending order makes concurrent holders deadlock-free."""
+        acquired = []
+        try:
+            for index in self.stripes_for(keys):
+                self.locks[index].acquire()
+                acquired.append(index)
+            yield
+        finally:
+            for index in reversed(acquired):
+                self.locks[index].release()
+
+
+@contextmanager
+def hold_in_order(*tables_and_keys):
+    """Holds stripes from several tables, always table by table in the order given.
+
+    Every caller passes the tables in the same order (accounts before ATMs), so two
+    operations that touch overlapping keys can never wait on each other in a cycle.
+    """
+    with ExitStack() as stack:
+        for table, keys in tables_and_keys:
+            stack.enter_context(table.hold(keys))
+        yield
@@ -1,33 +1,22 @@
 import tkinter as tk
 from tkinter import messagebox
-import sqlite3
 from threading import Thread
-import threading
-import random  # For generating random account IDs, transaction amounts, and types
-import time  # For measuring performance time
-from concurrent.futures import ThreadPoolExecutor  # For multi-threaded execution
+from concurrent.futures import ThreadPoolExecutor
 
-from ATMGUI import ATMUI  # Ensure ATMUI is correctly implemented
-from Accountmanager import AccountManager  # AccountManager handles authentication
-
-
-def fetch_limited_active_atms(limit, db_name="atm_simulator.db"):
-    """Fetch a limited number of active ATMs from the database."""
-    connection = sqlite3.connect(db_name)
-    cursor = connection.cursor()
-
-    # Query to fetch active ATMs
-    query = "SELECT atm_id, location FROM atms WHERE status = 'Active' LIMIT ?"
-    cursor.execute(query, (limit,))
-    atms = cursor.fetchall()
-
-    connection.close()
-    return atms
+from Accountmanager import AccountManager, fetch_limited_active_atms  # AccountManager handles authentication
+from shard_router import ShardRouter, load_shard_map
 
 
 class ATMApp:
-    def __init__(self):
-        self.manager = AccountManager()
+    def __init__(self, db_workers=8, shard_map=None):
+        # With a shard map, accounts and ATMs are spread across several database files
+        self.shard_map = shard_map
+        if shard_map:
+            self.manager = ShardRouter(shard_map, pool_size=db_workers)
+        else:
+            self.manager = AccountManager(pool_size=db_workers)
+        # Shared by every ATM window so database calls stay off the Tk main loop
+        self.db_executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="atm-db")
         self.main_window()
 
     def main_window(self):
@@ -61,6 +50,21 @@ class ATMApp:
         self.atm_count_entry = tk.Entry(entry_frame, font=("Helvetica", 12), width=10)
         self.atm_count_entry.pack(side=tk.LEFT, padx=5)
 
+        # One window listing the whole fleet, instead of a window per ATM
+        self.dashboard_mode = tk.BooleanVar(value=True)
+        dashboard_check = tk.Checkbutton(
+            self.root,
+            text="Single-window dashboard",
+            variable=self.dashboard_mode,
+            font=("Helvetica", 11),
+            bg="#2c3e50",
+            fg="#ecf0f1",
+            selectcolor="#34495e",
+            activebackground="#2c3e50",
+            activeforeground="#ecf0f1"
+        )
+        dashboard_check.pack()
+
         start_button = tk.Button(
             self.root,
             text="Start Simulation",
@@ -73,8 +77,15 @@ class ATMApp:
         )
         start_button.pack(pady=20)
 
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
         self.root.mainloop()
 
+    def shutdown(self):
+        """Close the database connection pool and the main window."""
+        self.db_executor.shutdown(wait=False, cancel_futures=True)  # In-flight calls finish on their own
+        self.manager.close()
+        self.root.destroy()
+
     def start_simulation(self):
         """Start the ATM simulation using threads."""
         try:
@@ -84,7 +95,7 @@ class ATMApp:
                 raise ValueError("Number of ATMs must be greater than zero.")
 
             # Fetch the specified number of ATMs
-            atms = fetch_limited_active_atms(atm_count)
+            atms = fetch_limited_active_atms(atm_count, shard_map=self.shard_map)
 
             if not atms:
                 messagebox.showinfo("No ATMs Found", "No active ATMs available in the database.")
@@ -95,6 +106,12 @@ class ATMApp:
                     f"Only {len(atms)} active ATMs are available. Launching {len(atms)} simulation(s)."
                 )
 
+            if self.dashboard_mode.get():
+                from dashboard import FleetDashboard  # ATM screens are only loaded once needed
+
+                FleetDashboard(tk.Toplevel(self.root), self.manager, atms, self.db_executor)
+                return
+
             # Launch a thread for each ATM
             for atm_id, location in atms:
                 thread = Thread(target=self.launch_atm, args=(atm_id, location))
@@ -109,15 +126,20 @@ class ATMApp:
 
     def create_atm_window(self, atm_id, location):
         """Create a new window for the ATM."""
+        from ATMGUI import ATMUI
+
         atm_window = tk.Toplevel(self.root)
         atm_window.title(f"ATM {atm_id}")
         atm_window.geometry("400x400")
         atm_window.configure(bg="#2c3e50")
-        ATMUI(atm_window, self.manager, location, atm_id)
+        ATMUI(atm_window, self.manager, location, atm_id, self.db_executor)
         
         
 if __name__ == "__main__":
-    app = ATMApp()    
+    import sys
+
+    # Optional: python main_window.py shards.json
+    app = ATMApp(shard_map=load_shard_map(sys.argv[1]) if len(sys.argv) > 1 else None)    
         
   
 
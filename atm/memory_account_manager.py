@@ -0,0 +1,403 @@
+import threading
+import time
+from array import array
+
+from Accountmanager import BATCH_OPERATIONS, TRANSACTION_COLUMNS
+from connection_pool import ConnectionPool
+from Create_and_populate_database import migrate_database
+from metrics import Metrics
+from session import Session
+from storage import AccountStore
+from transaction_archive import ArchiveSet
+
+# Ledger pages from the snapshot database, capped at the newest transaction_id that is
+# not still held in the ring buffer so rows are never returned twice
+SNAPSHOT_PAGE_QUERIES = {
+    "newest_first": f"""
+        SELECT {TRANSACTION_COLUMNS} FROM transactions
+        WHERE account_id = ? AND transaction_id <= ? AND (timestamp, transaction_id) < (?, ?)
+        ORDER BY timestamp DESC, transaction_id DESC LIMIT ?
+    """,
+    "oldest_first": f"""
+        SELECT {TRANSACTION_COLUMNS} FROM transactions
+        WHERE account_id = ? AND transaction_id <= ? AND (timestamp, transaction_id) > (?, ?)
+        ORDER BY timestamp, transaction_id LIMIT ?
+    """,
+}
+# Cursor to start from when the caller passes none: before the first or after the last row
+START_CURSORS = {"newest_first": ("9999-12-31 23:59:59", 0), "oldest_first": ("", 0)}
+
+
+def format_timestamp(seconds):
+    """Renders epoch seconds like SQLite's CURRENT_TIMESTAMP (UTC)."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(seconds))
+
+
+class MemoryAccountManager(AccountStore):
+    """AccountManager drop-in that keeps accounts, ATMs and new ledger entries in memory.
+
+    Balances and cash levels live in arrays indexed by id, loaded once from db_name.
+    New ledger entries go into a fixed-size ring buffer of parallel arrays; each entry
+    links to the previous entry of the same account, so history reads walk only that
+    account's rows. A background thread writes changed balances, cash levels and new
+    ledger rows back to db_name every snapshot_interval seconds. When the ring is full
+    of entries no snapshot has saved yet, the next write waits for an immediate
+    snapshot instead of overwriting them, so the saved ledger always matches the saved
+    balances. A crash loses at most one interval. This suits what-if simulations, not
+    a real bank.
+    """
+
+    def __init__(self, db_name="atm_simulator.db", pool_size=5, session_ttl=300.0,
+                 snapshot_interval=5.0, ledger_capacity=1 << 20, metrics=False, clock=time.time):
+        self.db_name = db_name
+        self.clock = clock  # Ledger time source in epoch seconds
+        self.session_ttl = session_ttl
+        self.snapshot_interval = snapshot_interval
+        self.lock = threading.Lock()  # Guards every in-memory structure; each operation is O(1)
+        self.saved = threading.Condition(self.lock)  # Notified when a snapshot moves saved_seq on
+        self.pool = ConnectionPool(db_name, size=pool_size)  # Snapshot writes and older history reads
+        self.archives = ArchiveSet(db_name, pool_size)  # Months moved out by transaction_archive.py
+
+        with self.pool.connection() as connection:
+            migrate_database(connection)
+            self._load(connection)
+
+        # Ledger ring buffer: entry seq lives in slot seq % capacity
+        self.capacity = ledger_capacity
+        self.entry_account = array("q", [0]) * ledger_capacity
+        self.entry_atm = array("q", [0]) * ledger_capacity  # -1 when no ATM was involved
+        self.entry_type = array("H", [0]) * ledger_capacity
+        self.entry_amount = array("d", [0.0]) * ledger_capacity
+        self.entry_time = array("d", [0.0]) * ledger_capacity
+        self.entry_prev = array("q", [0]) * ledger_capacity  # Previous seq of the same account, 0 if none
+        self.type_names = []
+        self.type_codes = {}
+        self.stalls = 0  # Writes that waited for a snapshot because the ring was full
+        self.snapshots = 0
+
+        self.metrics = None
+        if metrics:
+            self.metrics = metrics if isinstance(metrics, Metrics) else Metrics()
+            self.metrics.instrument(self)
+
+        self._snapshot_lock = threading.Lock()  # One snapshot at a time
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # Set to snapshot before the interval is up
+        self._thread = threading.Thread(target=self._run, name="memory-snapshot", daemon=True)
+        self._thread.start()
+
+    def _load(self, connection):
+        """Reads accounts and ATMs into id-indexed arrays."""
+        accounts = connection.execute(
+            "SELECT account_id, account_holder_name, password, balance FROM accounts"
+        ).fetchall()
+        size = max((row[0] for row in accounts), default=0) + 1
+        self.account_exists = bytearray(size)
+        self.balances = array("d", [0.0]) * size
+        self.names = [None] * size
+        self.passwords = [None] * size
+        self.last_entry = array("q", [0]) * size  # Newest ledger seq per account, 0 if none
+        for account_id, name, password, balance in accounts:
+            self.account_exists[account_id] = 1
+            self.names[account_id] = name
+            self.passwords[account_id] = password
+            self.balances[account_id] = balance
+
+        atms = connection.execute("SELECT atm_id, cash_level FROM atms").fetchall()
+        size = max((row[0] for row in atms), default=0) + 1
+        self.atm_exists = bytearray(size)
+        self.cash_levels = array("d", [0.0]) * size
+        for atm_id, cash_level in atms:
+            self.atm_exists[atm_id] = 1
+            self.cash_levels[atm_id] = cash_level
+
+        # sqlite_sequence still counts ids whose rows were archived away, so new entries
+        # never reuse an archived transaction_id
+        last_id = connection.execute(
+            "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'transactions'), 0), "
+            "COALESCE((SELECT MAX(transaction_id) FROM transactions), 0))"
+        ).fetchone()[0]
+        self.first_seq = last_id + 1  # Ring entries use transaction_ids after the ones already on disk
+        self.next_seq = self.first_seq
+        self.saved_seq = last_id  # Newest ledger entry written to db_name
+        self.dirty_accounts = set()
+        self.dirty_atms = set()
+
+    def _has_account(self, account_id):
+        return 0 <= account_id < len(self.account_exists) and self.account_exists[account_id]
+
+    def _has_atm(self, atm_id):
+        return 0 <= atm_id < len(self.atm_exists) and self.atm_exists[atm_id]
+
+    def _append(self, account_id, transaction_type, amount, atm_id):
+        """Adds a ledger entry to the ring buffer; the caller holds self.lock."""
+        code = self.type_codes.get(transaction_type)
+        if code is None:
+            code = self.type_codes[transaction_type] = len(self.type_names)
+            self.type_names.append(transaction_type)
+
+        while self.next_seq - self.capacity > self.saved_seq:
+            # The slot still holds an unsaved entry; wait() releases the lock so the
+            # snapshot thread can save it
+            self.stalls += 1
+            self._wake.set()
+            self.saved.wait()
+
+        seq = self.next_seq
+        self.next_seq += 1
+        slot = seq % self.capacity
+        self.entry_account[slot] = account_id
+        self.entry_atm[slot] = -1 if atm_id is None else atm_id
+        self.entry_type[slot] = code
+        self.entry_amount[slot] = amount
+        self.entry_time[slot] = self.clock()
+        if 0 <= account_id < len(self.last_entry):
+            self.entry_prev[slot] = self.last_entry[account_id]
+            self.last_entry[account_id] = seq
+        else:
+            self.entry_prev[slot] = 0
+
+    def _ring_floor(self):
+        """Returns the newest seq no longer in the ring buffer (every seq after it still is)."""
+        return max(self.next_seq - 1 - self.capacity, self.first_seq - 1)
+
+    def authenticate_user(self, account_id, password):
+        """Validates user credentials; returns a Session, or None if they are wrong."""
+        with self.lock:
+            if not self._has_account(account_id) or self.passwords[account_id] != password:
+                return None
+            name, balance = self.names[account_id], self.balances[account_id]
+        return Session(account_id, name, balance, self.session_ttl)
+
+    def get_balance(self, account):
+        """Retrieves the current balance of an account."""
+        account_id = self.resolve_account(account)
+        with self.lock:
+            if not self._has_account(account_id):
+                print(f"No account found with ID {account_id}")
+                return None
+            balance = self.balances[account_id]
+        if isinstance(account, Session):
+            account.balance = balance
+        return balance
+
+    def get_account_name(self, account):
+        """Retrieves the account holder's name."""
+        if isinstance(account, Session):
+            self.resolve_account(account)
+            return account.name
+        with self.lock:
+            return self.names[account] if self._has_account(account) else None
+
+    def deposit(self, account, amount, atm_id):
+        """Deposits an amount into an account and updates the ATM cash level."""
+        account_id = self.resolve_account(account)
+        if amount <= 0:
+            raise ValueError("Deposit amount must be greater than zero.")
+
+        with self.lock:
+            if not self._has_account(account_id):
+                raise ValueError("Account does not exist.")
+            if not self._has_atm(atm_id):
+                raise ValueError("ATM not found.")
+            self.balances[account_id] += amount
+            self.cash_levels[atm_id] += amount
+            balance = self.balances[account_id]
+            self.dirty_accounts.add(account_id)
+            self.dirty_atms.add(atm_id)
+            self._append(account_id, "Deposit", amount, atm_id)
+
+        if isinstance(account, Session):
+            account.balance = balance
+
+    def withdraw(self, account, amount, atm_id):
+        """Withdraws an amount from an account, considering ATM cash levels."""
+        account_id = self.resolve_account(account)
+        if amount <= 0:
+            raise ValueError("Withdrawal amount must be greater than zero.")
+
+        with self.lock:
+            if not self._has_account(account_id):
+                raise ValueError("Account does not exist.")
+            if self.balances[account_id] < amount:
+                raise ValueError("Insufficient balance in the account.")
+            if not self._has_atm(atm_id):
+                raise ValueError("ATM not found.")
+            if self.cash_levels[atm_id] < amount:
+                raise ValueError(
+                    f"ATM does not have enough cash. Available: {self.cash_levels[atm_id]}. Try a smaller amount."
+                )
+            self.balances[account_id] -= amount
+            self.cash_levels[atm_id] -= amount
+            balance = self.balances[account_id]
+            self.dirty_accounts.add(account_id)
+            self.dirty_atms.add(atm_id)
+            self._append(account_id, "Withdrawal", amount, atm_id)
+
+        if isinstance(account, Session):
+            account.balance = balance
+
+    def replenish_atm(self, atm_id, cash_level):
+        """Refills an ATM's cassettes to cash_level; returns the cash added (negative if removed)."""
+        if cash_level < 0:
+            raise ValueError("Cash level cannot be negative.")
+        with self.lock:
+            if not self._has_atm(atm_id):
+                raise ValueError("ATM not found.")
+            added = cash_level - self.cash_levels[atm_id]
+            self.cash_levels[atm_id] = cash_level
+            self.dirty_atms.add(atm_id)
+        return added
+
+    def apply_batch(self, operations, chunk_size=1000):
+        """Applies (operation, account, amount, atm_id) records; see AccountManager.apply_batch."""
+        results = []
+        for operation, account, amount, atm_id in operations:
+            kind = BATCH_OPERATIONS.get(str(operation).lower())
+            try:
+                if kind is None:
+                    raise ValueError(f"Unknown operation '{operation}'. Use 'deposit' or 'withdraw'.")
+                account_id = self.resolve_account(account)
+                if amount <= 0:
+                    raise ValueError(f"{kind} amount must be greater than zero.")
+                with self.lock:
+                    if not self._has_account(account_id):
+                        raise ValueError("Account does not exist.")
+                    if kind == "Withdrawal" and self.balances[account_id] < amount:
+                        raise ValueError("Insufficient balance in the account.")
+                    if atm_id is not None:
+                        if not self._has_atm(atm_id):
+                            raise ValueError("ATM not found.")
+                        if kind == "Withdrawal" and self.cash_levels[atm_id] < amount:
+                            raise ValueError(f"ATM does not have enough cash. Available: "
+                                             f"{self.cash_levels[atm_id]}. Try a smaller amount.")
+                    change = -amount if kind == "Withdrawal" else amount
+                    self.balances[account_id] += change
+                    self.dirty_accounts.add(account_id)
+                    if atm_id is not None:
+                        self.cash_levels[atm_id] += change
+                        self.dirty_atms.add(atm_id)
+                    self._append(account_id, kind, amount, atm_id)
+                    results.append((True, self.balances[account_id]))
+            except ValueError as e:
+                results.append((False, str(e)))
+        return results
+
+    def log_transaction(self, account, transaction_type, amount, atm_id=None):
+        """Logs a transaction."""
+        account_id = self.resolve_account(account)
+        with self.lock:
+            self._append(account_id, transaction_type, amount, atm_id)
+
+    def get_transaction_page(self, account, limit=20, cursor=None, order="newest_first"):
+        """Returns one page of transaction rows and the cursor for the next page.
+
+        Same contract as AccountManager.get_transaction_page. Rows still in the ring
+        buffer come from memory, older ones from the snapshot database and archived
+        months from their archive files.
+        """
+        account_id = self.resolve_account(account)
+        newest_first = self._check_order(order)
+        timestamp, transaction_id = cursor if cursor is not None else START_CURSORS[order]
+
+        rows = []
+        with self.lock:
+            floor = self._ring_floor()
+            seq = self.last_entry[account_id] if 0 <= account_id < len(self.last_entry) else 0
+            while seq > floor:
+                slot = seq % self.capacity
+                row = (seq, account_id, self.type_names[self.entry_type[slot]], self.entry_amount[slot],
+                       format_timestamp(self.entry_time[slot]))
+                key = (row[4], seq)
+                if key < (timestamp, transaction_id) if newest_first else key > (timestamp, transaction_id):
+                    rows.append(row)
+                seq = self.entry_prev[slot]
+
+        query = SNAPSHOT_PAGE_QUERIES[order]
+        params = (account_id, floor, timestamp, transaction_id, limit)
+        with self.pool.connection() as connection:
+            rows = self._read_page(connection, query, params, limit, cursor, newest_first, rows)
+        return rows, self._next_cursor(rows, limit)
+
+    def snapshot(self):
+        """Writes changed balances, cash levels and unsaved ledger entries to db_name now."""
+        with self._snapshot_lock:
+            with self.lock:
+                accounts = [(self.balances[i], i) for i in self.dirty_accounts]
+                atms = [(self.cash_levels[i], i) for i in self.dirty_atms]
+                dirty_accounts, dirty_atms = self.dirty_accounts, self.dirty_atms
+                self.dirty_accounts, self.dirty_atms = set(), set()
+                last_seq = self.next_seq - 1
+                entries = []
+                for seq in range(max(self.saved_seq, self._ring_floor()) + 1, last_seq + 1):
+                    slot = seq % self.capacity
+                    atm_id = self.entry_atm[slot]
+                    entries.append((
+                        seq, self.entry_account[slot], None if atm_id < 0 else atm_id,
+                        self.type_names[self.entry_type[slot]], self.entry_amount[slot],
+                        format_timestamp(self.entry_time[slot])
+                    ))
+
+            if not (accounts or atms or entries):
+                return True
+            try:
+                with self.pool.connection() as connection:
+                    connection.execute("BEGIN IMMEDIATE")
+                    connection.executemany("UPDATE accounts SET balance = ? WHERE account_id = ?", accounts)
+                    connection.executemany("UPDATE atms SET cash_level = ? WHERE atm_id = ?", atms)
+                    connection.executemany(
+                        "INSERT INTO transactions (transaction_id, account_id, atm_id, transaction_type, amount, "
+                        "timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                        entries
+                    )
+                    connection.execute("COMMIT")
+            except Exception as e:
+                with self.lock:  # Try again next time
+                    self.dirty_accounts |= dirty_accounts
+                    self.dirty_atms |= dirty_atms
+                print(f"Error writing memory snapshot to {self.db_name}, will retry: {e}")
+                return False
+
+            with self.lock:
+                self.saved_seq = last_seq
+                self.saved.notify_all()
+            self.snapshots += 1
+            return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.snapshot_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.snapshot()
+
+    def storage_stats(self):
+        """Returns ledger entry counts and how many writes waited for a snapshot to make room."""
+        with self.lock:
+            return {
+                "entries": self.next_seq - self.first_seq,
+                "unsaved": self.next_seq - 1 - self.saved_seq,
+                "stalls": self.stalls,
+                "snapshots": self.snapshots,
+            }
+
+    def stats(self):
+        """Returns the per-method metrics snapshot, or None when metrics are off."""
+        if self.metrics is None:
+            return None
+        return self.metrics.stats()
+
+    def flush(self, timeout=None):
+        """Saves everything changed so far to db_name."""
+        return self.snapshot()
+
+    def close(self):
+        """Stops the snapshot thread, saves a final snapshot and closes the database connections."""
+        if not self._stop.is_set():
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self.snapshot()
+        self.archives.close()
+        self.pool.close()
@@ -0,0 +1,248 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from 100us to 5s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Where an operation spends its time; each phase is timed separately per method
+PHASES = (
+    "connection",  # Checking out (or opening) a pooled connection
+    "lock_wait",  # Waiting on account/ATM lock stripes and the single-writer lock
+    "sqlite",  # Running statements
+    "commit",  # COMMIT, including the WAL fsync
+)
+
+# AccountManager methods that are counted and timed when metrics are on
+INSTRUMENTED_METHODS = (
+    "authenticate_user",
+    "get_balance",
+    "get_account_name",
+    "deposit",
+    "withdraw",
+    "apply_batch",
+    "replenish_atm",
+    "log_transaction",
+    "get_transaction_history",
+    "get_transaction_page",
+)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        for bound in self.buckets:
+            if seconds <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket it falls in (seconds)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.50) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+        }
+
+
+class Metrics:
+    """Call counts, error counts and latency histograms per method, split into phases.
+
+    Phases observed while an instrumented method runs are charged to that method (the
+    outermost one when calls nest); anything else is charged to "other".
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.calls = {}  # method -> Histogram of whole-call latency
+        self.errors = {}  # method -> number of calls that raised
+        self.phases = {}  # (method, phase) -> Histogram
+        self._lock = threading.Lock()
+        self._local = threading.local()  # The instrumented method running on this thread
+
+    def observe_call(self, method, seconds, error=False):
+        with self._lock:
+            histogram = self.calls.get(method)
+            if histogram is None:
+                histogram = self.calls[method] = Histogram(self.buckets)
+                self.errors[method] = 0
+            histogram.observe(seconds)
+            if error:
+                self.errors[method] += 1
+
+    def observe_phase(self, phase, seconds):
+        key = (getattr(self._local, "method", None) or "other", phase)
+        with self._lock:
+            histogram = self.phases.get(key)
+            if histogram is None:
+                histogram = self.phases[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timing(self, phase):
+        """Times the body of the with block as phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(phase, time.perf_counter() - started)
+
+    @contextmanager
+    def waiting(self, phase, context):
+        """Enters context, timing only how long entering it took (e.g. acquiring a lock)."""
+        started = time.perf_counter()
+        with context as value:
+            self.observe_phase(phase, time.perf_counter() - started)
+            yield value
+
+    def instrument(self, target, method_names=INSTRUMENTED_METHODS):
+        """Replaces the named methods on the target instance with timed wrappers."""
+        for name in method_names:
+            setattr(target, name, self._wrap(name, getattr(target, name)))
+
+    def _wrap(self, name, method):
+        local = self._local
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            outer = getattr(local, "method", None)
+            if outer is None:
+                local.method = name
+            started = time.perf_counter()
+            error = False
+            try:
+                return method(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                self.observe_call(name, time.perf_counter() - started, error)
+                if outer is None:
+                    local.method = None
+
+        return timed
+
+    def stats(self):
+        """Returns a snapshot: per method, call/error counts, latency and time per phase."""
+        with self._lock:
+            snapshot = {}
+            for method, histogram in self.calls.items():
+                snapshot[method] = dict(histogram.snapshot(), errors=self.errors[method], phases={})
+            for (method, phase), histogram in self.phases.items():
+                entry = snapshot.setdefault(method, {"phases": {}})
+                entry["phases"][phase] = histogram.snapshot()
+            return snapshot
+
+    def prometheus_text(self, prefix="atm"):
+        """Renders every histogram and counter in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append(f"# TYPE {prefix}_calls_total counter")
+            for method, histogram in sorted(self.calls.items()):
+                lines.append(f'{prefix}_calls_total{{method="{method}"}} {histogram.count}')
+            lines.append(f"# TYPE {prefix}_errors_total counter")
+            for method, errors in sorted(self.errors.items()):
+                lines.append(f'{prefix}_errors_total{{method="{method}"}} {errors}')
+            lines.append(f"# TYPE {prefix}_call_seconds histogram")
+            for method, histogram in sorted(self.calls.items()):
+                lines.extend(_histogram_lines(f"{prefix}_call_seconds", f'method="{method}"', histogram))
+            lines.append(f"# TYPE {prefix}_phase_seconds histogram")
+            for (method, phase), histogram in sorted(self.phases.items()):
+                labels = f'method="{method}",phase="{phase}"'
+                lines.extend(_histogram_lines(f"{prefix}_phase_seconds", labels, histogram))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="atm"):
+        """Writes prometheus_text() to path atomically, so scrapers never see half a file."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            handle.write(self.prometheus_text(prefix))
+        os.replace(temporary, path)
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+class MetricsDumper:
+    """Background thread that rewrites a Prometheus text file every interval seconds."""
+
+    def __init__(self, metrics, path, interval=15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dumper", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._dump()
+
+    def _dump(self):
+        try:
+            self.metrics.write_prometheus(self.path)
+        except OSError as e:
+            print(f"Error writing metrics to {self.path}: {e}")
+
+    def close(self):
+        """Stops the thread and writes a final dump."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self._dump()
+
+
+def format_stats(snapshot):
+    """Formats a stats() snapshot as a plain-text table of mean time per phase (ms)."""
+    lines = [
+        f"{'method':<26}{'calls':>8}{'errors':>8}{'mean ms':>10}{'p99 ms':>10}"
+        + "".join(f"{phase:>12}" for phase in PHASES)
+    ]
+    for method, entry in sorted(snapshot.items()):
+        phases = entry["phases"]
+        lines.append(
+            f"{method:<26}{entry.get('count', 0):>8}{entry.get('errors', 0):>8}"
+            f"{entry.get('mean_ms', 0.0):>10.3f}{entry.get('p99_ms', 0.0):>10.2f}"
+            + "".join(
+                f"{phases[phase]['total_seconds'] / max(entry.get('count', 0), 1) * 1000:>12.3f}"
+                if phase in phases else f"{'-':>12}"
+                for phase in PHASES
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,101 @@
+import argparse
+from datetime import datetime, timezone
+
+from Accountmanager import AccountManager
+from shard_router import ShardRouter, load_shard_map
+
+ATM_DAILY_COLUMNS = ["atm_id", "day", "cash_dispensed", "cash_deposited", "withdrawal_count", "deposit_count"]
+
+ATM_DAILY_TOTALS_QUERY = f"""
+    SELECT {', '.join(ATM_DAILY_COLUMNS)} FROM atm_daily_totals
+    WHERE atm_id = ? AND day BETWEEN ? AND ? ORDER BY day
+"""
+FLEET_DAILY_TOTALS_QUERY = f"""
+    SELECT {', '.join(ATM_DAILY_COLUMNS)} FROM atm_daily_totals
+    WHERE day = ? ORDER BY atm_id
+"""
+DAILY_TRANSACTION_COUNTS_QUERY = """
+    SELECT transaction_type, transaction_count, total_amount FROM daily_transaction_counts
+    WHERE day = ? ORDER BY transaction_type
+"""
+
+
+def today():
+    """Returns the current UTC day, matching the ledger's CURRENT_TIMESTAMP."""
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def query_shards(manager, query, params):
+    """Runs a report query on every shard of a ShardRouter, or on the manager's one database."""
+    rows = []
+    for shard in getattr(manager, "shards", [manager]):
+        rows += shard.execute_query(query, params, fetch_all=True)
+    return rows
+
+
+def sum_atm_days(rows):
+    """Adds up the (atm_id, day, ...) rows that several shards hold for one ATM and day.
+
+    Ledger rows, and so the totals, live on the account's shard, so an ATM used by
+    customers of several shards has a partial row on each. Returns dicts ordered by
+    ATM and day.
+    """
+    totals = {}
+    for atm_id, day, *values in rows:
+        current = totals.get((atm_id, day))
+        totals[(atm_id, day)] = values if current is None else [a + b for a, b in zip(current, values)]
+    return [dict(zip(ATM_DAILY_COLUMNS, key + tuple(values))) for key, values in sorted(totals.items())]
+
+
+def atm_daily_totals(manager, atm_id, start_day=None, end_day=None):
+    """Returns one row per day of cash dispensed/deposited and counts for an ATM."""
+    end_day = end_day or today()
+    start_day = start_day or end_day
+    return sum_atm_days(query_shards(manager, ATM_DAILY_TOTALS_QUERY, (atm_id, start_day, end_day)))
+
+
+def cash_dispensed(manager, atm_id, day=None):
+    """Returns the cash an ATM dispensed on a day (today by default)."""
+    rows = atm_daily_totals(manager, atm_id, day, day)
+    return rows[0]["cash_dispensed"] if rows else 0.0
+
+
+def fleet_daily_totals(manager, day=None):
+    """Returns the totals of every ATM that handled cash on a day."""
+    return sum_atm_days(query_shards(manager, FLEET_DAILY_TOTALS_QUERY, (day or today(),)))
+
+
+def daily_transaction_counts(manager, day=None):
+    """Returns {transaction_type: (count, total_amount)} for a day."""
+    counts = {}
+    for transaction_type, count, total in query_shards(manager, DAILY_TRANSACTION_COUNTS_QUERY, (day or today(),)):
+        previous_count, previous_total = counts.get(transaction_type, (0, 0.0))
+        counts[transaction_type] = (previous_count + count, previous_total + total)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daily cash and transaction reports.")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--shard-map", default=None, help="shard map JSON; overrides --db")
+    parser.add_argument("--day", default=None, help="day as YYYY-MM-DD (default: today, UTC)")
+    parser.add_argument("--atm", type=int, default=None, help="report a single ATM")
+    args = parser.parse_args(argv)
+    day = args.day or today()
+
+    manager = ShardRouter(load_shard_map(args.shard_map)) if args.shard_map else AccountManager(args.db)
+    try:
+        rows = atm_daily_totals(manager, args.atm, day, day) if args.atm else fleet_daily_totals(manager, day)
+        print(f"{'atm':>6}{'dispensed':>14}{'deposited':>14}{'withdrawals':>13}{'deposits':>10}")
+        for row in rows:
+            print(f"{row['atm_id']:>6}{row['cash_dispensed']:>14.2f}{row['cash_deposited']:>14.2f}"
+                  f"{row['withdrawal_count']:>13}{row['deposit_count']:>10}")
+        print(f"\nTransactions on {day}:")
+        for transaction_type, (count, total) in daily_transaction_counts(manager, day).items():
+            print(f"  {transaction_type:<12}{count:>8}{total:>14.2f}")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
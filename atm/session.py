@@ -0,0 +1,24 @@
+import time
+
+
+class Session:
+    """An authenticated card: carries what the screens need so they don't re-query the account."""
+
+    __slots__ = ("account_id", "name", "balance", "expires_at", "ttl")
+
+    def __init__(self, account_id, name, balance, ttl=300.0):
+        self.account_id = account_id
+        self.name = name
+        self.balance = balance  # Balance as of the last operation in this session
+        self.ttl = ttl
+        self.expires_at = time.monotonic() + ttl
+
+    def is_expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def touch(self):
+        """Extends the session after activity."""
+        self.expires_at = time.monotonic() + self.ttl
+
+    def __repr__(self):
+        return f"Session(account_id={self.account_id}, name={self.name!r})"
@@ -0,0 +1,335 @@
+import argparse
+import json
+import sqlite3
+import time
+import uuid
+
+from Accountmanager import BATCH_OPERATIONS, AccountManager, fetch_limited_active_atms
+from Create_and_populate_database import Database, parse_utc
+from lock_striping import StripedLock, hold_in_order
+from session import Session
+from velocity_limits import VelocityLimits
+
+# Bookkeeping for withdrawals and deposits whose account and ATM live on different shards
+TRANSFER_TABLES = [
+    # On the ATM's shard: one row per cross-shard operation and how far it got
+    """
+    CREATE TABLE IF NOT EXISTS cross_shard_transfers (
+        transfer_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        account_id INTEGER NOT NULL,
+        atm_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        state TEXT NOT NULL DEFAULT 'pending',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cross_shard_transfers_state ON cross_shard_transfers (state)",
+    # On the account's shard: written in the same transaction as the balance change
+    """
+    CREATE TABLE IF NOT EXISTS applied_transfers (
+        transfer_id TEXT PRIMARY KEY
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def load_shard_map(path):
+    """Reads a shard map file: {"shards": ["bank_0.db", "bank_1.db", ...]}."""
+    with open(path, encoding="utf-8") as handle:
+        shards = json.load(handle)["shards"]
+    if not shards:
+        raise ValueError("Shard map lists no shards.")
+    return shards
+
+
+def create_shards(shard_paths, num_accounts=100, num_atms=100, num_transactions=100, seed=None, end=None):
+    """Creates one populated database per shard; ids are split by id % len(shard_paths)."""
+    for index, path in enumerate(shard_paths):
+        shard_seed = None if seed is None else seed + index
+        Database(path).create_and_populate_database(
+            num_accounts, num_atms, num_transactions, seed=shard_seed,
+            shard_index=index, shard_count=len(shard_paths), end=end
+        )
+
+
+class ShardRouter:
+    """Routes AccountManager calls to N SQLite files so each shard has its own writer.
+
+    Account rows live on shard account_id % N and ATM rows on shard atm_id % N. When a
+    withdrawal or deposit touches an account and an ATM on different shards, the ATM's
+    shard records the transfer as pending first, the account's shard applies the balance
+    change together with an applied_transfers marker, and the ATM's shard then settles
+    it. recover() finishes or rolls back transfers left pending by a crash by checking
+    for that marker.
+
+    velocity_limits are enforced here rather than by the shards: an ATM's withdrawals
+    are spread over the shards of its customers' accounts, so one set of windows is
+    kept for the whole router and filled from every shard at start-up.
+    """
+
+    def __init__(self, shard_paths, recover_min_age=60, velocity_limits=None, **manager_options):
+        if not shard_paths:
+            raise ValueError("At least one shard is required.")
+        self.shard_paths = list(shard_paths)
+        self.shards = [AccountManager(path, **manager_options) for path in self.shard_paths]
+        for shard in self.shards:
+            with shard.transaction() as cursor:
+                for statement in TRANSFER_TABLES:
+                    cursor.execute(statement)
+        self.recover(recover_min_age)
+
+        # Optional per-card and per-ATM withdrawal limits; pass LimitRules or a VelocityLimits
+        self.limits = None
+        if velocity_limits:
+            self.limits = velocity_limits if isinstance(velocity_limits, VelocityLimits) \
+                else VelocityLimits(velocity_limits, manager_options.get("clock") or time.time)
+            stripes = manager_options.get("lock_stripes", 64)
+            self.account_locks = StripedLock(stripes)
+            self.atm_locks = StripedLock(stripes)
+            self._warm_limits()
+
+    def _warm_limits(self):
+        """Loads the withdrawals still inside the limit windows from every shard."""
+        now = self.limits.clock()
+        rows = []
+        for shard in self.shards:
+            rows += shard.recent_withdrawals(now - self.limits.horizon, now)
+        rows.sort(key=lambda row: row[3])
+        self.limits.warm(rows)
+
+    def account_shard(self, account):
+        account_id = account.account_id if isinstance(account, Session) else account
+        return self.shards[account_id % len(self.shards)]
+
+    def atm_shard(self, atm_id):
+        return self.shards[atm_id % len(self.shards)]
+
+    def authenticate_user(self, account_id, password):
+        """Validates user credentials; returns a Session, or None if they are wrong."""
+        return self.account_shard(account_id).authenticate_user(account_id, password)
+
+    def get_balance(self, account):
+        return self.account_shard(account).get_balance(account)
+
+    def get_account_name(self, account):
+        return self.account_shard(account).get_account_name(account)
+
+    def get_transaction_history(self, account, limit=3):
+        return self.account_shard(account).get_transaction_history(account, limit)
+
+    def get_transaction_page(self, account, limit=20, cursor=None, order="newest_first"):
+        return self.account_shard(account).get_transaction_page(account, limit, cursor, order)
+
+    def iter_transactions(self, account, page_size=1000, order="oldest_first"):
+        return self.account_shard(account).iter_transactions(account, page_size, order)
+
+    def log_transaction(self, account, transaction_type, amount, atm_id=None):
+        return self.account_shard(account).log_transaction(account, transaction_type, amount, atm_id)
+
+    def deposit(self, account, amount, atm_id):
+        """Deposits an amount into an account and updates the ATM cash level."""
+        account_shard = self.account_shard(account)
+        atm_shard = self.atm_shard(atm_id)
+        if account_shard is atm_shard:
+            return account_shard.deposit(account, amount, atm_id)
+        return self._cross_shard(account, amount, atm_id, "Deposit", account_shard, atm_shard)
+
+    def withdraw(self, account, amount, atm_id):
+        """Withdraws an amount from an account, considering ATM cash levels and withdrawal limits."""
+        if self.limits is None:
+            return self._withdraw(account, amount, atm_id)
+        account_id = self.account_shard(account).resolve_account(account)
+        if amount <= 0:
+            raise ValueError("Withdrawal amount must be greater than zero.")
+        # The router's stripes are held until record(), so no other withdrawal on this
+        # card or ATM can pass its check in between, whichever shards it touches
+        with hold_in_order((self.account_locks, [account_id]), (self.atm_locks, [atm_id])):
+            self.limits.check(account_id, atm_id, amount)
+            self._withdraw(account, amount, atm_id)
+            self.limits.record(account_id, atm_id, amount)
+
+    def _withdraw(self, account, amount, atm_id):
+        account_shard = self.account_shard(account)
+        atm_shard = self.atm_shard(atm_id)
+        if account_shard is atm_shard:
+            return account_shard.withdraw(account, amount, atm_id)
+        return self._cross_shard(account, amount, atm_id, "Withdrawal", account_shard, atm_shard)
+
+    def replenish_atm(self, atm_id, cash_level):
+        return self.atm_shard(atm_id).replenish_atm(atm_id, cash_level)
+
+    def apply_batch(self, operations, chunk_size=1000):
+        """Applies (operation, account, amount, atm_id) records; see AccountManager.apply_batch.
+
+        Records whose account and ATM share a shard are handed to that shard's
+        apply_batch, chunk_size at a time. Cross-shard records go through the transfer
+        protocol one by one, after every record before them has been applied, so each
+        account still sees its records in input order.
+        """
+        operations = list(operations)
+        results = [None] * len(operations)
+        groups = {}  # Shard index -> [(input index, record)] waiting to be applied
+
+        def apply_groups():
+            for shard_index, records in groups.items():
+                shard_results = self.shards[shard_index].apply_batch([record for _, record in records], chunk_size)
+                for (index, record), result in zip(records, shard_results):
+                    self._batch_applied(results, index, record, result)
+            groups.clear()
+
+        for index, record in enumerate(operations):
+            operation, account, amount, atm_id = record
+            kind = BATCH_OPERATIONS.get(str(operation).lower())
+            account_shard = self.account_shard(account)
+            if kind is None or atm_id is None or account_shard is self.atm_shard(atm_id):
+                # Unknown operations are reported by the shard, in the shard's words
+                groups.setdefault(self.shards.index(account_shard), []).append((index, record))
+                continue
+
+            apply_groups()
+            try:
+                balance = self._cross_shard(account, amount, atm_id, kind, account_shard, self.atm_shard(atm_id))
+                result = (True, balance)
+            except (ValueError, sqlite3.Error) as e:
+                result = (False, str(e))
+            self._batch_applied(results, index, record, result)
+        apply_groups()
+        return results
+
+    def _batch_applied(self, results, index, record, result):
+        """Stores a batch record's result; batches are not held to the limits, but their withdrawals count."""
+        results[index] = result
+        operation, account, amount, atm_id = record
+        if result[0] and self.limits is not None and BATCH_OPERATIONS[str(operation).lower()] == "Withdrawal":
+            self.limits.record(self.account_shard(account).resolve_account(account), atm_id, amount)
+
+    def _cross_shard(self, account, amount, atm_id, kind, account_shard, atm_shard):
+        """Applies a withdrawal or deposit whose account and ATM are on different shards; returns the new balance."""
+        account_id = account_shard.resolve_account(account)
+        if amount <= 0:
+            raise ValueError(f"{kind} amount must be greater than zero.")
+        transfer_id = uuid.uuid4().hex
+
+        # 1. ATM shard: reserve the cash (withdrawal) or check the ATM exists (deposit),
+        #    and record the transfer as pending in the same transaction
+        with atm_shard.write_locks(atm_ids=[atm_id]), atm_shard.transaction() as cursor:
+            if kind == "Withdrawal":
+                atm_shard._dispense_cash(cursor, atm_id, amount)
+            else:
+                cursor.execute("SELECT 1 FROM atms WHERE atm_id = ?", (atm_id,))
+                if cursor.fetchone() is None:
+                    raise ValueError("ATM not found.")
+            cursor.execute(
+                "INSERT INTO cross_shard_transfers (transfer_id, kind, account_id, atm_id, amount) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (transfer_id, kind, account_id, atm_id, amount)
+            )
+
+        # 2. Account shard: change the balance, log it and mark the transfer applied atomically
+        try:
+            with account_shard.write_locks(account_ids=[account_id]):
+                with account_shard.balance_transaction([account_id]) as cursor:
+                    if kind == "Withdrawal":
+                        balance = account_shard._debit_account(cursor, account_id, amount)
+                    else:
+                        balance = account_shard._credit_account(cursor, account_id, amount)
+                    account_shard._insert_ledger(cursor, account_id, atm_id, kind, amount)
+                    cursor.execute("INSERT INTO applied_transfers (transfer_id) VALUES (?)", (transfer_id,))
+                account_shard._balance_committed(account, account_id, balance)
+        except ValueError:
+            self._settle(atm_shard, transfer_id, kind, atm_id, amount, applied=False)
+            raise
+        except sqlite3.Error:
+            # The commit may or may not have happened; the applied marker says which
+            try:
+                applied = self._applied(account_shard, transfer_id)
+                self._settle(atm_shard, transfer_id, kind, atm_id, amount, applied)
+            except sqlite3.Error:
+                pass  # Still pending; recover() settles it once the shards answer again
+            raise
+
+        # 3. ATM shard: settle the transfer
+        self._settle(atm_shard, transfer_id, kind, atm_id, amount, applied=True)
+        return balance
+
+    def _settle(self, atm_shard, transfer_id, kind, atm_id, amount, applied):
+        """Completes a pending transfer on the ATM's shard, or undoes its cash reservation."""
+        with atm_shard.write_locks(atm_ids=[atm_id]), atm_shard.transaction() as cursor:
+            cursor.execute(
+                "UPDATE cross_shard_transfers SET state = ? WHERE transfer_id = ? AND state = 'pending'",
+                ("committed" if applied else "aborted", transfer_id)
+            )
+            if cursor.rowcount == 0:
+                return  # Already settled
+            if applied and kind == "Deposit":
+                atm_shard._accept_cash(cursor, atm_id, amount)
+            elif not applied and kind == "Withdrawal":
+                atm_shard._accept_cash(cursor, atm_id, amount)  # Put the reserved cash back
+
+    def _applied(self, account_shard, transfer_id):
+        """Returns whether the account's shard committed its side of a transfer."""
+        return account_shard.execute_query(
+            "SELECT 1 FROM applied_transfers WHERE transfer_id = ?", (transfer_id,), fetch_one=True
+        ) is not None
+
+    def recover(self, min_age=60):
+        """Settles transfers left pending by a crash; returns how many were settled.
+
+        Only transfers older than min_age seconds are touched, so transfers another
+        process is still working on are left alone. Use min_age=0 only when no other
+        process is using the shards. It runs when the router starts; a long-running
+        process can also call it now and then to pick up transfers whose shards were
+        unreachable when they failed.
+        """
+        settled = 0
+        for atm_shard in self.shards:
+            pending = atm_shard.execute_query(
+                "SELECT transfer_id, kind, account_id, atm_id, amount FROM cross_shard_transfers "
+                "WHERE state = 'pending' AND created_at <= datetime('now', ?)",
+                (f"-{int(min_age)} seconds",),
+                fetch_all=True
+            )
+            for transfer_id, kind, account_id, atm_id, amount in pending:
+                applied = self._applied(self.account_shard(account_id), transfer_id)
+                self._settle(atm_shard, transfer_id, kind, atm_id, amount, applied)
+                settled += 1
+        return settled
+
+    def fetch_limited_active_atms(self, limit):
+        return fetch_limited_active_atms(limit, shard_map=self.shard_paths)
+
+    def cache_stats(self):
+        return [shard.cache_stats() for shard in self.shards]
+
+    def stats(self):
+        return [shard.stats() for shard in self.shards]
+
+    def flush(self, timeout=None):
+        return all(shard.flush(timeout) for shard in self.shards)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create sharded ATM simulator databases.")
+    parser.add_argument("shards", nargs="+", help="one database file per shard")
+    parser.add_argument("--accounts", type=int, default=100, help="number of accounts across all shards")
+    parser.add_argument("--atms", type=int, default=100, help="number of ATMs across all shards")
+    parser.add_argument("--transactions", type=int, default=100, help="ledger rows per shard")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a repeatable dataset")
+    parser.add_argument("--end", type=parse_utc, default=None,
+                        help="end of the ledger history, 'YYYY-MM-DD[ HH:MM:SS]' UTC (default: now)")
+    parser.add_argument("--shard-map", default=None, help="also write a shard map JSON file here")
+    args = parser.parse_args(argv)
+
+    create_shards(args.shards, args.accounts, args.atms, args.transactions, args.seed, args.end)
+    if args.shard_map:
+        with open(args.shard_map, "w", encoding="utf-8") as handle:
+            json.dump({"shards": args.shards}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
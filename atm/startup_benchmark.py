@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+GUI_MODULES = ("tkinter", "_tkinter", "PIL", "ATMGUI", "main_window", "dashboard")
+# Modules the headless commands import; none of them may pull in the GUI stack
+HEADLESS_MODULES = ("cli", "Create_and_populate_database", "load_generator", "Accountmanager", "trace_replay",
+                    "event_simulation")
+
+
+def time_command(args, runs):
+    """Runs a fresh interpreter `runs` times and returns the wall time of each run in ms."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(args, cwd=os.path.dirname(PACKAGE_DIR), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def gui_modules_loaded():
+    """Imports every headless module in a fresh interpreter and returns any GUI modules it loaded."""
+    code = (
+        "import sys\n"
+        f"sys.path.insert(0, {PACKAGE_DIR!r})\n"
+        f"for name in {HEADLESS_MODULES!r}: __import__(name)\n"
+        f"print(' '.join(sorted(m for m in sys.modules if m.split('.')[0] in {GUI_MODULES!r})))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Guard the cold-start time of python -m atm.")
+    parser.add_argument("--runs", type=int, default=10, help="interpreter starts to time")
+    parser.add_argument("--budget-ms", type=float, default=100.0,
+                        help="fail if the median start-up exceeds a bare interpreter by more than this")
+    args = parser.parse_args(argv)
+
+    loaded = gui_modules_loaded()
+    baseline = statistics.median(time_command([sys.executable, "-c", "pass"], args.runs))
+    cli = time_command([sys.executable, "-m", "atm", "--help"], args.runs)
+    session = time_command([sys.executable, "-m", "atm", "session", "--help"], args.runs)
+    overhead = statistics.median(session) - baseline
+
+    print(f"bare interpreter          median {baseline:7.1f} ms")
+    print(f"python -m atm --help      median {statistics.median(cli):7.1f} ms  min {min(cli):7.1f} ms")
+    print(f"python -m atm session -h  median {statistics.median(session):7.1f} ms  min {min(session):7.1f} ms")
+    print(f"start-up overhead {overhead:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: headless modules imported GUI modules: {', '.join(loaded)}")
+        failed = True
+    if overhead > args.budget_ms:
+        print("FAIL: start-up overhead is over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
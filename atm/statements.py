@@ -0,0 +1,73 @@
+import argparse
+import csv
+import json
+import sys
+
+from Accountmanager import AccountManager
+
+STATEMENT_FIELDS = ["transaction_id", "account_id", "transaction_type", "amount", "timestamp"]
+
+
+def statement_rows(manager, account, page_size=1000):
+    """Yields an account's transactions oldest first as dictionaries."""
+    for row in manager.iter_transactions(account, page_size, order="oldest_first"):
+        yield dict(zip(STATEMENT_FIELDS, row))
+
+
+def write_csv(rows, output):
+    writer = csv.DictWriter(output, fieldnames=STATEMENT_FIELDS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, output):
+    count = 0
+    for row in rows:
+        output.write(json.dumps(row) + "\n")
+        count += 1
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def export_statement(manager, account, output, fmt="csv", page_size=1000):
+    """Streams an account's full history to a path or open text file; returns the row count.
+
+    Rows are read one keyset page at a time and written as they arrive, so memory use
+    does not depend on how many transactions the account has.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown statement format '{fmt}'. Choose from: {', '.join(WRITERS)}")
+
+    rows = statement_rows(manager, account, page_size)
+    if hasattr(output, "write"):
+        return WRITERS[fmt](rows, output)
+    with open(output, "w", newline="", encoding="utf-8") as handle:
+        return WRITERS[fmt](rows, handle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export an account statement.")
+    parser.add_argument("account_id", type=int, help="account (card) number")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv", help="output format")
+    parser.add_argument("--output", default="-", help="output file, or - for stdout")
+    parser.add_argument("--page-size", type=int, default=1000, help="rows fetched per query")
+    args = parser.parse_args(argv)
+
+    manager = AccountManager(args.db)
+    try:
+        output = sys.stdout if args.output == "-" else args.output
+        count = export_statement(manager, args.account_id, output, args.format, args.page_size)
+    finally:
+        manager.close()
+    print(f"Exported {count} transactions.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Storage backends behind the AccountManager interface.
+
+Every backend subclasses AccountStore, which declares the public methods the GUI, the
+load generator and the CLI call and holds the code the backends share: session
+resolution and keyset paging over the hot table plus archived months.
+
+- "sqlite": AccountManager, where every operation is a durable SQLite transaction.
+- "memory": MemoryAccountManager, which keeps state in arrays and snapshots it to the
+  same SQLite file in the background.
+"""
+from abc import ABC, abstractmethod
+
+from session import Session
+from transaction_archive import PARTITIONS_QUERY
+
+BACKENDS = ("sqlite", "memory")
+PAGE_ORDERS = ("newest_first", "oldest_first")
+
+
+def format_transaction(transaction):
+    """Formats a (transaction_id, account_id, type, amount, timestamp) row for display."""
+    return f"Type: {transaction[2]}\n, Amount: ${float(transaction[3]):.2f}\n, Time: {transaction[4]}\n --------\n"
+
+
+class AccountStore(ABC):
+    """Base class of the storage backends.
+
+    Subclasses set self.archives to the ArchiveSet of their database and implement
+    the abstract methods; history paging and session handling are shared.
+    """
+
+    @abstractmethod
+    def authenticate_user(self, account_id, password):
+        """Validates user credentials; returns a Session, or None if they are wrong."""
+
+    @abstractmethod
+    def get_balance(self, account):
+        """Retrieves the current balance of an account."""
+
+    @abstractmethod
+    def get_account_name(self, account):
+        """Retrieves the account holder's name."""
+
+    @abstractmethod
+    def deposit(self, account, amount, atm_id):
+        """Deposits an amount into an account and updates the ATM cash level."""
+
+    @abstractmethod
+    def withdraw(self, account, amount, atm_id):
+        """Withdraws an amount from an account, considering ATM cash levels."""
+
+    @abstractmethod
+    def replenish_atm(self, atm_id, cash_level):
+        """Refills an ATM's cassettes to cash_level; returns the cash added (negative if removed)."""
+
+    @abstractmethod
+    def apply_batch(self, operations, chunk_size=1000):
+        """Applies (operation, account, amount, atm_id) records; returns one result per record."""
+
+    @abstractmethod
+    def log_transaction(self, account, transaction_type, amount, atm_id=None):
+        """Logs a transaction."""
+
+    @abstractmethod
+    def get_transaction_page(self, account, limit=20, cursor=None, order="newest_first"):
+        """Returns one page of transaction rows and the cursor for the next page.
+
+        Rows are (transaction_id, account_id, transaction_type, amount, timestamp). Pass
+        the returned cursor back to fetch the following page; it is None after the last
+        page. Months archived by transaction_archive.py are included.
+        """
+
+    @abstractmethod
+    def stats(self):
+        """Returns the per-method metrics snapshot, or None when metrics are off."""
+
+    @abstractmethod
+    def flush(self, timeout=None):
+        """Waits until every change so far is saved to the database file."""
+
+    @abstractmethod
+    def close(self):
+        """Saves outstanding changes and closes all database connections."""
+
+    def resolve_account(self, account):
+        """Returns the account_id of a Session or a bare card number; expired sessions are refused."""
+        if isinstance(account, Session):
+            if account.is_expired():
+                raise ValueError("Session expired. Please log in again.")
+            account.touch()
+            return account.account_id
+        return account
+
+    def get_transaction_history(self, account, limit=3):
+        """Retrieves the most recent transactions for an account and formats them."""
+        transactions, _ = self.get_transaction_page(account, limit)
+        return [format_transaction(transaction) for transaction in transactions]
+
+    def iter_transactions(self, account, page_size=1000, order="oldest_first"):
+        """Yields every transaction row of an account, one page in memory at a time."""
+        cursor = None
+        while True:
+            rows, cursor = self.get_transaction_page(account, page_size, cursor, order)
+            yield from rows
+            if cursor is None:
+                return
+
+    @staticmethod
+    def _check_order(order):
+        """Returns whether a page order is newest first; unknown orders are refused."""
+        if order not in PAGE_ORDERS:
+            raise ValueError(f"Unknown order '{order}'. Use 'newest_first' or 'oldest_first'.")
+        return order == "newest_first"
+
+    def _read_page(self, connection, query, params, limit, cursor, newest_first, rows=()):
+        """Returns a page of the hot table merged with archived months and any extra rows.
+
+        query runs on connection and, with the same params, on each archive file that
+        can hold rows of the page. The partition list and the hot rows are read in one
+        snapshot, so a row being archived is seen in exactly one place.
+        """
+        started = not connection.in_transaction
+        if started:
+            connection.execute("BEGIN")
+        try:
+            partitions = connection.execute(PARTITIONS_QUERY).fetchall()
+            rows = list(rows) + connection.execute(query, params).fetchall()
+        finally:
+            if started:
+                connection.execute("COMMIT")
+        if partitions:
+            return self.archives.merge_page(partitions, query, params, rows, limit, cursor, newest_first)
+        rows.sort(key=lambda row: (row[4], row[0]), reverse=newest_first)
+        return rows[:limit]
+
+    @staticmethod
+    def _next_cursor(rows, limit):
+        """Returns the cursor after a full page, or None after the last one."""
+        if len(rows) == limit:
+            return rows[-1][4], rows[-1][0]
+        return None
+
+
+def open_account_manager(db_name="atm_simulator.db", backend="sqlite", **options):
+    """Creates the account manager for a backend; options go to its constructor."""
+    if backend == "sqlite":
+        from Accountmanager import AccountManager
+
+        return AccountManager(db_name, **options)
+    if backend == "memory":
+        from memory_account_manager import MemoryAccountManager
+
+        return MemoryAccountManager(db_name, **options)
+    raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
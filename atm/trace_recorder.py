@@ -0,0 +1,198 @@
+import functools
+import gzip
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from session import Session
+
+TRACE_VERSION = 1
+
+# AccountManager methods captured in a trace, in the order their positional arguments are recorded
+RECORDED_METHODS = (
+    "authenticate_user",
+    "get_balance",
+    "get_account_name",
+    "deposit",
+    "withdraw",
+    "replenish_atm",
+    "apply_batch",
+    "log_transaction",
+    "get_transaction_history",
+    "get_transaction_page",
+)
+# Position of the atm_id argument for methods that take one
+ATM_ARGUMENT = {"deposit": 2, "withdraw": 2, "replenish_atm": 0, "log_transaction": 3}
+# Methods that change balances or cash levels; their accounts and ATMs are checked after a replay
+WRITE_METHODS = ("deposit", "withdraw", "replenish_atm", "apply_batch")
+
+
+def open_trace(path, mode):
+    """Opens a trace file as text; a .gz suffix selects the compressed form."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_trace(path):
+    """Returns (header, events, footer) of a trace file; footer is None if recording was cut short."""
+    header, events, footer = None, [], None
+    with open_trace(path, "r") as handle:
+        for line in handle:
+            record = json.loads(line)
+            if "trace" in record:
+                header = record
+            elif "final" in record:
+                footer = record["final"]
+            else:
+                events.append(record)
+    if header is None:
+        raise ValueError(f"{path} is not a workload trace.")
+    return header, events, footer
+
+
+def _plain(value):
+    """Makes an argument JSON-friendly; Sessions are recorded by their account_id."""
+    if isinstance(value, Session):
+        return value.account_id
+    if isinstance(value, (tuple, list)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _written(name, event):
+    """Returns the (account ids, ATM ids) a successful write event may have changed."""
+    if name == "replenish_atm":
+        return [], [event["atm"]]
+    if name == "apply_batch":
+        operations = event["a"][0] if event["a"] else event["k"]["operations"]
+        return [record[1] for record in operations], [record[3] for record in operations]
+    return [event["a"][0]], [event.get("atm")]
+
+
+class TraceRecorder:
+    """Appends one JSONL line per AccountManager call: method, arguments, ATM, time and outcome.
+
+    Lines are {"t": seconds since recording started, "m": method, "a": [args], "atm": atm_id,
+    "o": "ok" | "rejected" | "error", "e": error message}. close() appends the final balances
+    and cash levels of every account and ATM written to, which the replayer checks against.
+    The database should be copied before recording starts (pass snapshot_path to do it here),
+    because a replay must start from the same state. Card PINs passed to authenticate_user
+    are recorded too, so treat trace files like the database itself.
+    """
+
+    def __init__(self, path, db_name=None, snapshot_path=None):
+        self.path = path
+        self.events = 0
+        self._accounts = set()
+        self._atms = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Set while a recorded call runs, so nested calls are skipped
+        self._closed = False
+
+        if snapshot_path:
+            source = sqlite3.connect(db_name)
+            target = sqlite3.connect(snapshot_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+
+        self._handle = open_trace(path, "w")
+        self._write({
+            "trace": TRACE_VERSION,
+            "db": db_name,
+            "snapshot": snapshot_path,
+            "started": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        self._started = time.perf_counter()
+
+    def _write(self, record):
+        self._handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def instrument(self, target, method_names=RECORDED_METHODS):
+        """Replaces the named methods on the target instance with recording wrappers."""
+        for name in method_names:
+            setattr(target, name, self._wrap(name, getattr(target, name)))
+
+    def _wrap(self, name, method):
+        local = self._local
+        atm_position = ATM_ARGUMENT.get(name)
+
+        @functools.wraps(method)
+        def recorded(*args, **kwargs):
+            if getattr(local, "active", False):
+                return method(*args, **kwargs)
+            local.active = True
+            if name == "apply_batch":  # Operations may be a one-shot iterator
+                if args:
+                    args = (list(args[0]),) + args[1:]
+                elif "operations" in kwargs:
+                    kwargs["operations"] = list(kwargs["operations"])
+            started = time.perf_counter() - self._started
+            outcome, error = "ok", None
+            try:
+                return method(*args, **kwargs)
+            except ValueError as e:
+                outcome, error = "rejected", str(e)
+                raise
+            except Exception as e:
+                outcome, error = "error", str(e)
+                raise
+            finally:
+                local.active = False
+                event = {"t": round(started, 6), "m": name, "a": [_plain(arg) for arg in args]}
+                if kwargs:
+                    event["k"] = {key: _plain(value) for key, value in kwargs.items()}
+                if atm_position is not None and len(args) > atm_position:
+                    event["atm"] = args[atm_position]
+                event["o"] = outcome
+                if error is not None:
+                    event["e"] = error
+                self._record(name, event)
+
+        return recorded
+
+    def _record(self, name, event):
+        with self._lock:
+            if self._closed:
+                return
+            self._write(event)
+            self.events += 1
+            if name in WRITE_METHODS and event["o"] == "ok":
+                accounts, atms = _written(name, event)
+                self._accounts.update(accounts)
+                self._atms.update(atms)
+
+    def close(self, manager):
+        """Appends the final balances and cash levels read through manager, then closes the file."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            accounts = sorted(self._accounts)
+            atms = sorted(atm_id for atm_id in self._atms if atm_id is not None)
+            self._write({"final": final_state(manager, accounts, atms)})
+            self._handle.close()
+
+
+def final_state(manager, account_ids, atm_ids, chunk_size=500):
+    """Reads {"accounts": {id: balance}, "atms": {id: cash_level}} for the given ids."""
+    state = {"accounts": {}, "atms": {}}
+    for key, table, id_column, value_column, ids in (
+        ("accounts", "accounts", "account_id", "balance", account_ids),
+        ("atms", "atms", "atm_id", "cash_level", atm_ids),
+    ):
+        for offset in range(0, len(ids), chunk_size):
+            chunk = ids[offset:offset + chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = manager.execute_query(
+                f"SELECT {id_column}, {value_column} FROM {table} WHERE {id_column} IN ({placeholders})",
+                chunk,
+                fetch_all=True
+            )
+            state[key].update({str(row_id): value for row_id, value in rows})
+    return state
@@ -0,0 +1,164 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Accountmanager import AccountManager
+from load_generator import LoadStats
+from trace_recorder import read_trace, final_state
+
+BALANCE_TOLERANCE = 0.005  # Balances and cash levels are REAL; allow for float rounding
+
+
+def _arguments(event):
+    """Rebuilds the call arguments of a trace event."""
+    args = list(event["a"])
+    if event["m"] == "get_transaction_page" and len(args) > 2 and args[2] is not None:
+        args[2] = tuple(args[2])  # Keyset cursors are tuples; JSON stored them as lists
+    return args, event.get("k", {})
+
+
+class ReplayResult:
+    """Latency per method, outcomes that differ from the recording and final-state mismatches."""
+
+    def __init__(self, stats, outcome_mismatches, state_mismatches, verified):
+        self.stats = stats
+        self.outcome_mismatches = outcome_mismatches  # [(line, method, recorded, replayed)]
+        self.state_mismatches = state_mismatches  # [(table, id, recorded, replayed)]
+        self.verified = verified  # False if the trace had no final state to compare with
+
+    @property
+    def ok(self):
+        return self.verified and not self.state_mismatches
+
+    def report(self):
+        lines = [self.stats.report()]
+        lines.append(f"Outcomes differing from the recording: {len(self.outcome_mismatches)}")
+        for line, method, recorded, replayed in self.outcome_mismatches[:10]:
+            lines.append(f"  event {line} {method}: recorded {recorded}, replayed {replayed}")
+        if not self.verified:
+            lines.append("Trace has no final state (recording was not closed); nothing to verify.")
+        elif self.state_mismatches:
+            lines.append(f"Final state mismatches: {len(self.state_mismatches)}")
+            for table, row_id, recorded, replayed in self.state_mismatches[:10]:
+                lines.append(f"  {table} {row_id}: recorded {recorded}, replayed {replayed}")
+        else:
+            lines.append("Final balances and cash levels match the recording.")
+        return "\n".join(lines)
+
+
+def compare_state(recorded, replayed):
+    """Returns (table, id, recorded value, replayed value) for every value that differs."""
+    mismatches = []
+    for table in ("accounts", "atms"):
+        for row_id, value in recorded[table].items():
+            other = replayed[table].get(row_id)
+            if other is None or abs(other - value) > BALANCE_TOLERANCE:
+                mismatches.append((table, row_id, value, other))
+    return mismatches
+
+
+def replay_events(manager, events, speed=1.0, workers=1):
+    """Replays events against manager and returns (LoadStats, outcome mismatches).
+
+    speed=1 keeps the recorded timing, speed=N runs N times faster and speed=0 runs
+    as fast as possible. With one worker, events run one at a time in the order they
+    finished during recording, which reproduces the recorded outcomes exactly; more
+    workers keep the recorded concurrency, at the cost of a nondeterministic order.
+    """
+    stats = LoadStats()
+    mismatches = []
+
+    def run(line, event):
+        args, kwargs = _arguments(event)
+        started = time.perf_counter()
+        try:
+            getattr(manager, event["m"])(*args, **kwargs)
+            outcome = "ok"
+        except ValueError:
+            outcome = "rejected"
+        except Exception:
+            outcome = "error"
+        stats.record(event["m"], time.perf_counter() - started, outcome)
+        if outcome != event["o"]:
+            mismatches.append((line, event["m"], event["o"], outcome))
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for line, event in enumerate(events, 1):
+            if speed:
+                delay = event["t"] / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            if executor is None:
+                run(line, event)
+            else:
+                executor.submit(run, line, event)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+    manager.flush()
+    stats.elapsed = time.perf_counter() - start
+    mismatches.sort()
+    return stats, mismatches
+
+
+def replay_trace(trace_path, db_name, speed=1.0, workers=1, **manager_options):
+    """Replays a trace against db_name, which is modified, and checks the final state."""
+    _, events, recorded = read_trace(trace_path)
+    manager = AccountManager(db_name, pool_size=max(workers, 1), **manager_options)
+    try:
+        stats, outcome_mismatches = replay_events(manager, events, speed, workers)
+        state_mismatches = []
+        if recorded is not None:
+            replayed = final_state(manager, [int(i) for i in recorded["accounts"]],
+                                   [int(i) for i in recorded["atms"]])
+            state_mismatches = compare_state(recorded, replayed)
+    finally:
+        manager.close()
+    return ReplayResult(stats, outcome_mismatches, state_mismatches, recorded is not None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded AccountManager workload trace.")
+    parser.add_argument("trace", help="trace file written by AccountManager(trace_file=...)")
+    parser.add_argument("--db", default=None,
+                        help="database as it was when recording started (default: the trace's snapshot)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed: 1 is real time, 10 is ten times faster, 0 is as fast as possible")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="concurrent replay threads; 1 replays in recorded order")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="batch ledger inserts through the write-behind journal")
+    parser.add_argument("--in-place", action="store_true",
+                        help="replay into --db itself instead of a temporary copy")
+    args = parser.parse_args(argv)
+
+    header, _, _ = read_trace(args.trace)
+    source = args.db or header.get("snapshot")
+    if not source:
+        parser.error("the trace has no snapshot; pass --db with a copy of the starting database")
+
+    if args.in_place:
+        target = source
+    else:
+        handle, target = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        shutil.copyfile(source, target)
+    try:
+        result = replay_trace(args.trace, target, args.speed, args.workers, write_behind=args.write_behind)
+    finally:
+        if not args.in_place:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(target + suffix):
+                    os.remove(target + suffix)
+    print(result.report())
+    sys.exit(0 if result.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
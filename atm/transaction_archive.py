@@ -0,0 +1,221 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from connection_pool import ConnectionPool
+from Create_and_populate_database import INCREMENTAL_VACUUM, SECONDARY_INDEXES, migrate_database
+
+# An archive file holds one month of the ledger with the same columns and history index
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INTEGER PRIMARY KEY,
+        account_id INTEGER NOT NULL,
+        transaction_type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        timestamp DATETIME,
+        atm_id INTEGER
+    )
+    """,
+] + [statement for table, statement in SECONDARY_INDEXES if table == "transactions"]
+
+PARTITIONS_QUERY = "SELECT period, path, min_timestamp, max_timestamp FROM transaction_partitions"
+
+
+def archive_path(db_name, period):
+    """Returns the archive file name for a 'YYYY-MM' period, stored next to the database."""
+    stem, _ = os.path.splitext(os.path.basename(db_name))
+    return f"{stem}.archive-{period}.db"
+
+
+def resolve_archive(db_name, path):
+    """Archive paths are recorded relative to the hot database's directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), path)
+
+
+class ArchiveSet:
+    """Lazily opened connection pools to the archive files of one database."""
+
+    def __init__(self, db_name, pool_size=5):
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, path):
+        with self._lock:
+            pool = self._pools.get(path)
+            if pool is None:
+                pool = self._pools[path] = ConnectionPool(resolve_archive(self.db_name, path), self.pool_size)
+            return pool
+
+    def merge_page(self, partitions, query, params, rows, limit, cursor, newest_first):
+        """Adds matching archive rows to a page read from the hot table and returns the page.
+
+        Archives are visited in the page's direction through time and the walk stops once
+        `limit` rows are known to come before anything older (or newer) archives hold. Rows
+        that an archive run has copied but not yet deleted from the hot table appear once.
+        """
+        cursor_timestamp = cursor[0] if cursor is not None else None
+        for period, path, min_timestamp, max_timestamp in sorted(partitions, reverse=newest_first):
+            if cursor_timestamp is not None:
+                if newest_first and min_timestamp > cursor_timestamp:
+                    continue  # Everything in it is newer than the cursor
+                if not newest_first and max_timestamp < cursor_timestamp:
+                    continue
+            if len(rows) >= limit:
+                rows.sort(key=lambda row: (row[4], row[0]), reverse=newest_first)
+                boundary = rows[limit - 1][4]
+                if boundary > max_timestamp if newest_first else boundary < min_timestamp:
+                    break
+            with self._pool(path).connection() as connection:
+                rows += connection.execute(query, params).fetchall()
+
+        rows = list({row[0]: row for row in rows}.values())
+        rows.sort(key=lambda row: (row[4], row[0]), reverse=newest_first)
+        return rows[:limit]
+
+    def fetch_all(self, path, query, params=()):
+        """Runs a read query on one archive file and returns its rows."""
+        with self._pool(path).connection() as connection:
+            return connection.execute(query, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+def open_archive(db_name, period):
+    """Opens (creating if needed) the archive file of a period."""
+    connection = sqlite3.connect(resolve_archive(db_name, archive_path(db_name, period)), isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    for statement in ARCHIVE_SCHEMA:
+        connection.execute(statement)
+    return connection
+
+
+def archive_transactions(db_name, before, batch_size=1000, pause=0.01, vacuum_pages=1000):
+    """Moves ledger rows older than the 'YYYY-MM' month `before` into monthly archive files.
+
+    Runs online: rows are copied and deleted in batches of batch_size, each batch in its
+    own short write transaction, with a pause between batches so ATM writes queued
+    behind it get in. Each batch is first committed to its archive, then registered in
+    transaction_partitions and deleted from the hot table in one transaction, so readers
+    see every row exactly once. A run that is interrupted can simply be started again.
+
+    After each batch up to vacuum_pages free pages are released with PRAGMA
+    incremental_vacuum, also as a short write of its own, so the file shrinks as rows
+    leave it. That needs auto_vacuum=INCREMENTAL, which Create_and_populate_database.py
+    sets; in older files the freed pages are only reused by new rows. Returns
+    {period: rows moved}.
+    """
+    cutoff = f"{before}-01 00:00:00"
+    hot = sqlite3.connect(db_name, timeout=30.0, isolation_level=None)
+    hot.execute("PRAGMA journal_mode=WAL")
+    migrate_database(hot)
+    compact = vacuum_pages > 0 and hot.execute("PRAGMA auto_vacuum").fetchone()[0] == INCREMENTAL_VACUUM
+
+    archives = {}
+    moved = {}
+    last_id = 0
+    try:
+        while True:
+            rows = hot.execute(
+                "SELECT transaction_id, account_id, transaction_type, amount, timestamp, atm_id "
+                "FROM transactions WHERE transaction_id > ? AND timestamp < ? ORDER BY transaction_id LIMIT ?",
+                (last_id, cutoff, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            by_period = {}
+            for row in rows:
+                by_period.setdefault(row[4][:7], []).append(row)
+
+            # 1. Copy into the archives; INSERT OR IGNORE makes a rerun after a crash harmless
+            for period, period_rows in by_period.items():
+                archive = archives.get(period)
+                if archive is None:
+                    archive = archives[period] = open_archive(db_name, period)
+                archive.execute("BEGIN IMMEDIATE")
+                archive.executemany(
+                    "INSERT OR IGNORE INTO transactions "
+                    "(transaction_id, account_id, transaction_type, amount, timestamp, atm_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    period_rows
+                )
+                archive.execute("COMMIT")
+
+            # 2. Register the periods and drop the rows from the hot table atomically
+            hot.execute("BEGIN IMMEDIATE")
+            try:
+                for period, period_rows in by_period.items():
+                    hot.execute(
+                        """
+                        INSERT INTO transaction_partitions (period, path, row_count, min_timestamp, max_timestamp)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (period) DO UPDATE SET
+                            row_count = row_count + excluded.row_count,
+                            min_timestamp = MIN(min_timestamp, excluded.min_timestamp),
+                            max_timestamp = MAX(max_timestamp, excluded.max_timestamp)
+                        """,
+                        (period, archive_path(db_name, period), len(period_rows),
+                         min(row[4] for row in period_rows), max(row[4] for row in period_rows))
+                    )
+                    moved[period] = moved.get(period, 0) + len(period_rows)
+                hot.executemany("DELETE FROM transactions WHERE transaction_id = ?", [(row[0],) for row in rows])
+            except BaseException:
+                hot.execute("ROLLBACK")
+                raise
+            hot.execute("COMMIT")
+
+            if compact:
+                # executescript steps the pragma to completion; execute() frees a single page
+                hot.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+            if pause:
+                time.sleep(pause)
+    finally:
+        for archive in archives.values():
+            archive.close()
+        hot.close()
+    return moved
+
+
+def previous_month(months_back=1, today=None):
+    """Returns 'YYYY-MM' for the month `months_back` before today's."""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months_back
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move closed months of the ledger to archive files.")
+    parser.add_argument("--db", default="atm_simulator.db", help="SQLite database file")
+    parser.add_argument("--before", default=None,
+                        help="archive months before this one, YYYY-MM (default: keep --keep-months)")
+    parser.add_argument("--keep-months", type=int, default=1,
+                        help="months kept in the hot table, counting the current one")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows moved per write transaction")
+    parser.add_argument("--pause", type=float, default=0.01, help="seconds to yield to ATM writes between batches")
+    parser.add_argument("--vacuum-pages", type=int, default=1000,
+                        help="free pages released after each batch; 0 leaves the file size alone")
+    args = parser.parse_args(argv)
+
+    before = args.before or previous_month(args.keep_months - 1)
+    started = time.perf_counter()
+    size = os.path.getsize(args.db)
+    moved = archive_transactions(args.db, before, args.batch_size, args.pause, args.vacuum_pages)
+    for period, count in sorted(moved.items()):
+        print(f"{period}: {count} rows -> {archive_path(args.db, period)}")
+    print(f"Archived {sum(moved.values())} rows older than {before} in {time.perf_counter() - started:.1f}s")
+    print(f"{args.db}: {size / 2**20:.1f} MiB -> {os.path.getsize(args.db) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
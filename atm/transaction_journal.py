@@ -0,0 +1,143 @@
+import queue
+import sqlite3
+import threading
+import time
+
+_STOP = object()  # Queue marker that tells the writer thread to drain and exit
+
+
+class TransactionJournal:
+    """Write-behind queue that group-commits ledger inserts from a single writer thread.
+
+    A batch that fails to commit is retried until it succeeds. On close() it is tried
+    CLOSE_ATTEMPTS more times; if it still fails, the entries are reported lost by
+    close() raising, and flush() calls waiting on them return False.
+    """
+
+    CLOSE_ATTEMPTS = 3
+
+    INSERT_QUERY = """
+        INSERT INTO transactions (account_id, transaction_type, amount, atm_id, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+    """
+
+    def __init__(self, db_name, batch_size=500, flush_interval=0.05, clock=None):
+        self.db_name = db_name
+        self.clock = clock or time.time  # Epoch seconds each entry is stamped with
+        self.batch_size = batch_size  # Commit as soon as this many entries are pending
+        self.flush_interval = flush_interval  # Or once the oldest pending entry is this old (seconds)
+        self.batches_committed = 0
+        self.entries_committed = 0
+        self.error = None  # The write error that made close() give up, if any
+        self.entries_lost = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="transaction-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, account_id, transaction_type, amount, atm_id=None):
+        """Queues a ledger entry stamped with the clock's current time (UTC)."""
+        if self._closed:
+            raise RuntimeError("Transaction journal is closed.")
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.clock()))
+        self._queue.put((account_id, transaction_type, amount, atm_id, timestamp))
+
+    def flush(self, timeout=None):
+        """Blocks until every entry appended before this call is committed.
+
+        Returns False if the timeout ran out or the entries were lost on close.
+        """
+        if self._closed:
+            return self.error is None
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout) and self.error is None
+
+    def close(self):
+        """Commits everything still queued and stops the writer thread.
+
+        Raises RuntimeError if queued entries could not be committed.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(
+                f"{self.entries_lost} journal entries could not be written to {self.db_name}: {self.error}"
+            ) from self.error
+
+    def _write(self, connection, pending):
+        """Commits pending entries in one transaction; returns the error if the write failed."""
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(self.INSERT_QUERY, pending)
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            return e
+        self.batches_committed += 1
+        self.entries_committed += len(pending)
+        return None
+
+    def _run(self):
+        connection = sqlite3.connect(self.db_name, timeout=30.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")  # Each group commit is durable once it returns
+
+        pending = []
+        waiters = []
+        deadline = None
+        stopping = False
+        close_attempts = 0
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                # Once stopping, only drain what is left, such as entries appended while
+                # close() was being called
+                item = self._queue.get(timeout=timeout) if not stopping else self._queue.get_nowait()
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            due = (
+                stopping
+                or waiters
+                or len(pending) >= self.batch_size
+                or (deadline is not None and time.monotonic() >= deadline)
+            )
+            if not due:
+                continue
+
+            if pending:
+                error = self._write(connection, pending)
+                if error is not None:
+                    close_attempts += stopping
+                    if close_attempts < self.CLOSE_ATTEMPTS:
+                        print(f"Error writing {len(pending)} journal entries, will retry: {error}")
+                        deadline = time.monotonic() + self.flush_interval  # Retry after a pause
+                        time.sleep(self.flush_interval)
+                        continue
+                    # Closing and still failing: give up and let close() report it
+                    self.error = error
+                    self.entries_lost = len(pending)
+
+            pending = []
+            deadline = None
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+            if stopping and self._queue.empty():
+                break
+
+        connection.close()
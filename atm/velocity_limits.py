@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import deque
+
+SCOPES = ("card", "atm")
+SCOPE_NAMES = {"card": "card", "atm": "ATM"}
+
+
+def format_window(seconds):
+    """Returns 'day', 'hour', '15 minutes' and so on for a window length in seconds."""
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size and seconds % size == 0:
+            count = seconds // size
+            return unit if count == 1 else f"{count:g} {unit}s"
+    return f"{seconds:g} seconds"
+
+
+class LimitRule:
+    """A cap on the withdrawals of each card (or ATM) in a sliding time window."""
+
+    __slots__ = ("scope", "window", "max_amount", "max_count", "buckets")
+
+    def __init__(self, scope, window, max_amount=None, max_count=None, buckets=60):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown limit scope '{scope}'. Choose from: {', '.join(SCOPES)}")
+        if window <= 0 or buckets <= 0:
+            raise ValueError("A limit needs a positive window and bucket count.")
+        if max_amount is None and max_count is None:
+            raise ValueError("A limit needs max_amount, max_count or both.")
+        self.scope = scope
+        self.window = window
+        self.max_amount = max_amount
+        self.max_count = max_count
+        self.buckets = buckets  # The window slides in steps of window / buckets
+
+    def period(self):
+        """Returns e.g. 'per card every day' for error messages."""
+        return f"per {SCOPE_NAMES[self.scope]} every {format_window(self.window)}"
+
+    def __repr__(self):
+        return (f"LimitRule({self.scope!r}, {self.window!r}, max_amount={self.max_amount!r}, "
+                f"max_count={self.max_count!r})")
+
+
+class SlidingWindow:
+    """Running totals of amounts and counts per key over the last `window` seconds.
+
+    Each key keeps a queue of [bucket, amount, count] for its non-empty buckets plus the
+    sums over that queue, so adding and reading are O(1) amortised: a bucket is dropped
+    from the front once it slides out. Totals cover the current bucket plus the
+    `buckets` full buckets before it, so an event counts for at least `window` seconds
+    and at most one bucket width longer; limits err on the strict side.
+    """
+
+    def __init__(self, window, buckets):
+        self.width = window / buckets
+        self.buckets = buckets
+        self._entries = {}  # key -> [queue, amount, count]
+
+    def _entry(self, key, bucket):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        queue = entry[0]
+        oldest = bucket - self.buckets
+        while queue and queue[0][0] < oldest:
+            _, amount, count = queue.popleft()
+            entry[1] -= amount
+            entry[2] -= count
+        if not queue:
+            del self._entries[key]  # Idle keys take no memory
+            return None
+        return entry
+
+    def totals(self, key, now):
+        """Returns (amount, count) of the key within the window ending at now."""
+        entry = self._entry(key, int(now // self.width))
+        if entry is None:
+            return 0.0, 0
+        return entry[1], entry[2]
+
+    def add(self, key, amount, now, count=1):
+        """Counts an event at time now; events must arrive in (roughly) time order."""
+        bucket = int(now // self.width)
+        entry = self._entry(key, bucket)
+        if entry is None:
+            entry = self._entries[key] = [deque(), 0.0, 0]
+        queue = entry[0]
+        if queue and queue[-1][0] >= bucket:
+            # Same bucket, or a clock that stepped back: charge the newest bucket
+            queue[-1][1] += amount
+            queue[-1][2] += count
+        else:
+            queue.append([bucket, amount, count])
+        entry[1] += amount
+        entry[2] += count
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class VelocityLimits:
+    """Per-card and per-ATM withdrawal limits checked against in-memory sliding windows.
+
+    check() and record() are O(1) per rule and never touch the database. The windows
+    start from the withdrawals already in the ledger (warm) and then follow committed
+    withdrawals (record), so they stay in step with the transactions table.
+    """
+
+    def __init__(self, rules, clock=time.time):
+        self.rules = list(rules)
+        self.windows = [SlidingWindow(rule.window, rule.buckets) for rule in self.rules]
+        self.clock = clock  # Seconds since the epoch, the same clock as ledger timestamps
+        self.lock = threading.Lock()
+
+    @property
+    def horizon(self):
+        """The longest window; ledger rows older than this cannot affect any limit."""
+        return max((rule.window for rule in self.rules), default=0)
+
+    def check(self, account_id, atm_id, amount, now=None):
+        """Raises ValueError if withdrawing amount would break any limit."""
+        now = self.clock() if now is None else now
+        with self.lock:
+            for rule, window in zip(self.rules, self.windows):
+                key = account_id if rule.scope == "card" else atm_id
+                if key is None:
+                    continue
+                total, count = window.totals(key, now)
+                if rule.max_count is not None and count + 1 > rule.max_count:
+                    raise ValueError(
+                        f"Withdrawal limit reached: at most {rule.max_count} withdrawals {rule.period()}."
+                    )
+                if rule.max_amount is not None and total + amount > rule.max_amount:
+                    raise ValueError(
+                        f"Withdrawal limit reached: at most {rule.max_amount:.2f} {rule.period()}. "
+                        f"Available: {max(rule.max_amount - total, 0):.2f}."
+                    )
+
+    def record(self, account_id, atm_id, amount, now=None):
+        """Counts a committed withdrawal against every rule."""
+        now = self.clock() if now is None else now
+        with self.lock:
+            for rule, window in zip(self.rules, self.windows):
+                key = account_id if rule.scope == "card" else atm_id
+                if key is not None:
+                    window.add(key, amount, now)
+
+    def warm(self, rows):
+        """Counts (account_id, atm_id, amount, epoch seconds) ledger rows, oldest first."""
+        for account_id, atm_id, amount, timestamp in rows:
+            self.record(account_id, atm_id, amount, timestamp)
+
+    def stats(self):
+        """Returns the number of cards or ATMs each rule is currently tracking."""
+        with self.lock:
+            return [(rule, len(window)) for rule, window in zip(self.rules, self.windows)]
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules import each other by bare name, as when run from inside atm/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "atm"))
+
+from Create_and_populate_database import Database
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A database of 20 accounts and 10 ATMs with a year of seeded history."""
+    path = str(tmp_path / "bank.db")
+    Database(path).create_and_populate_database(num_accounts=20, num_atms=10, num_transactions=2000, seed=1)
+    return path
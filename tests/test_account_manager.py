@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+
+import pytest
+
+from storage import BACKENDS, open_account_manager
+
+
+def set_levels(path, account_id, balance, atm_id, cash_level):
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("UPDATE accounts SET balance = ? WHERE account_id = ?", (balance, account_id))
+        connection.execute("UPDATE atms SET cash_level = ? WHERE atm_id = ?", (cash_level, atm_id))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_concurrent_withdrawals_never_overdraw(db_path, backend):
+    set_levels(db_path, 1, 1000.0, 2, 1_000_000.0)
+    manager = open_account_manager(db_path, backend)
+    threads, amount = 32, 70
+    barrier = threading.Barrier(threads)
+    outcomes = []
+
+    def withdraw():
+        barrier.wait()  # Start every withdrawal at once
+        try:
+            manager.withdraw(1, amount, 2)
+            outcomes.append(True)
+        except ValueError:
+            outcomes.append(False)
+
+    try:
+        workers = [threading.Thread(target=withdraw) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert outcomes.count(True) == 1000 // amount
+        assert manager.get_balance(1) == pytest.approx(1000 - 1000 // amount * amount)
+        assert manager.get_balance(1) >= 0
+    finally:
+        manager.close()
+
+
+def test_failed_commit_drops_the_cached_balance(db_path, monkeypatch):
+    manager = open_account_manager(db_path)
+    try:
+        balance = manager.get_balance(1)  # Now cached
+
+        def failing_insert(*args):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(manager, "_insert_ledger", failing_insert)
+        with pytest.raises(sqlite3.OperationalError):
+            manager.withdraw(1, 10, 2)
+        assert ("balance", 1) not in manager.cache._entries
+        assert manager.get_balance(1) == pytest.approx(balance)
+    finally:
+        manager.close()
@@ -0,0 +1,69 @@
+import sqlite3
+import time
+
+import pytest
+
+from analytics import DAY, atm_demand, forecast_cash_out, location_demand, summarize_ledger, withdrawal_percentiles
+from Create_and_populate_database import parse_utc
+
+
+def test_short_read_averages_over_the_days_read(db_path):
+    midnight = int(time.time()) // DAY * DAY
+    short = summarize_ledger([db_path], days=3, as_of=midnight, lookback_days=28, use_numpy=False)
+    assert short.lookback_days == 2  # Clamped to the start of the read
+
+    full = summarize_ledger([db_path], days=90, as_of=midnight, lookback_days=2, use_numpy=False)
+    rates = {row["atm_id"]: row["net_outflow_per_day"] for row in forecast_cash_out(full)}
+    for row in forecast_cash_out(short):
+        assert row["net_outflow_per_day"] == pytest.approx(rates[row["atm_id"]])
+    assert any(rates.values())
+
+
+def test_reads_an_old_file_without_changing_it(tmp_path):
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE atms (atm_id INTEGER PRIMARY KEY, location TEXT, cash_level REAL);
+        CREATE TABLE transactions (transaction_id INTEGER PRIMARY KEY, account_id INTEGER,
+                                   transaction_type TEXT, amount REAL, timestamp DATETIME);
+        INSERT INTO atms VALUES (1, 'Downtown1', 5000);
+        INSERT INTO transactions VALUES (1, 1, 'Withdrawal', 20, '2024-01-01 10:00:00');
+    """)
+    connection.close()
+    with open(path, "rb") as handle:
+        before = handle.read()
+
+    summary = summarize_ledger([path], days=30, as_of=parse_utc("2024-01-15"), use_numpy=False)
+    assert [row["withdrawals"] for row in atm_demand(summary)] == [0]
+    with open(path, "rb") as handle:
+        assert handle.read() == before  # No migration: the file is opened read-only
+
+
+def assert_close(actual, expected):
+    """Compares nested report rows, floats up to rounding."""
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_close(actual[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            assert_close(a, e)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected)
+    else:
+        assert actual == expected
+
+
+def test_numpy_and_pure_python_agree_up_to_rounding(db_path):
+    pytest.importorskip("numpy")
+    midnight = int(time.time()) // DAY * DAY
+    vectorised, plain = (
+        summarize_ledger([db_path], days=365, as_of=midnight, chunk_size=500, use_numpy=use_numpy)
+        for use_numpy in (True, False)
+    )
+    assert_close(atm_demand(vectorised), atm_demand(plain))
+    assert_close(location_demand(vectorised), location_demand(plain))
+    assert_close(withdrawal_percentiles(vectorised), withdrawal_percentiles(plain))
+    by_atm = sorted(forecast_cash_out(plain), key=lambda row: row["atm_id"])
+    assert_close(sorted(forecast_cash_out(vectorised), key=lambda row: row["atm_id"]), by_atm)
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_account_manager import AsyncAccountManager
+
+
+class SlowManager:
+    """Stands in for AccountManager; get_balance blocks until release is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = []
+
+    def get_balance(self, account_id):
+        self.started.append(account_id)
+        self.release.wait(5)
+        return 100.0
+
+
+def test_timed_out_call_keeps_its_slot_until_the_thread_finishes():
+    async def scenario():
+        manager = SlowManager()
+        atm = AsyncAccountManager(manager, max_workers=2, max_pending=1)
+        with pytest.raises(TimeoutError):
+            await atm.get_balance(1, timeout=0.05)
+
+        # The first call is still running, so the second must wait for its slot
+        second = asyncio.create_task(atm.get_balance(2))
+        await asyncio.sleep(0.05)
+        assert manager.started == [1]
+
+        manager.release.set()
+        assert await second == 100.0
+        assert manager.started == [1, 2]
+        await atm.close()
+
+    asyncio.run(scenario())
+
+
+def test_call_cancelled_while_queued_never_runs():
+    async def scenario():
+        manager = SlowManager()
+        atm = AsyncAccountManager(manager, max_workers=1, max_pending=2)
+        first = asyncio.create_task(atm.get_balance(1))
+        await asyncio.sleep(0.05)
+        with pytest.raises(TimeoutError):
+            await atm.get_balance(2, timeout=0.05)  # Queued behind the first call
+
+        manager.release.set()
+        assert await first == 100.0
+        assert await atm.get_balance(3) == 100.0  # Both slots were given back
+        assert manager.started == [1, 3]
+        await atm.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import cache
+from cache import MISSING, LRUCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache(maxsize=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1  # "b" is now the least recently used
+    lru.put("c", 3)
+
+    assert lru.get("b") is MISSING
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert lru.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = SimpleNamespace(monotonic=lambda: 100.0)
+    monkeypatch.setattr(cache, "time", clock)
+    lru = LRUCache(maxsize=4, ttl=30.0)
+    lru.put("a", 1)
+
+    clock.monotonic = lambda: 129.9
+    assert lru.get("a") == 1
+    clock.monotonic = lambda: 130.0
+    assert lru.get("a") is MISSING
+    assert lru.stats()["size"] == 0
+
+
+def test_fill_after_an_invalidate_is_dropped():
+    lru = LRUCache()
+    epoch = lru.epoch("a")  # A reader starts loading "a"
+    lru.invalidate("a")     # A writer changes it meanwhile
+    lru.fill("a", "stale", epoch)
+    assert lru.get("a") is MISSING
+
+    lru.fill("a", "fresh", lru.epoch("a"))
+    assert lru.get("a") == "fresh"
+
+
+def test_fill_does_not_overwrite_a_newer_put():
+    lru = LRUCache()
+    epoch = lru.epoch("a")
+    lru.put("a", "new")
+    lru.fill("a", "old", epoch)
+    assert lru.get("a") == "new"
@@ -0,0 +1,24 @@
+import sqlite3
+
+from Create_and_populate_database import Database, parse_utc
+
+
+def dump(path):
+    connection = sqlite3.connect(path)
+    try:
+        return [connection.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+                for table in ("accounts", "atms", "transactions", "atm_daily_totals")]
+    finally:
+        connection.close()
+
+
+def test_seed_and_end_give_the_same_dataset(tmp_path):
+    end = parse_utc("2025-06-30 12:00:00")
+    paths = [str(tmp_path / "first.db"), str(tmp_path / "second.db")]
+    for path in paths:
+        Database(path).create_and_populate_database(20, 10, 500, history_days=30, seed=5, end=end)
+
+    first = dump(paths[0])
+    assert first == dump(paths[1])
+    timestamps = [row[4] for row in first[2]]
+    assert "2025-05-31 12:00:00" <= min(timestamps) and max(timestamps) <= "2025-06-30 12:00:00"
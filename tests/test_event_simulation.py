@@ -0,0 +1,47 @@
+import shutil
+import sqlite3
+import time
+
+from Create_and_populate_database import parse_utc
+from event_simulation import ledger_end, run_simulation
+
+
+def ledger(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(
+            "SELECT account_id, atm_id, transaction_type, amount, timestamp FROM transactions ORDER BY transaction_id"
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+def test_same_seed_gives_the_same_ledger_without_a_start(db_path, tmp_path):
+    copy = str(tmp_path / "copy.db")
+    shutil.copy(db_path, copy)
+    start = ledger_end(db_path)
+
+    for path in (db_path, copy):
+        run_simulation(path, days=0.5, atm_count=5, customers=20, seed=3)
+
+    rows = ledger(db_path)
+    assert rows == ledger(copy)
+    first_day = time.strftime("%Y-%m-%d", time.gmtime(start))
+    assert any(row[4].startswith(first_day) for row in rows)  # Simulated rows follow the seeded history
+
+
+def test_ledger_end_reads_a_file_without_changing_it(tmp_path):
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE transactions (transaction_id INTEGER PRIMARY KEY, account_id INTEGER,
+                                   transaction_type TEXT, amount REAL, timestamp DATETIME);
+        INSERT INTO transactions VALUES (1, 1, 'Deposit', 20, '2024-01-01 10:00:00');
+    """)
+    connection.close()
+    with open(path, "rb") as handle:
+        before = handle.read()
+
+    assert ledger_end(path) == parse_utc("2024-01-02")
+    with open(path, "rb") as handle:
+        assert handle.read() == before
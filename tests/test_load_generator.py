@@ -0,0 +1,15 @@
+import asyncio
+
+from load_generator import run_async_load
+
+
+def test_async_run_reports_metrics(db_path):
+    stats = asyncio.run(run_async_load(atm_count=3, operations_per_atm=10, db_name=db_path, workers=2,
+                                       seed=1, metrics=True))
+    assert stats.total_operations() == 30
+    assert sum(entry.get("count", 0) for entry in stats.metrics.values()) >= 30
+
+
+def test_async_run_without_metrics_has_none(db_path):
+    stats = asyncio.run(run_async_load(atm_count=2, operations_per_atm=5, db_name=db_path, seed=1))
+    assert stats.metrics is None
@@ -0,0 +1,69 @@
+import random
+import threading
+
+from lock_striping import StripedLock, hold_in_order
+
+
+class RecordingLock:
+    """Wraps a lock and logs (name, "acquire"/"release") to a shared list."""
+
+    def __init__(self, name, log):
+        self.name, self.log, self.lock = name, log, threading.Lock()
+
+    def acquire(self):
+        self.lock.acquire()
+        self.log.append((self.name, "acquire"))
+
+    def release(self):
+        self.log.append((self.name, "release"))
+        self.lock.release()
+
+
+def recording(table_name, stripes, log):
+    table = StripedLock(stripes)
+    table.locks = [RecordingLock(f"{table_name}{i}", log) for i in range(stripes)]
+    return table
+
+
+def test_stripes_are_taken_table_by_table_in_ascending_order():
+    log = []
+    accounts, atms = recording("account", 8, log), recording("atm", 8, log)
+    with hold_in_order((accounts, [5, 3, 13]), (atms, [6, 1])):
+        assert log == [("account3", "acquire"), ("account5", "acquire"),
+                       ("atm1", "acquire"), ("atm6", "acquire")]
+    assert [name for name, event in log[4:]] == ["atm6", "atm1", "account5", "account3"]
+    assert all(not lock.lock.locked() for lock in accounts.locks + atms.locks)
+
+
+def test_locks_are_released_when_the_block_raises():
+    accounts, atms = StripedLock(4), StripedLock(4)
+    try:
+        with hold_in_order((accounts, [1]), (atms, [2])):
+            raise ValueError("Insufficient balance in the account.")
+    except ValueError:
+        pass
+    assert all(not lock.locked() for lock in accounts.locks + atms.locks)
+
+
+def test_crossed_transfers_do_not_deadlock():
+    accounts, atms = StripedLock(4), StripedLock(4)
+    threads, rounds = 8, 1000
+    counts = [0] * threads
+
+    def transfer(slot):
+        rng = random.Random(slot)
+        for _ in range(rounds):
+            # Keys come in any order and overlap between threads; stripes are still
+            # taken accounts first, then ATMs, each in ascending order
+            account_ids = rng.sample(range(16), 3)
+            atm_ids = rng.sample(range(16), 2)
+            with hold_in_order((accounts, account_ids), (atms, atm_ids)):
+                counts[slot] += 1
+
+    workers = [threading.Thread(target=transfer, args=(slot,), daemon=True) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    assert not any(worker.is_alive() for worker in workers), "transfers deadlocked"
+    assert counts == [rounds] * threads
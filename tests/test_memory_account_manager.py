@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+from memory_account_manager import MemoryAccountManager
+
+
+def saved_state(path, account_id):
+    connection = sqlite3.connect(path)
+    try:
+        balance = connection.execute("SELECT balance FROM accounts WHERE account_id = ?", (account_id,)).fetchone()[0]
+        rows = connection.execute(
+            "SELECT transaction_type, amount FROM transactions WHERE account_id = ?", (account_id,)
+        ).fetchall()
+    finally:
+        connection.close()
+    net = sum(amount if kind == "Deposit" else -amount for kind, amount in rows)
+    return balance, net, len(rows)
+
+
+def test_full_ring_waits_for_a_snapshot_instead_of_dropping_entries(db_path):
+    balance, net, count = saved_state(db_path, 1)
+    manager = MemoryAccountManager(db_path, ledger_capacity=4, snapshot_interval=60)
+    try:
+        for _ in range(10):
+            manager.deposit(1, 1, 2)
+        assert manager.storage_stats()["stalls"] > 0
+        assert len(list(manager.iter_transactions(1))) == count + 10
+    finally:
+        manager.close()
+
+    saved_balance, saved_net, saved_count = saved_state(db_path, 1)
+    assert saved_count == count + 10
+    assert saved_balance - balance == pytest.approx(saved_net - net) == pytest.approx(10)
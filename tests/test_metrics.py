@@ -0,0 +1,85 @@
+import pytest
+
+from Accountmanager import AccountManager
+from metrics import INSTRUMENTED_METHODS, Histogram, Metrics
+
+
+class Teller:
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def pay(self, amount):
+        with self.metrics.timing("sqlite"):
+            if amount <= 0:
+                raise ValueError("Amount must be greater than zero.")
+        return self.check()
+
+    def check(self):
+        with self.metrics.timing("commit"):
+            return True
+
+
+def test_instrument_counts_calls_errors_and_charges_phases_to_the_outer_method():
+    metrics = Metrics()
+    teller = Teller(metrics)
+    metrics.instrument(teller, ("pay", "check"))
+
+    teller.pay(10)
+    with pytest.raises(ValueError):
+        teller.pay(-1)
+    with metrics.timing("sqlite"):  # Outside any instrumented method
+        pass
+
+    stats = metrics.stats()
+    assert (stats["pay"]["count"], stats["pay"]["errors"]) == (2, 1)
+    assert (stats["check"]["count"], stats["check"]["errors"]) == (1, 0)
+    # check() ran inside pay(), so its commit phase belongs to pay
+    assert stats["pay"]["phases"]["sqlite"]["count"] == 2
+    assert stats["pay"]["phases"]["commit"]["count"] == 1
+    assert stats["check"]["phases"] == {}
+    assert stats["other"]["phases"]["sqlite"]["count"] == 1
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(seconds)
+
+    assert histogram.counts == [2, 1, 1]  # Bounds are inclusive; the last slot is +Inf
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert histogram.total == pytest.approx(2.65)
+
+
+def test_prometheus_text_has_cumulative_buckets():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.observe_call("withdraw", 0.05)
+    metrics.observe_call("withdraw", 0.5, error=True)
+    metrics.observe_call("withdraw", 2.0)
+
+    lines = metrics.prometheus_text().splitlines()
+    assert 'atm_calls_total{method="withdraw"} 3' in lines
+    assert 'atm_errors_total{method="withdraw"} 1' in lines
+    assert 'atm_call_seconds_bucket{method="withdraw",le="0.1"} 1' in lines
+    assert 'atm_call_seconds_bucket{method="withdraw",le="1.0"} 2' in lines
+    assert 'atm_call_seconds_bucket{method="withdraw",le="+Inf"} 3' in lines
+    assert 'atm_call_seconds_count{method="withdraw"} 3' in lines
+
+
+def test_methods_are_wrapped_only_when_metrics_are_on(db_path):
+    plain = AccountManager(db_path)
+    try:
+        assert not any(name in vars(plain) for name in INSTRUMENTED_METHODS)
+        assert plain.stats() is None
+    finally:
+        plain.close()
+
+    measured = AccountManager(db_path, metrics=True)
+    try:
+        assert all(name in vars(measured) for name in INSTRUMENTED_METHODS)
+        measured.withdraw(1, 10, 2)
+        phases = measured.stats()["withdraw"]["phases"]
+        assert {"connection", "lock_wait", "sqlite", "commit"} <= set(phases)
+    finally:
+        measured.close()
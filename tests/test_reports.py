@@ -0,0 +1,27 @@
+import time
+
+from reports import atm_daily_totals, daily_transaction_counts, fleet_daily_totals
+from shard_router import ShardRouter, create_shards
+
+NOW = 4_000_000_000
+DAY = time.strftime("%Y-%m-%d", time.gmtime(NOW))
+
+
+def test_reports_add_up_every_shard(tmp_path):
+    paths = [str(tmp_path / "bank_0.db"), str(tmp_path / "bank_1.db")]
+    create_shards(paths, num_accounts=20, num_atms=10, num_transactions=50, seed=1)
+    router = ShardRouter(paths, clock=lambda: NOW)
+    try:
+        router.withdraw(1, 100, 5)  # Ledger row on shard 1
+        router.withdraw(2, 50, 5)  # Ledger row on shard 0
+        router.deposit(4, 30, 5)
+
+        totals = atm_daily_totals(router, 5, DAY, DAY)
+        assert len(totals) == 1
+        assert totals[0]["cash_dispensed"] == 150
+        assert totals[0]["withdrawal_count"] == 2
+        assert totals[0]["cash_deposited"] == 30
+        assert fleet_daily_totals(router, DAY) == totals
+        assert daily_transaction_counts(router, DAY) == {"Deposit": (1, 30), "Withdrawal": (2, 150)}
+    finally:
+        router.close()
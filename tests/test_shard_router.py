@@ -0,0 +1,165 @@
+import sqlite3
+
+import pytest
+
+from shard_router import ShardRouter, create_shards
+from velocity_limits import LimitRule
+
+NOW = 4_000_000_000  # Well after the seeded history, so no earlier withdrawal counts
+
+
+@pytest.fixture
+def shard_paths(tmp_path):
+    paths = [str(tmp_path / "bank_0.db"), str(tmp_path / "bank_1.db")]
+    create_shards(paths, num_accounts=20, num_atms=10, num_transactions=50, seed=1)
+    return paths
+
+
+def test_atm_limit_covers_accounts_on_every_shard(shard_paths):
+    router = ShardRouter(shard_paths, velocity_limits=[LimitRule("atm", 3600, max_count=2)], clock=lambda: NOW)
+    try:
+        router.withdraw(1, 10, 5)  # Same shard as the ATM
+        router.withdraw(2, 10, 5)  # Account on the other shard
+        with pytest.raises(ValueError, match="at most 2 withdrawals per ATM"):
+            router.withdraw(3, 10, 5)
+        router.withdraw(3, 10, 7)
+    finally:
+        router.close()
+
+
+def test_card_limit_holds_across_shards_and_restarts(shard_paths):
+    rules = [LimitRule("card", 86400, max_amount=100)]
+    router = ShardRouter(shard_paths, velocity_limits=rules, clock=lambda: NOW)
+    try:
+        router.withdraw(2, 60, 5)  # Cross-shard
+        with pytest.raises(ValueError, match="Available: 40.00"):
+            router.withdraw(2, 60, 4)
+    finally:
+        router.close()
+
+    router = ShardRouter(shard_paths, velocity_limits=rules, clock=lambda: NOW + 60)
+    try:
+        with pytest.raises(ValueError, match="Withdrawal limit reached"):
+            router.withdraw(2, 60, 4)
+    finally:
+        router.close()
+
+
+def transfer_states(router):
+    states = []
+    for shard in router.shards:
+        states += [row[0] for row in shard.execute_query("SELECT state FROM cross_shard_transfers", fetch_all=True)]
+    return states
+
+
+def cash_level(router, atm_id):
+    return router.atm_shard(atm_id).execute_query(
+        "SELECT cash_level FROM atms WHERE atm_id = ?", (atm_id,), fetch_one=True
+    )[0]
+
+
+def test_cross_shard_withdrawal_settles(shard_paths):
+    router = ShardRouter(shard_paths)
+    try:
+        balance, cash = router.get_balance(2), cash_level(router, 5)
+        router.withdraw(2, 100, 5)
+        assert router.get_balance(2) == pytest.approx(balance - 100)
+        assert cash_level(router, 5) == pytest.approx(cash - 100)
+        assert transfer_states(router) == ["committed"]
+    finally:
+        router.close()
+
+
+def test_rejected_cross_shard_withdrawal_returns_the_cash(shard_paths):
+    router = ShardRouter(shard_paths)
+    try:
+        cash = cash_level(router, 5)
+        with pytest.raises(ValueError, match="Insufficient balance"):
+            router.withdraw(2, router.get_balance(2) + 1, 5)
+        assert cash_level(router, 5) == pytest.approx(cash)
+        assert transfer_states(router) == ["aborted"]
+    finally:
+        router.close()
+
+
+def test_database_error_on_the_account_shard_aborts_the_transfer(shard_paths, monkeypatch):
+    router = ShardRouter(shard_paths)
+    try:
+        balance, cash = router.get_balance(2), cash_level(router, 5)
+
+        def failing_insert(*args):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(router.account_shard(2), "_insert_ledger", failing_insert)
+        with pytest.raises(sqlite3.OperationalError):
+            router.withdraw(2, 100, 5)
+        assert router.get_balance(2) == pytest.approx(balance)
+        assert cash_level(router, 5) == pytest.approx(cash)
+        assert transfer_states(router) == ["aborted"]
+    finally:
+        router.close()
+
+
+def test_recover_commits_a_transfer_applied_before_a_crash(shard_paths, monkeypatch):
+    router = ShardRouter(shard_paths)
+    balance, cash = router.get_balance(2), cash_level(router, 5)
+    monkeypatch.setattr(router, "_settle", lambda *args, **kwargs: None)  # Crash before settling
+    router.withdraw(2, 100, 5)
+    assert transfer_states(router) == ["pending"]
+    router.close()
+
+    router = ShardRouter(shard_paths, recover_min_age=0)
+    try:
+        assert transfer_states(router) == ["committed"]
+        assert router.get_balance(2) == pytest.approx(balance - 100)
+        assert cash_level(router, 5) == pytest.approx(cash - 100)
+    finally:
+        router.close()
+
+
+def test_apply_batch_groups_same_shard_records_and_keeps_input_order(shard_paths, monkeypatch):
+    router = ShardRouter(shard_paths)
+    try:
+        balances = {account: router.get_balance(account) for account in (1, 2)}
+        calls = []
+        for shard in router.shards:
+            original = shard.apply_batch
+            monkeypatch.setattr(shard, "apply_batch", lambda records, chunk_size, original=original: (
+                calls.append((len(records), chunk_size)) or original(records, chunk_size)
+            ))
+
+        results = router.apply_batch([
+            ("deposit", 1, 50, 5),   # Same shard
+            ("deposit", 1, 25, 5),   # Same shard
+            ("withdraw", 2, 30, 5),  # Cross-shard
+            ("deposit", 2, 10, 4),   # Same shard, after the cross-shard withdrawal
+            ("refund", 1, 5, 5),
+        ], chunk_size=7)
+
+        assert results[0] == (True, pytest.approx(balances[1] + 50))
+        assert results[1] == (True, pytest.approx(balances[1] + 75))
+        assert results[2] == (True, pytest.approx(balances[2] - 30))
+        assert results[3] == (True, pytest.approx(balances[2] - 20))
+        assert results[4][0] is False and "Unknown operation" in results[4][1]
+        assert calls and all(chunk_size == 7 for _, chunk_size in calls)
+        assert sum(count for count, _ in calls) == 4  # Only the cross-shard record bypassed the shards
+    finally:
+        router.close()
+
+
+def test_apply_batch_reports_a_database_error_on_its_own_record(shard_paths, monkeypatch):
+    router = ShardRouter(shard_paths)
+    try:
+        balance = router.get_balance(1)
+
+        def failing_insert(*args):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(router.account_shard(2), "_insert_ledger", failing_insert)
+        results = router.apply_batch([("withdraw", 2, 30, 5), ("deposit", 1, 50, 5)])
+
+        assert results[0] == (False, "disk I/O error")
+        assert results[1] == (True, pytest.approx(balance + 50))
+        assert transfer_states(router) == ["aborted"]
+    finally:
+        router.close()
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs `python -m atm --help` in-process, then lists the GUI modules it imported
+PROBE = """
+import runpy, sys
+sys.argv = ["atm", "--help"]
+try:
+    runpy.run_module("atm", run_name="__main__", alter_sys=True)
+except SystemExit:
+    pass
+print(sorted(name for name in sys.modules if name.split(".")[0] in ("tkinter", "_tkinter", "PIL")))
+"""
+
+
+def test_cli_help_does_not_import_the_gui():
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, timeout=60, check=True
+    )
+    assert "usage:" in completed.stdout
+    assert completed.stdout.strip().splitlines()[-1] == "[]"
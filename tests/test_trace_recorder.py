@@ -0,0 +1,23 @@
+from Accountmanager import AccountManager
+from trace_recorder import read_trace
+from trace_replay import replay_trace
+
+
+def test_batch_and_replenish_calls_replay_to_the_same_state(db_path, tmp_path):
+    trace_path = str(tmp_path / "run.jsonl")
+    snapshot_path = str(tmp_path / "snapshot.db")
+    manager = AccountManager(db_path, trace_file=trace_path, trace_snapshot=snapshot_path)
+    try:
+        manager.withdraw(1, 40, 2)
+        manager.apply_batch(op for op in [("deposit", 3, 120, 4), ("withdraw", 5, 30, None)])
+        manager.replenish_atm(6, 15000)
+    finally:
+        manager.close()
+
+    _, events, final = read_trace(trace_path)
+    assert [event["m"] for event in events] == ["withdraw", "apply_batch", "replenish_atm"]
+    assert set(final["accounts"]) == {"1", "3", "5"}
+    assert set(final["atms"]) == {"2", "4", "6"}
+
+    result = replay_trace(trace_path, snapshot_path, speed=0)
+    assert result.ok and not result.outcome_mismatches
@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+from storage import open_account_manager
+from transaction_archive import archive_transactions, previous_month, resolve_archive
+
+BACKENDS = ["sqlite", "memory"]
+
+
+def ledger_rows(db_path, account_id):
+    """Every row of an account from the hot table and the archive files, oldest first."""
+    query = ("SELECT transaction_id, account_id, transaction_type, amount, timestamp FROM transactions "
+             "WHERE account_id = ?")
+    connection = sqlite3.connect(db_path)
+    rows = connection.execute(query, (account_id,)).fetchall()
+    for (path,) in connection.execute("SELECT path FROM transaction_partitions"):
+        archive = sqlite3.connect(resolve_archive(db_path, path))
+        rows += archive.execute(query, (account_id,)).fetchall()
+        archive.close()
+    connection.close()
+    return sorted(rows, key=lambda row: (row[4], row[0]))
+
+
+@pytest.fixture
+def archived_db(db_path):
+    moved = archive_transactions(db_path, previous_month(2), pause=0)
+    assert len(moved) > 1  # Pages have to cross several partitions
+    return db_path
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("order", ["oldest_first", "newest_first"])
+def test_pages_cross_archive_partitions(archived_db, backend, order):
+    expected = ledger_rows(archived_db, 1)
+    if order == "newest_first":
+        expected.reverse()
+    manager = open_account_manager(archived_db, backend)
+    try:
+        assert list(manager.iter_transactions(1, page_size=7, order=order)) == expected
+    finally:
+        manager.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_new_entries_do_not_reuse_archived_ids(db_path, backend):
+    archive_transactions(db_path, previous_month(-1), pause=0)  # Leaves the hot table empty
+    archived_ids = {row[0] for row in ledger_rows(db_path, 1)}
+
+    manager = open_account_manager(db_path, backend)
+    try:
+        manager.deposit(1, 25, 4)
+        rows = list(manager.iter_transactions(1, order="newest_first"))
+    finally:
+        manager.close()
+    assert rows[0][0] not in archived_ids
+    assert (rows[0][2], rows[0][3]) == ("Deposit", 25)
+    assert len(rows) == len(archived_ids) + 1
+
+
+def test_archiving_shrinks_the_database(db_path):
+    connection = sqlite3.connect(db_path)
+    pages = connection.execute("PRAGMA page_count").fetchone()[0]
+    connection.close()
+
+    archive_transactions(db_path, previous_month(-1), batch_size=100, pause=0)
+
+    connection = sqlite3.connect(db_path)
+    assert connection.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert connection.execute("PRAGMA page_count").fetchone()[0] < pages
+    connection.close()
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+
+import pytest
+
+from Accountmanager import AccountManager
+from transaction_journal import TransactionJournal
+
+
+def ledger_count(path, account_id):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM transactions WHERE account_id = ?", (account_id,)).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_flush_commits_everything_appended_before_it(db_path):
+    before = ledger_count(db_path, 1)
+    journal = TransactionJournal(db_path, batch_size=1000, flush_interval=60)  # Never due on its own
+    try:
+        for _ in range(5):
+            journal.append(1, "Deposit", 10.0, 2)
+        assert journal.flush(timeout=5)
+        assert ledger_count(db_path, 1) == before + 5
+    finally:
+        journal.close()
+
+
+def test_close_commits_queued_entries_and_refuses_more(db_path):
+    before = ledger_count(db_path, 1)
+    journal = TransactionJournal(db_path, batch_size=1000, flush_interval=60)
+    journal.append(1, "Withdrawal", 20.0, 2)
+    journal.close()
+    assert ledger_count(db_path, 1) == before + 1
+    with pytest.raises(RuntimeError):
+        journal.append(1, "Withdrawal", 20.0, 2)
+
+
+def test_flush_waits_out_a_locked_database(db_path):
+    before = ledger_count(db_path, 1)
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    journal = TransactionJournal(db_path, batch_size=1000, flush_interval=0.01)
+    try:
+        blocker.execute("PRAGMA busy_timeout=0")
+        blocker.execute("BEGIN IMMEDIATE")  # Hold the write lock
+        journal.append(1, "Deposit", 5.0, 2)
+        assert not journal.flush(timeout=0.3)
+        blocker.execute("ROLLBACK")
+        assert journal.flush(timeout=35)  # The retried batch lands once the lock is gone
+        assert ledger_count(db_path, 1) == before + 1
+    finally:
+        blocker.close()
+        journal.close()
+
+
+def test_write_behind_manager_commits_on_flush_and_close(db_path):
+    before = ledger_count(db_path, 1)
+    manager = AccountManager(db_path, write_behind=True, journal_batch_size=1000, journal_flush_interval=60)
+    try:
+        manager.withdraw(1, 10, 2)
+        assert manager.flush(timeout=5)
+        assert ledger_count(db_path, 1) == before + 1
+        manager.deposit(1, 10, 2)
+    finally:
+        manager.close()
+    assert ledger_count(db_path, 1) == before + 2
+
+
+def test_close_reports_entries_it_could_not_write(db_path):
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TRIGGER refuse BEFORE INSERT ON transactions BEGIN SELECT RAISE(ABORT, 'refused'); END"
+    )
+    connection.commit()
+    connection.close()
+    journal = TransactionJournal(db_path, batch_size=1000, flush_interval=0.01)
+    journal.append(1, "Deposit", 5.0, 2)
+    journal.append(1, "Deposit", 6.0, 2)
+
+    flushed = []
+    waiter = threading.Thread(target=lambda: flushed.append(journal.flush()))
+    waiter.start()
+    with pytest.raises(RuntimeError, match="2 journal entries"):
+        journal.close()
+    waiter.join(timeout=5)
+    assert flushed == [False]  # The waiter is released, not left hanging
+    assert not journal.flush()
@@ -0,0 +1,41 @@
+import pytest
+
+from Accountmanager import AccountManager
+
+
+@pytest.fixture
+def manager(db_path):
+    manager = AccountManager(db_path, clock=lambda: 4_000_000_000)  # New rows sort after the seeded history
+    yield manager
+    manager.close()
+
+
+def test_pages_cover_every_row_once(manager):
+    everything, _ = manager.get_transaction_page(1, limit=10000, order="oldest_first")
+    assert len(everything) > 7
+
+    rows, cursor, pages = [], None, 0
+    while True:
+        page, cursor = manager.get_transaction_page(1, 3, cursor, "oldest_first")
+        rows += page
+        pages += 1
+        if cursor is None:
+            break
+    assert rows == everything
+    assert pages == len(everything) // 3 + 1
+
+
+def test_newest_first_pages_ignore_rows_written_meanwhile(manager):
+    expected = list(manager.iter_transactions(1, order="newest_first"))
+    first, cursor = manager.get_transaction_page(1, 4)
+    manager.deposit(1, 10, 2)  # Newer than the cursor, so later pages never see it
+    rows = first
+    while cursor is not None:
+        page, cursor = manager.get_transaction_page(1, 4, cursor)
+        rows += page
+    assert rows == expected
+
+
+def test_unknown_order_is_rejected(manager):
+    with pytest.raises(ValueError, match="Unknown order"):
+        manager.get_transaction_page(1, order="sideways")
@@ -0,0 +1,33 @@
+import pytest
+
+from velocity_limits import LimitRule, SlidingWindow, VelocityLimits
+
+DAY = 86400
+
+
+def test_event_counts_for_the_whole_window():
+    limits = VelocityLimits([LimitRule("card", DAY, max_amount=1000)])
+    limits.record(1, 1, 1000, now=1439)  # Last second of the first bucket
+
+    for now in (86400, 1439 + DAY - 1):
+        with pytest.raises(ValueError):
+            limits.check(1, 1, 1000, now=now)
+
+
+def test_event_expires_within_one_bucket_after_the_window():
+    limits = VelocityLimits([LimitRule("card", DAY, max_amount=1000)])
+    limits.record(1, 1, 1000, now=1439)
+    width = DAY / 60
+
+    limits.check(1, 1, 1000, now=1439 + DAY + width)
+
+
+def test_totals_never_drop_an_event_younger_than_the_window():
+    window = SlidingWindow(3600, 60)
+    for at in range(0, 7200, 7):
+        window.add("k", 1.0, at)
+        amount, count = window.totals("k", at)
+        # Every event in (at - 3600, at] is counted; at most one 60s bucket more
+        added = range(0, at + 1, 7)
+        assert count >= sum(1 for t in added if t > at - 3600)
+        assert count <= sum(1 for t in added if t > at - 3660)